@@ -0,0 +1,272 @@
+import os
+import json
+import math
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+from app.executor import MAX_CONCURRENT_GENERATIONS
+from app.metrics import admission_rejections
+
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Per-client token bucket: sustained requests per minute (0 disables) and burst size
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+# Global cap on admitted requests, and how many more may wait for a slot
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", str(MAX_CONCURRENT_GENERATIONS)))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
+# Use the first X-Forwarded-For address as the client IP (only behind a trusted proxy)
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "false").lower() == "true"
+# Comma-separated API keys that identify a client; other X-API-Key values are
+# ignored (clients are then keyed on their IP), so random keys cannot dodge limits
+API_KEYS = [key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()]
+ADMISSION_PATH_PREFIXES = ("/api/generate", "/api/jobs")
+# Batches are charged per item by the route (see app/routes/batch.py)
+ADMISSION_ITEM_PATH_PREFIXES = ("/api/generate/batch",)
+
+_MAX_TRACKED_CLIENTS = 10000
+
+
+class TokenBucket:
+    """Per-client token buckets, refilled lazily on each request"""
+
+    def __init__(self, rate_per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            # Least recently seen clients are forgotten (they come back with a full bucket)
+            while len(self._buckets) > _MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class QueueFullError(Exception):
+    """Raised when no slot is free and the wait queue is full"""
+
+
+class ConcurrencyLimiter:
+    """Global concurrency cap with a bounded FIFO wait queue.
+
+    The cap adapts to provider quota (AIMD): each quota error halves it, at
+    most once a second, and each successful model call grows it back by
+    1/limit, so it recovers by about one slot per `limit` successes.
+    Quota and success reports may come from generation threads.
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, queue_size: int = ADMISSION_QUEUE_SIZE):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.limit = float(max_concurrent)
+        self.active = 0
+        self.quota_errors = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+        self._service_seconds = 1.0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return max(int(self.limit), 1)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queued request would be admitted"""
+        return max(math.ceil((self.queued + 1) * self._service_seconds / self.capacity), 1)
+
+    async def acquire(self, timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        if self.active < self.capacity and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise QueueFullError()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException:
+            # Timed out or the client went away; if the slot was granted on
+            # the very last tick, hand it straight back
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, held_seconds: float = None):
+        self.active -= 1
+        if held_seconds is not None:
+            # Moving average of how long a request holds its slot
+            self._service_seconds += 0.1 * (held_seconds - self._service_seconds)
+        while self._waiters and self.active < self.capacity:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    def record_quota_error(self):
+        now = time.monotonic()
+        with self._lock:
+            self.quota_errors += 1
+            if now - self._last_decrease >= 1.0:
+                self.limit = max(self.limit / 2, 1.0)
+                self._last_decrease = now
+
+    def record_success(self):
+        with self._lock:
+            if self.limit < self.max_concurrent:
+                self.limit = min(self.limit + 1 / self.limit, float(self.max_concurrent))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "active": self.active,
+            "queued": self.queued,
+            "limit": self.capacity,
+            "max_concurrent": self.max_concurrent,
+            "queue_size": self.queue_size,
+            "quota_errors": self.quota_errors,
+        }
+
+
+rate_limiter = TokenBucket()
+limiter = ConcurrencyLimiter()
+
+
+def hash_key(api_key: str) -> str:
+    """What is stored in place of an API key (history and job owners, rate limit buckets)"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+
+_API_KEY_HASHES = {hash_key(key) for key in API_KEYS}
+
+
+def client_id(scope) -> str:
+    """Hash of the client's API key when it is one of API_KEYS, else its IP address"""
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(b"x-api-key")
+    if api_key:
+        hashed = hash_key(api_key.decode("latin-1"))
+        if hashed in _API_KEY_HASHES:
+            return "key:" + hashed
+    if ADMISSION_TRUST_FORWARDED and b"x-forwarded-for" in headers:
+        return "ip:" + headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+def is_authenticated(client: str) -> bool:
+    """Whether a client_id() comes from a configured API key rather than an IP"""
+    return client.startswith("key:")
+
+
+class AdmissionRejectedError(Exception):
+    """Raised by admit() with the status, message and Retry-After seconds to answer with"""
+
+    def __init__(self, status: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+@asynccontextmanager
+async def admitted(client: str, charge: bool = True):
+    """Hold an admission slot for one generation, first taking one of the
+    client's rate limit tokens unless `charge` is False. Raises
+    AdmissionRejectedError on entry when either is not available."""
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    wait = rate_limiter.take(client) if charge else 0.0
+    if wait:
+        admission_rejections.inc(reason="rate_limited")
+        raise AdmissionRejectedError(429, "Rate limit exceeded. Please slow down.", wait)
+    try:
+        await limiter.acquire()
+    except QueueFullError:
+        admission_rejections.inc(reason="queue_full")
+        raise AdmissionRejectedError(429, "Server is busy. Please retry shortly.", limiter.retry_after())
+    except asyncio.TimeoutError:
+        admission_rejections.inc(reason="queue_timeout")
+        raise AdmissionRejectedError(503, "Server is busy. Please retry shortly.", limiter.retry_after())
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        limiter.release(time.monotonic() - start)
+
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(math.ceil(retry_after), 1)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying per-client rate limits and the global
+    concurrency cap to generation routes. Only POSTs start generations, so
+    polling a job is not charged; batches take a token and a slot per item
+    instead (see admitted()).
+
+    Rejections are immediate 429s with Retry-After: over the client's rate,
+    or no free slot and a full wait queue. A request that waits in the queue
+    longer than ADMISSION_QUEUE_TIMEOUT_SECONDS gets a 503 instead. The slot
+    is held until the response (including a stream) has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not ADMISSION_ENABLED
+            or scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(ADMISSION_PATH_PREFIXES)
+            or scope["path"].startswith(ADMISSION_ITEM_PATH_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with admitted(client_id(scope)):
+                await self.app(scope, receive, send)
+        except AdmissionRejectedError as e:
+            # Raised on entry only, before anything was sent
+            await _reject(send, e.status, e.detail, e.retry_after)
+
@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+from app.model_resolver import resolver
+from app.prompts import estimate_tokens
+from app.metrics import context_cache_tokens_saved
+
+load_dotenv()
+
+# "system_instruction" (default) moves each template's static prefix into
+# the model's system instruction, which the provider can cache implicitly;
+# "cached_content" registers the prefix with the provider (Gemini context
+# caching) and sends only the rest per request, for templates whose prefix
+# reaches CONTEXT_CACHE_MIN_TOKENS (the current ones are far smaller);
+# "off" sends the whole prompt every time
+CONTEXT_CACHE_MODE = os.getenv("CONTEXT_CACHE_MODE", "system_instruction").lower()
+CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# Gemini rejects cached content below a minimum size (1024 tokens on 2.5 Flash);
+# in cached_content mode smaller prefixes are sent inline without trying
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+# After a failed registration, send the prompt inline for this long before retrying
+CONTEXT_CACHE_RETRY_SECONDS = float(os.getenv("CONTEXT_CACHE_RETRY_SECONDS", "300"))
+
+# Re-register this long before the provider-side entry would expire
+_REFRESH_MARGIN = 0.1
+
+
+class _Entry:
+    def __init__(self, model, prefix: str, created_at: float):
+        self.model = model
+        self.prefix = prefix
+        self.created_at = created_at
+
+
+class ContextCacheManager:
+    """Registers each prompt template's static prefix once per model and
+    reuses it across requests.
+
+    `prepare()` swaps in a model that already holds the prefix and strips
+    the prefix from the request contents. Entries are keyed by model and
+    template and re-registered on TTL expiry or when the template text
+    changes. Whenever no entry is usable (caching off, prefix too small,
+    registration failed or in progress) the plain model and the full
+    contents are returned, so callers never see the difference. `client`
+    defaults to the resolver's provider.
+    """
+
+    def __init__(self, client=None, mode: str = CONTEXT_CACHE_MODE, ttl: float = CONTEXT_CACHE_TTL_SECONDS,
+                 min_tokens: int = CONTEXT_CACHE_MIN_TOKENS):
+        self.client = client
+        self.mode = mode
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.registrations = 0
+        self.failures = 0
+        self.hits = 0
+        self.requests = 0
+        self.tokens_saved = 0
+        self._entries = {}
+        self._retry_at = {}
+        self._creating = set()
+        self._lock = threading.Lock()
+
+    def _eligible(self, template) -> bool:
+        if self.mode == "off" or template is None or not template.prefix:
+            return False
+        return self.mode == "system_instruction" or estimate_tokens(template.prefix) >= self.min_tokens
+
+    def _register(self, model_name: str, template):
+        client = self.client or resolver.client
+        if self.mode == "system_instruction":
+            return client.GenerativeModel(model_name, system_instruction=template.prefix)
+        return client.cached_model(model_name, template.prefix, self.ttl)
+
+    def _entry(self, model_name: str, template):
+        key = (model_name, template.name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            fresh = (
+                entry is not None
+                and entry.prefix == template.prefix
+                and (self.mode == "system_instruction" or now - entry.created_at < self.ttl * (1 - _REFRESH_MARGIN))
+            )
+            if fresh:
+                return entry
+            # One thread registers; the rest go inline meanwhile
+            if key in self._creating or self._retry_at.get(key, 0) > now:
+                return None
+            self._creating.add(key)
+
+        try:
+            model = self._register(model_name, template)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+                self._entries.pop(key, None)
+                self._retry_at[key] = time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+            return None
+        finally:
+            with self._lock:
+                self._creating.discard(key)
+
+        entry = _Entry(model, template.prefix, time.monotonic())
+        with self._lock:
+            self.registrations += 1
+            self._entries[key] = entry
+        return entry
+
+    def prepare(self, model_name: str, template, contents) -> tuple:
+        """Return (model, contents, cached) for one call"""
+        if self._eligible(template):
+            stripped = _strip_prefix(contents, template.prefix)
+            if stripped is not None:
+                entry = self._entry(model_name, template)
+                if entry is not None:
+                    self.hits += 1
+                    return entry.model, stripped, True
+        return resolver.get_model(model_name), contents, False
+
+    def invalidate(self, model_name: str, template):
+        """Forget an entry the provider no longer has; calls go inline until the retry delay passes"""
+        key = (model_name, template.name)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._retry_at[key] = time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._retry_at.clear()
+
+    def record_usage(self, kind: str, usage: dict):
+        """Count the input tokens a response reports as served from cache"""
+        saved = usage.get("cached_tokens", 0)
+        with self._lock:
+            self.requests += 1
+            self.tokens_saved += saved
+        if saved:
+            context_cache_tokens_saved.inc(saved, kind=kind)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = [
+                {"model": model_name, "template": template_name, "age_seconds": round(time.monotonic() - entry.created_at, 1)}
+                for (model_name, template_name), entry in self._entries.items()
+            ]
+        return {
+            "mode": self.mode,
+            "ttl_seconds": self.ttl,
+            "entries": entries,
+            "registrations": self.registrations,
+            "failures": self.failures,
+            "hits": self.hits,
+            "tokens_saved": self.tokens_saved,
+            "tokens_saved_per_request": round(self.tokens_saved / self.requests, 1) if self.requests else 0.0,
+        }
+
+
+def _strip_prefix(contents, prefix: str):
+    """Contents without the leading static prefix, or None if they don't start with it"""
+    if isinstance(contents, str):
+        return contents[len(prefix):] if contents.startswith(prefix) else None
+    if contents and isinstance(contents[0], str) and contents[0].startswith(prefix):
+        rest = contents[0][len(prefix):]
+        return ([rest] if rest else []) + list(contents[1:])
+    return None
+
+
+context_cache = ContextCacheManager()
@@ -0,0 +1,107 @@
+import os
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The Gemini SDK is blocking, so generations run on a dedicated thread pool
+# instead of the event loop. The semaphore caps how many run at once.
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "32"))
+GENERATION_TIMEOUT_SECONDS = float(os.getenv("GENERATION_TIMEOUT_SECONDS", "120"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_GENERATIONS, thread_name_prefix="generation")
+_semaphore = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+
+
+class GenerationTimeoutError(Exception):
+    """Raised when a generation exceeds its deadline"""
+
+
+async def _start(loop, func, *args):
+    """Take a slot and run `func(*args)` on the generation pool.
+
+    The slot is released when the worker thread finishes, not when the
+    caller stops waiting. Timed-out calls still count against
+    MAX_CONCURRENT_GENERATIONS, so a new generation never holds a slot while
+    every pool thread is busy with abandoned ones.
+    """
+    await _semaphore.acquire()
+    try:
+        # Carry the request's context (trace and request ID) into the worker
+        future = loop.run_in_executor(_executor, contextvars.copy_context().run, func, *args)
+    except BaseException:
+        _semaphore.release()
+        raise
+    future.add_done_callback(_finished)
+    return future
+
+
+def _finished(future):
+    if not future.cancelled():
+        # Retrieve the outcome so an abandoned call's error is not logged as unhandled
+        future.exception()
+    _semaphore.release()
+
+
+async def run_generation(func, *args, timeout: float = GENERATION_TIMEOUT_SECONDS):
+    """Run a blocking generation function off the event loop.
+
+    Waits for a free slot, then runs `func(*args)` on the generation pool.
+    Raises GenerationTimeoutError if it does not finish within `timeout`
+    seconds; the worker thread is abandoned, not interrupted, and keeps its
+    slot until the SDK call completes in the background.
+    """
+    future = await _start(asyncio.get_running_loop(), func, *args)
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise GenerationTimeoutError(f"Generation timed out after {timeout:g} seconds")
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def iterate_generation(func, *args, timeout: float = GENERATION_TIMEOUT_SECONDS):
+    """Async-iterate a blocking generator function on the generation pool.
+
+    Items produced by `func(*args)` in the worker thread are handed to the
+    event loop as they arrive. The whole stream shares one slot and one
+    deadline; if the consumer goes away, the worker stops pulling from the
+    generator, and the slot is held until it has.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    finished = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in func(*args):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, _Failure(e))
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    await _start(loop, produce)
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                raise GenerationTimeoutError(f"Generation timed out after {timeout:g} seconds")
+            if item is finished:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
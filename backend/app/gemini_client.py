@@ -1,25 +1,466 @@
 import os
-import re
-import json
-import google.generativeai as genai
+import time
+import logging
+import contextvars
 from dotenv import load_dotenv
-import base64
-from PIL import Image
-import io
+
+from app.model_resolver import resolver, ModelUnavailableError
+from app.providers import provider
+from app.model_calls import call_model, stream_model, MODEL_CALL_DEADLINE_SECONDS
+from app.response_cache import response_cache, make_key, RESPONSE_CACHE_ENABLED
+from app.single_flight import single_flight, SINGLE_FLIGHT_ENABLED
+from app.history import history_store, history_writer, make_record, HISTORY_ENABLED
+from app.context_cache import context_cache
+from app.prompts import select_template, fit_text_description, prompt_stats, PromptBudgetError, TEMPLATES
+from app.streaming import JSXTagFilter, JSONFieldFilter
+from app.image_preprocessing import prepare_image
+from app.image_index import image_index, image_hash, IMAGE_INDEX_ENABLED, IMAGE_INDEX_MODE
+from app.tiling import should_tile, split_screenshot, encode_section, merge_sections, section_executor, PAGE_COMPONENT
+from app.metrics import (
+    generations, generation_errors, generations_in_flight, jsx_validations, near_duplicates,
+    tiled_generations,
+)
+from app.tracing import span, stage, observe_stage, annotate
+from app.jsx_validation import validate_result, JSX_VALIDATION_ENABLED, JSX_REPAIR_ATTEMPTS
+from app.response_parser import parse_text_response, parse_image_response, parse_structured_response, parse_stats
 
 load_dotenv()
 
-# Configure Gemini API
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
+logger = logging.getLogger("instamock.generation")
+
+# When the current generation's model calls must finish (time.monotonic()),
+# so later calls (repairs, tiled sections, fallbacks) only get what is left
+_call_deadline = contextvars.ContextVar("call_deadline", default=None)
+
+
+def _remaining() -> float:
+    """Seconds left of the current generation's model-call deadline"""
+    deadline = _call_deadline.get()
+    return MODEL_CALL_DEADLINE_SECONDS if deadline is None else deadline - time.monotonic()
+
+# Ask Gemini for schema-constrained JSON on the image path instead of
+# recovering the object from free text
+STRUCTURED_OUTPUT_ENABLED = os.getenv("STRUCTURED_OUTPUT_ENABLED", "false").lower() == "true"
+IMAGE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "component_name": {"type": "string"},
+        "jsx": {"type": "string"},
+    },
+    "required": ["component_name", "jsx"],
+}
+
+
+def _image_generation_config():
+    if not STRUCTURED_OUTPUT_ENABLED:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": IMAGE_RESPONSE_SCHEMA}
+
+
+def _parse_image(response_text: str) -> dict:
+    """Parse an image response, falling back to the legacy parser if needed"""
+    if STRUCTURED_OUTPUT_ENABLED:
+        result = parse_structured_response(response_text)
+        if result is not None:
+            parse_stats.record("structured", success=True)
+            return result
+        result = parse_image_response(response_text.strip())
+        parse_stats.record("structured", success=result["success"], fallback=True)
+        return result
+
+    result = parse_image_response(response_text.strip())
+    parse_stats.record("legacy", success=result["success"])
+    return result
+
+
+def classify_error(e: Exception) -> str:
+    """Bucket an SDK exception as auth, quota, network or other"""
+    error_msg = str(e)
+    if "API key" in error_msg or "authentication" in error_msg.lower():
+        return "auth"
+    if "quota" in error_msg.lower() or "limit" in error_msg.lower():
+        return "quota"
+    if "network" in error_msg.lower() or "connection" in error_msg.lower():
+        return "network"
+    return "other"
+
+
+_FRIENDLY_ERRORS = {
+    "auth": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in .env file.",
+    "quota": "API quota exceeded. Please check your Gemini API usage limits.",
+    "network": "Network error. Please check your internet connection and try again.",
+}
+
+
+def _error_result(e: Exception, kind: str) -> dict:
+    """Map an SDK exception to a user-friendly error result"""
+    error_class = classify_error(e)
+    model = resolver.current_model or "unknown"
+    generation_errors.inc(kind=kind, error_class=error_class, model=model)
+    # The client only sees the friendly message; keep the exception for the logs
+    logger.warning(
+        "%s generation failed", kind, exc_info=e,
+        extra={"fields": {"kind": kind, "error_class": error_class, "model": model, "error": type(e).__name__}}
+    )
+
+    # Provide user-friendly error messages
+    error_msg = _FRIENDLY_ERRORS.get(error_class, str(e))
+    return {
+        "jsx_code": "",
+        "component_name": "Error",
+        "success": False,
+        "message": f"{type(e).__name__}: {error_msg}"
+    }
+
+
+def _usage(response) -> dict:
+    """Token counts from a response (or the last streamed chunk), if reported"""
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(metadata, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(metadata, "candidates_token_count", 0) or 0,
+        # Input tokens served from the context cache (explicit or implicit)
+        "cached_tokens": getattr(metadata, "cached_content_token_count", 0) or 0,
+    }
+
+
+def _repair(kind: str, result: dict):
+    """Re-prompt with the code and its syntax error; None if the call fails"""
+    template = TEMPLATES["repair-v1"]
+    prompt = template.render(f"Problem: {result['syntax_error']}\n\n{result['jsx_code']}")
+    remaining = _remaining()
+    if remaining <= 0:
+        return None
+    try:
+        response = call_model(kind, prompt, deadline=remaining, template=template)
+    except Exception:
+        return None
+    if not response or not getattr(response, "text", None):
+        return None
+    repaired = parse_text_response(response.text)
+    with stage(kind, "validate"):
+        repaired = validate_result(repaired)
+    # Bill the repair to the request
+    usage = dict(result.get("usage") or {})
+    for name, value in _usage(response).items():
+        usage[name] = usage.get(name, 0) + value
+    repaired["usage"] = usage
+    return repaired
+
+
+def _validated(kind: str, result: dict) -> dict:
+    """Normalize a parsed result to canonical form and check its syntax,
+    re-prompting up to JSX_REPAIR_ATTEMPTS times when it does not parse"""
+    if not JSX_VALIDATION_ENABLED or not result.get("success"):
+        return result
+    with stage(kind, "validate"):
+        result = validate_result(result)
+    outcome = "valid" if result["parses"] else "invalid"
+    for _ in range(JSX_REPAIR_ATTEMPTS if outcome == "invalid" else 0):
+        repaired = _repair(kind, result)
+        if repaired is None:
+            continue
+        if repaired["parses"]:
+            result, outcome = repaired, "repaired"
+            break
+        # Keep the original output, but count the tokens the attempt used
+        result["usage"] = repaired["usage"]
+    jsx_validations.inc(kind=kind, outcome=outcome)
+    return result
+
+
+def _resolve_model(vision: bool = False):
+    """Return None, or an error result if no model is usable"""
+    # Use the model resolved at startup (cached, refreshed in the background).
+    # All newer Gemini models support vision, so both paths share it.
+    kind = "Gemini vision" if vision else "Gemini"
+    try:
+        with stage("image" if vision else "text", "model_resolve"):
+            resolver.get_model()
+            return None
+    except ModelUnavailableError:
+        message = f"No {kind} models available. Please check your API key and permissions."
+    except Exception as e:
+        message = f"Error accessing {kind} models: {str(e)}"
+    return {
+        "jsx_code": "",
+        "component_name": "Error",
+        "success": False,
+        "message": message
+    }
+
+
+def _with_cache(kind: str, payload, prompt_version: str, use_cache: bool, generate, trace: dict) -> dict:
+    """Serve a generation from the response cache, storing successful results.
+
+    Concurrent identical requests share one model call (see
+    app/single_flight.py). `use_cache=False` skips both the cache lookup and
+    coalescing, so the caller always gets a fresh generation. The cache key,
+    model and whether the result was cached or shared with a concurrent
+    identical request (coalesced) are written to `trace`.
+    """
+    if not provider.is_configured or not (RESPONSE_CACHE_ENABLED or SINGLE_FLIGHT_ENABLED):
+        return generate(payload)
+    try:
+        model_name = resolver.resolve()
+    except Exception:
+        # Let the generator report the model error
+        return generate(payload)
+
+    key = make_key(kind, payload, model_name, prompt_version)
+    trace.update(key=key, model=model_name)
+    if use_cache and RESPONSE_CACHE_ENABLED:
+        cached = response_cache.get(key)
+        if cached is not None:
+            trace["cached"] = True
+            return cached
+
+    led = []
+
+    def generate_and_store():
+        # Store before the flight lands so late duplicates hit the cache
+        led.append(True)
+        result = generate(payload)
+        if result.get("success") and RESPONSE_CACHE_ENABLED:
+            response_cache.set(key, result)
+        return result
+
+    if use_cache and SINGLE_FLIGHT_ENABLED:
+        result = single_flight.do(key, generate_and_store, kind=kind)
+        if led:
+            return result
+        # The leader accounts for the model call; each follower gets its own copy
+        trace["coalesced"] = True
+        return dict(result)
+    return generate_and_store()
+
+
+def _instrumented(kind: str, payload, template: str, user, run) -> dict:
+    """Track in-flight generations, count outcomes per model and record history"""
+    trace = {}
+    start = time.perf_counter()
+    deadline = _call_deadline.set(time.monotonic() + MODEL_CALL_DEADLINE_SECONDS)
+    generations_in_flight.inc(kind=kind)
+    try:
+        result = run(trace)
+    finally:
+        generations_in_flight.dec(kind=kind)
+        _call_deadline.reset(deadline)
+    outcome = "success" if result["success"] else "error"
+    generations.inc(kind=kind, model=resolver.current_model or "unknown", outcome=outcome)
+    _record_generation(kind, payload, template, user, result, trace, time.perf_counter() - start)
+    return result
+
+
+def _record_generation(kind: str, payload, template: str, user, result: dict, trace: dict, seconds: float):
+    """Per-template stats (model calls only), trace attributes and the history record"""
+    annotate(
+        model=trace.get("model"), cached=bool(trace.get("cached")), coalesced=bool(trace.get("coalesced")),
+        near_duplicate=trace.get("near_duplicate"),
+    )
+    if not trace.get("cached") and not trace.get("coalesced"):
+        usage = result.get("usage") or {}
+        prompt_stats.record(template, result["success"], seconds, usage)
+        if usage:
+            context_cache.record_usage(kind, usage)
+    if not HISTORY_ENABLED:
+        return
+    trace.setdefault("model", resolver.current_model)
+    history_writer.record(make_record(kind, payload, template, user, result, trace, seconds))
+
+
+def _count_tokens(text: str) -> int:
+    return resolver.get_model().count_tokens(text).total_tokens
+
+
+def _fit_text(text_description: str):
+    """Apply the token budget; returns (description, None) or (None, error result)"""
+    try:
+        return fit_text_description(text_description, _count_tokens), None
+    except PromptBudgetError as e:
+        return None, {
+            "jsx_code": "",
+            "component_name": "Error",
+            "success": False,
+            "message": f"PromptBudgetError: {str(e)}"
+        }
+
+
+def generate_jsx_from_text(text_description: str, use_cache: bool = True, user: str = None) -> dict:
+    """Generate JSX code from text description, reusing cached results"""
+    text_description, error = _fit_text(text_description)
+    if error:
+        return error
+    template = select_template("text", text_description)
+    return _instrumented("text", text_description, template.name, user, lambda trace: _with_cache(
+        "text", text_description, template.name, use_cache,
+        lambda payload: _generate_jsx_from_text(payload, template), trace
+    ))
+
+
+def generate_jsx_from_image(image_bytes: bytes, use_cache: bool = True, user: str = None) -> dict:
+    """Generate JSX code from image, reusing cached results"""
+    template = select_template("image", image_bytes)
+    tiled = should_tile(image_bytes)
+    # Tiled and single-call results are cached and matched separately
+    prompt_version = f"{template.name}+tiled" if tiled else template.name
+    return _instrumented("image", image_bytes, template.name, user, lambda trace: _with_cache(
+        "image", image_bytes, prompt_version, use_cache,
+        lambda payload: _generate_indexed_image(payload, template, prompt_version, tiled, use_cache, user, trace), trace
+    ))
+
+
+def _stored_result(key: str):
+    """A successful result stored under a response cache key, from the cache or history"""
+    stored = response_cache.get(key) if RESPONSE_CACHE_ENABLED else None
+    if stored is None and history_store is not None:
+        for record in history_store.query(kind="image", input_hash=key, limit=5):
+            if record["success"] and record["jsx_code"]:
+                return {"jsx_code": record["jsx_code"], "component_name": record["component_name"], "success": True}
+    return stored
+
+
+def _near_duplicate(image_bytes: bytes, prompt_version: str, use_cache: bool, user, trace: dict) -> tuple:
+    """Look an upload up in the near-duplicate index (see app/image_index.py).
+
+    Returns (entry, stored, distance): `entry` is what to add to the index
+    once this image's generation succeeds, `stored` the result of the
+    closest earlier screenshot within the threshold (or None) and
+    `distance` its Hamming distance.
+    """
+    model_name = trace.get("model") or resolver.current_model
+    if not IMAGE_INDEX_ENABLED or not model_name:
+        return None, None, None
+    try:
+        with stage("image", "image_hash"):
+            value, aspect = image_hash(image_bytes)
+    except Exception:
+        # Unreadable images are reported by the generator
+        return None, None, None
+    # Only results from the same model and prompt are interchangeable, and
+    # results served as-is only between one client's own screenshots
+    scope = f"{model_name}:{prompt_version}"
+    if IMAGE_INDEX_MODE != "seed":
+        scope += f":{user or 'anonymous'}"
+    entry = (value, aspect, scope, trace.get("key") or make_key("image", image_bytes, model_name, prompt_version))
+    match = image_index.nearest(value, aspect, scope) if use_cache else None
+    if match is None:
+        return entry, None, None
+    key, distance = match
+    stored = _stored_result(key)
+    return entry, stored, distance if stored is not None else None
+
+
+def _generate_indexed_image(image_bytes: bytes, template, prompt_version: str, tiled: bool, use_cache: bool,
+                            user, trace: dict) -> dict:
+    """Serve or seed the generation from a near-duplicate screenshot, and
+    index the image once its own generation succeeds"""
+    entry, stored, distance = _near_duplicate(image_bytes, prompt_version, use_cache, user, trace)
+    if stored is not None:
+        near_duplicates.inc(mode=IMAGE_INDEX_MODE)
+        trace["near_duplicate"] = distance
+        if IMAGE_INDEX_MODE != "seed":
+            trace["cached"] = True
+            return dict(stored)
+    if tiled and stored is None:
+        result = _generate_tiled(image_bytes, template)
+    else:
+        result = _generate_jsx_from_image(image_bytes, template, seed=stored)
+    # Served matches are not indexed, so entries never drift from what the model saw
+    if entry is not None and result["success"]:
+        _index_image(entry)
+    return result
+
+
+def _index_image(entry: tuple):
+    """Add a generated screenshot to the near-duplicate index; a failure only skips indexing"""
+    try:
+        image_index.add(*entry)
+    except Exception:
+        logger.warning("Could not add a screenshot to the near-duplicate index", exc_info=True)
+
+
+def _seeded(template, seed):
+    """(template, prompt) for an image request, carrying a near-duplicate's JSX if given"""
+    if seed is None:
+        return template, template.render()
+    template = TEMPLATES["image-seed-v1"]
+    return template, template.render(seed["jsx_code"])
+
+
+def _generate_section(section, number: int, count: int) -> dict:
+    """Generate the component for one section of a tiled screenshot"""
+    template = TEMPLATES["image-section-v1"]
+    prompt = template.render(f"This is section {number} of {count}, counting from the top.")
+    try:
+        # Encoded here, so each section's call starts as soon as it is ready
+        with span("section", kind="image", number=number):
+            part = encode_section(section)
+            response = call_model(
+                "image", [prompt, part], generation_config=_image_generation_config(), deadline=_remaining(),
+                template=template
+            )
+    except Exception as e:
+        return _error_result(e, "image")
+    if not response or not getattr(response, "text", None):
+        return {"success": False, "message": "Empty response from Gemini Vision API"}
+    result = _parse_image(response.text)
+    result["usage"] = _usage(response)
+    return _validated("image", result)
 
 
-def generate_jsx_from_text(text_description: str) -> dict:
+def _generate_tiled(image_bytes: bytes, template) -> dict:
+    """Generate the sections of a tall screenshot concurrently and merge them
+    into one page component (see app/tiling.py), so latency follows the
+    slowest section. Falls back to a single call when the image has no
+    usable split or any section fails."""
+    if not provider.is_configured or _resolve_model(vision=True):
+        return _generate_jsx_from_image(image_bytes, template)
+    try:
+        with stage("image", "image_preprocess"):
+            parts = split_screenshot(image_bytes)
+    except Exception:
+        # The single call reports oversized or unreadable images
+        parts = []
+    if len(parts) < 2:
+        tiled_generations.inc(outcome="unsplit")
+        return _generate_jsx_from_image(image_bytes, template)
+
+    count = len(parts)
+    with stage("image", "model_call"):
+        # Each section runs in a copy of this context, so its spans join the request's trace
+        futures = [
+            section_executor.submit(contextvars.copy_context().run, _generate_section, part, number, count)
+            for number, part in enumerate(parts, 1)
+        ]
+        sections = [future.result() for future in futures]
+    failed = next((section for section in sections if not section["success"]), None)
+    if failed is not None and _remaining() <= 0:
+        # No time left for a single call; report the section's error instead
+        tiled_generations.inc(outcome="failed")
+        return {"jsx_code": "", "component_name": "Error", "success": False, "message": failed["message"]}
+    if failed is not None:
+        tiled_generations.inc(outcome="fallback")
+        return _generate_jsx_from_image(image_bytes, template)
+
+    with stage("image", "merge"):
+        jsx_code = merge_sections([(section["jsx_code"], section["component_name"]) for section in sections])
+    usage = {}
+    for section in sections:
+        for name, value in (section.get("usage") or {}).items():
+            usage[name] = usage.get(name, 0) + value
+    tiled_generations.inc(outcome="tiled")
+    result = {"jsx_code": jsx_code, "component_name": PAGE_COMPONENT, "success": True, "usage": usage}
+    return _validated("image", result)
+
+
+def _generate_jsx_from_text(text_description: str, template) -> dict:
     """Generate JSX code from text description using Gemini Pro"""
     try:
         # Check if API key is configured
-        if not api_key:
+        if not provider.is_configured:
             return {
                 "jsx_code": "",
                 "component_name": "Error",
@@ -27,79 +468,14 @@ def generate_jsx_from_text(text_description: str) -> dict:
                 "message": "GEMINI_API_KEY is not configured. Please set it in your .env file."
             }
         
-        # Get available models and use the best one
-        try:
-            available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-            # Prefer stable models over previews, flash over pro for speed
-            preferred = ['gemini-2.5-flash', 'gemini-2.0-flash', 'gemini-2.5-pro', 'gemini-1.5-flash', 'gemini-1.5-pro']
-            
-            model_name = None
-            for pref in preferred:
-                full_name = f'models/{pref}'
-                if full_name in available_models:
-                    model_name = pref
-                    break
-            
-            # If no preferred model found, use first available
-            if not model_name and available_models:
-                model_name = available_models[0].split('/')[-1]
-            
-            if not model_name:
-                return {
-                    "jsx_code": "",
-                    "component_name": "Error",
-                    "success": False,
-                    "message": "No Gemini models available. Please check your API key and permissions."
-                }
-            
-            model = genai.GenerativeModel(model_name)
-        except Exception as e:
-            return {
-                "jsx_code": "",
-                "component_name": "Error",
-                "success": False,
-                "message": f"Error accessing Gemini models: {str(e)}"
-            }
+        error = _resolve_model()
+        if error:
+            return error
         
-        prompt = f"""You are an expert React/Tailwind developer.
-Convert the following UI description into clean, readable React JSX code.
-
-Rules:
-- Use functional components
-- Use Tailwind CSS for all styling
-- No external UI libraries (only React and Tailwind)
-- Use semantic HTML
-- Follow mobile-first responsive design
-- Keep code minimal and production ready
-- Avoid inline styles
-- Name the component based on the page type
-- Export the component as default
-- Include proper imports (React, if needed)
-- Use className instead of class
-- Ensure proper indentation and formatting
-
-User Description:
-{text_description}
-
-Output only the JSX code inside <jsx> tags. Do not include any explanation outside the tags.
-The component should be a complete, runnable React component.
-
-Example format:
-<jsx>
-import React from 'react';
-
-const ComponentName = () => {{
-  return (
-    <div className="min-h-screen bg-gray-50">
-      {{/* Component content */}}
-    </div>
-  );
-}};
-
-export default ComponentName;
-</jsx>"""
-
-        response = model.generate_content(prompt)
+        prompt = template.render(text_description)
+
+        with stage("text", "model_call"):
+            response = call_model("text", prompt, deadline=_remaining(), template=template)
         
         # Handle case where response might be empty or None
         if not response or not hasattr(response, 'text') or not response.text:
@@ -110,30 +486,10 @@ export default ComponentName;
                 "message": "Empty response from Gemini API"
             }
         
-        response_text = response.text
-        
-        # Extract JSX from <jsx> tags
-        if "<jsx>" in response_text and "</jsx>" in response_text:
-            start = response_text.find("<jsx>") + 5
-            end = response_text.find("</jsx>")
-            jsx_code = response_text[start:end].strip()
-        else:
-            jsx_code = response_text.strip()
-        
-        # Extract component name from code
-        component_name = "GeneratedComponent"
-        if "const" in jsx_code and "=" in jsx_code:
-            try:
-                const_line = [line for line in jsx_code.split("\n") if "const" in line and "=" in line][0]
-                component_name = const_line.split("const")[1].split("=")[0].strip()
-            except:
-                pass
-        
-        return {
-            "jsx_code": jsx_code,
-            "component_name": component_name,
-            "success": True
-        }
+        with stage("text", "parse"):
+            result = parse_text_response(response.text)
+        result["usage"] = _usage(response)
+        return _validated("text", result)
     except ValueError as e:
         # Configuration errors
         return {
@@ -143,31 +499,14 @@ export default ComponentName;
             "message": str(e)
         }
     except Exception as e:
-        # Log the full error for debugging
-        error_msg = str(e)
-        error_type = type(e).__name__
-        
-        # Provide user-friendly error messages
-        if "API key" in error_msg or "authentication" in error_msg.lower():
-            error_msg = "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in .env file."
-        elif "quota" in error_msg.lower() or "limit" in error_msg.lower():
-            error_msg = "API quota exceeded. Please check your Gemini API usage limits."
-        elif "network" in error_msg.lower() or "connection" in error_msg.lower():
-            error_msg = "Network error. Please check your internet connection and try again."
-        
-        return {
-            "jsx_code": "",
-            "component_name": "Error",
-            "success": False,
-            "message": f"{error_type}: {error_msg}"
-        }
+        return _error_result(e, "text")
 
 
-def generate_jsx_from_image(image_bytes: bytes) -> dict:
+def _generate_jsx_from_image(image_bytes: bytes, template, seed: dict = None) -> dict:
     """Generate JSX code from image using Gemini Vision"""
     try:
         # Check if API key is configured
-        if not api_key:
+        if not provider.is_configured:
             return {
                 "jsx_code": "",
                 "component_name": "Error",
@@ -175,73 +514,21 @@ def generate_jsx_from_image(image_bytes: bytes) -> dict:
                 "message": "GEMINI_API_KEY is not configured. Please set it in your .env file."
             }
         
-        # Get available models for vision (all newer Gemini models support vision)
-        try:
-            available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-            # Prefer stable models over previews, flash over pro for speed
-            preferred = ['gemini-2.5-flash', 'gemini-2.0-flash', 'gemini-2.5-pro', 'gemini-1.5-flash', 'gemini-1.5-pro']
-            
-            model_name = None
-            for pref in preferred:
-                full_name = f'models/{pref}'
-                if full_name in available_models:
-                    model_name = pref
-                    break
-            
-            # If no preferred model found, use first available
-            if not model_name and available_models:
-                model_name = available_models[0].split('/')[-1]
-            
-            if not model_name:
-                return {
-                    "jsx_code": "",
-                    "component_name": "Error",
-                    "success": False,
-                    "message": "No Gemini vision models available. Please check your API key and permissions."
-                }
-            
-            model = genai.GenerativeModel(model_name)
-        except Exception as e:
-            return {
-                "jsx_code": "",
-                "component_name": "Error",
-                "success": False,
-                "message": f"Error accessing Gemini vision models: {str(e)}"
-            }
+        error = _resolve_model(vision=True)
+        if error:
+            return error
         
-        # Convert bytes to PIL Image
-        image = Image.open(io.BytesIO(image_bytes))
+        # Downscale and re-encode before upload (see app/image_preprocessing.py)
+        with stage("image", "image_preprocess"):
+            image = prepare_image(image_bytes)
         
-        prompt = """You are an expert frontend engineer and UI analyzer.
-Given an image, reverse-engineer the UI layout and generate accurate JSX + Tailwind code.
-
-Steps:
-1. Describe the UI structure (layout, sections, components)
-2. Identify all components (buttons, inputs, cards, navbars, etc.)
-3. Generate JSX layout matching the visual structure
-4. Add appropriate Tailwind CSS classes for styling
-5. Ensure clean and readable formatting
-
-Rules:
-- Use functional React components
-- Use Tailwind CSS for all styling
-- No external UI libraries
-- Use semantic HTML
-- Follow mobile-first responsive design
-- Match colors, spacing, and layout as closely as possible
-- Export the component as default
-- Use className instead of class
-- Include proper imports
-
-Output format - provide a JSON object with this structure:
-{{
-  "component_name": "DescriptiveComponentName",
-  "jsx": "complete JSX code here"
-}}
-
-The JSX should be a complete, runnable React component that recreates the UI shown in the image."""
-
-        response = model.generate_content([prompt, image])
+        template, prompt = _seeded(template, seed)
+
+        with stage("image", "model_call"):
+            response = call_model(
+                "image", [prompt, image], generation_config=_image_generation_config(), deadline=_remaining(),
+                template=template
+            )
         
         # Handle case where response might be empty or None
         if not response or not hasattr(response, 'text') or not response.text:
@@ -252,158 +539,10 @@ The JSX should be a complete, runnable React component that recreates the UI sho
                 "message": "Empty response from Gemini Vision API"
             }
         
-        response_text = response.text.strip()
-        
-        # Remove markdown code blocks if present (common in AI responses)
-        response_text = re.sub(r'```json\s*', '', response_text, flags=re.IGNORECASE)
-        response_text = re.sub(r'```jsx\s*', '', response_text, flags=re.IGNORECASE)
-        response_text = re.sub(r'```javascript\s*', '', response_text, flags=re.IGNORECASE)
-        response_text = re.sub(r'```typescript\s*', '', response_text, flags=re.IGNORECASE)
-        response_text = re.sub(r'```\s*$', '', response_text, flags=re.MULTILINE)
-        response_text = response_text.strip()
-        
-        # Try to extract JSON from response
-        # First, try to find and parse JSON object
-        try:
-            # Try to find JSON object - look for opening brace and try to parse
-            # Find the first { and try to parse from there
-            brace_start = response_text.find('{')
-            if brace_start != -1:
-                # Try to find matching closing brace
-                brace_count = 0
-                brace_end = -1
-                for i in range(brace_start, len(response_text)):
-                    if response_text[i] == '{':
-                        brace_count += 1
-                    elif response_text[i] == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            brace_end = i + 1
-                            break
-                
-                if brace_end > brace_start:
-                    json_str = response_text[brace_start:brace_end]
-                    try:
-                        result = json.loads(json_str)
-                        jsx_code = result.get("jsx", "")
-                        component_name = result.get("component_name", "GeneratedComponent")
-                        
-                        # Clean up the JSX code - unescape if needed
-                        if isinstance(jsx_code, str):
-                            # Unescape common escape sequences
-                            jsx_code = jsx_code.replace('\\n', '\n').replace('\\"', '"').replace("\\'", "'")
-                            jsx_code = jsx_code.replace('\\t', '\t').replace('\\r', '\r')
-                            # Remove any remaining markdown code blocks
-                            jsx_code = re.sub(r'```[a-z]*\s*', '', jsx_code, flags=re.IGNORECASE)
-                            jsx_code = re.sub(r'```\s*$', '', jsx_code, flags=re.MULTILINE)
-                        
-                        if jsx_code and jsx_code.strip():
-                            return {
-                                "jsx_code": jsx_code.strip(),
-                                "component_name": component_name,
-                                "success": True
-                            }
-                    except json.JSONDecodeError:
-                        # JSON parsing failed, try regex approach
-                        pass
-        except Exception:
-            pass
-        
-        # Fallback: Try regex patterns for JSON
-        json_patterns = [
-            r'\{"component_name"\s*:\s*"[^"]+",\s*"jsx"\s*:\s*"[^"]+"\}',
-            r'\{"jsx"\s*:\s*"[^"]+",\s*"component_name"\s*:\s*"[^"]+"\}',
-        ]
-        
-        for pattern in json_patterns:
-            json_match = re.search(pattern, response_text, re.DOTALL)
-            if json_match:
-                try:
-                    json_str = json_match.group()
-                    result = json.loads(json_str)
-                    jsx_code = result.get("jsx", "")
-                    component_name = result.get("component_name", "GeneratedComponent")
-                    
-                    if isinstance(jsx_code, str):
-                        jsx_code = jsx_code.replace('\\n', '\n').replace('\\"', '"').replace("\\'", "'")
-                        jsx_code = jsx_code.replace('\\t', '\t').replace('\\r', '\r')
-                        jsx_code = re.sub(r'```[a-z]*\s*', '', jsx_code, flags=re.IGNORECASE)
-                        jsx_code = re.sub(r'```\s*$', '', jsx_code, flags=re.MULTILINE)
-                    
-                    if jsx_code and jsx_code.strip():
-                        return {
-                            "jsx_code": jsx_code.strip(),
-                            "component_name": component_name,
-                            "success": True
-                        }
-                except Exception:
-                    continue
-        
-        # Fallback: try to extract JSX directly (if JSON extraction failed)
-        # If response still looks like JSON, try to extract just the jsx field value
-        if '"jsx"' in response_text and '"component_name"' in response_text:
-            # Try to extract jsx value using regex
-            jsx_match = re.search(r'"jsx"\s*:\s*"([^"]*(?:\\.[^"]*)*)"', response_text, re.DOTALL)
-            name_match = re.search(r'"component_name"\s*:\s*"([^"]+)"', response_text)
-            
-            if jsx_match:
-                jsx_code = jsx_match.group(1)
-                # Unescape the JSX code
-                jsx_code = jsx_code.replace('\\n', '\n').replace('\\"', '"').replace("\\'", "'")
-                jsx_code = jsx_code.replace('\\t', '\t').replace('\\r', '\r')
-                component_name = name_match.group(1) if name_match else "GeneratedComponent"
-                
-                # Clean up
-                jsx_code = re.sub(r'```[a-z]*\s*', '', jsx_code, flags=re.IGNORECASE)
-                jsx_code = re.sub(r'```\s*$', '', jsx_code, flags=re.MULTILINE)
-                
-                if jsx_code and jsx_code.strip():
-                    return {
-                        "jsx_code": jsx_code.strip(),
-                        "component_name": component_name,
-                        "success": True
-                    }
-        
-        # Final fallback: try to extract JSX from <jsx> tags or use response as-is
-        if "<jsx>" in response_text and "</jsx>" in response_text:
-            start = response_text.find("<jsx>") + 5
-            end = response_text.find("</jsx>")
-            jsx_code = response_text[start:end].strip()
-        else:
-            # If it's still JSON-like, don't use it - return error
-            if response_text.strip().startswith('{') and '"jsx"' in response_text:
-                return {
-                    "jsx_code": "",
-                    "component_name": "Error",
-                    "success": False,
-                    "message": "Failed to extract JSX from JSON response. The AI returned JSON format that couldn't be parsed."
-                }
-            jsx_code = response_text.strip()
-        
-        # Clean up the code - remove markdown blocks and unescape
-        jsx_code = re.sub(r'```[a-z]*\s*', '', jsx_code, flags=re.IGNORECASE)
-        jsx_code = re.sub(r'```\s*$', '', jsx_code, flags=re.MULTILINE)
-        jsx_code = jsx_code.replace('\\n', '\n').replace('\\"', '"').replace("\\'", "'")
-        
-        # Extract component name
-        component_name = "GeneratedComponent"
-        patterns = [
-            r'const\s+(\w+)\s*=',
-            r'function\s+(\w+)\s*\(',
-            r'export\s+(?:const|function)\s+(\w+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, jsx_code)
-            if match:
-                component_name = match.group(1)
-                break
-        
-        return {
-            "jsx_code": jsx_code,
-            "component_name": component_name,
-            "success": True
-        }
+        with stage("image", "parse"):
+            result = _parse_image(response.text)
+        result["usage"] = _usage(response)
+        return _validated("image", result)
     except ValueError as e:
         # Configuration errors
         return {
@@ -413,22 +552,120 @@ The JSX should be a complete, runnable React component that recreates the UI sho
             "message": str(e)
         }
     except Exception as e:
-        # Log the full error for debugging
-        error_msg = str(e)
-        error_type = type(e).__name__
-        
-        # Provide user-friendly error messages
-        if "API key" in error_msg or "authentication" in error_msg.lower():
-            error_msg = "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in .env file."
-        elif "quota" in error_msg.lower() or "limit" in error_msg.lower():
-            error_msg = "API quota exceeded. Please check your Gemini API usage limits."
-        elif "network" in error_msg.lower() or "connection" in error_msg.lower():
-            error_msg = "Network error. Please check your internet connection and try again."
-        
-        return {
-            "jsx_code": "",
-            "component_name": "Error",
-            "success": False,
-            "message": f"{error_type}: {error_msg}"
-        }
+        return _error_result(e, "image")
+
+
+def _stream_generation(kind: str, payload, template, use_cache: bool, build_contents, parse, stream_filter, vision: bool = False, generation_config=None, user: str = None):
+    """Yield ("delta", {"text"}) events as the model streams, then one
+    ("done", result) or ("error", {"message"}) event"""
+    if not provider.is_configured:
+        yield "error", {"message": "GEMINI_API_KEY is not configured. Please set it in your .env file."}
+        return
+
+    error = _resolve_model(vision=vision)
+    if error:
+        yield "error", {"message": error["message"]}
+        return
+
+    key = None
+    trace = {"model": resolver.current_model}
+    start = time.perf_counter()
+    if RESPONSE_CACHE_ENABLED:
+        key = make_key(kind, payload, resolver.resolve(), template.name)
+        trace["key"] = key
+        cached = response_cache.get(key) if use_cache else None
+        if cached is not None:
+            trace["cached"] = True
+            _record_generation(kind, payload, template.name, user, cached, trace, time.perf_counter() - start)
+            yield "delta", {"text": cached["jsx_code"]}
+            yield "done", cached
+            return
+
+    entry, seed = None, None
+    if kind == "image":
+        entry, stored, distance = _near_duplicate(payload, template.name, use_cache, user, trace)
+        if stored is not None:
+            near_duplicates.inc(mode=IMAGE_INDEX_MODE)
+            trace["near_duplicate"] = distance
+            if IMAGE_INDEX_MODE != "seed":
+                trace["cached"] = True
+                _record_generation(kind, payload, template.name, user, stored, trace, time.perf_counter() - start)
+                if key:
+                    response_cache.set(key, stored)
+                yield "delta", {"text": stored["jsx_code"]}
+                yield "done", dict(stored)
+                return
+            seed = stored
+    call_template = TEMPLATES["image-seed-v1"] if seed is not None else template
+
+    generations_in_flight.inc(kind=kind)
+    call_start = time.perf_counter()
+    _call_deadline.set(time.monotonic() + MODEL_CALL_DEADLINE_SECONDS)
+    usage = {}
+    try:
+        contents = build_contents(payload, seed) if seed is not None else build_contents(payload)
+        chunks = []
+        for chunk in stream_model(kind, contents, generation_config=generation_config, template=call_template):
+            text = chunk.text
+            # Token counts arrive with the final chunk
+            usage = _usage(chunk) or usage
+            chunks.append(text)
+            delta = stream_filter.feed(text)
+            if delta:
+                yield "delta", {"text": delta}
+        delta = stream_filter.flush()
+        if delta:
+            yield "delta", {"text": delta}
+
+        observe_stage(kind, "model_call", time.perf_counter() - call_start)
+
+        response_text = "".join(chunks)
+        if not response_text.strip():
+            result = {"success": False, "message": "Empty response from Gemini API"}
+        else:
+            with stage(kind, "parse"):
+                result = parse(response_text)
+            result["usage"] = usage
+            result = _validated(kind, result)
+    except ValueError as e:
+        result = {"success": False, "message": str(e)}
+    except Exception as e:
+        result = _error_result(e, kind)
+    finally:
+        generations_in_flight.dec(kind=kind)
+
+    outcome = "success" if result["success"] else "error"
+    generations.inc(kind=kind, model=resolver.current_model or "unknown", outcome=outcome)
+    _record_generation(kind, payload, template.name, user, result, trace, time.perf_counter() - start)
+
+    if not result["success"]:
+        yield "error", {"message": result["message"]}
+        return
+    if key:
+        response_cache.set(key, result)
+    if entry is not None:
+        _index_image(entry)
+    yield "done", result
+
+
+def stream_jsx_from_text(text_description: str, use_cache: bool = True, user: str = None):
+    """Stream JSX for a text description as it is generated"""
+    text_description, error = _fit_text(text_description)
+    if error:
+        return iter([("error", {"message": error["message"]})])
+    template = select_template("text", text_description)
+    return _stream_generation(
+        "text", text_description, template, use_cache,
+        template.render, parse_text_response, JSXTagFilter(), user=user
+    )
+
 
+def stream_jsx_from_image(image_bytes: bytes, use_cache: bool = True, user: str = None):
+    """Stream JSX for an image as it is generated"""
+    template = select_template("image", image_bytes)
+    return _stream_generation(
+        "image", image_bytes, template, use_cache,
+        lambda data, seed=None: [_seeded(template, seed)[1], prepare_image(data)],
+        _parse_image, JSONFieldFilter(), vision=True,
+        generation_config=_image_generation_config(), user=user
+    )
@@ -0,0 +1,296 @@
+import os
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+from app.response_cache import make_key
+
+load_dotenv()
+
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "true").lower() == "true"
+# "sqlite" (default, embedded) or "mongo" (needs `pip install pymongo` and MONGODB_URI)
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "sqlite").lower()
+HISTORY_PATH = os.getenv("HISTORY_PATH", "history.sqlite")
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+MONGODB_DATABASE = os.getenv("MONGODB_DATABASE", "instamock")
+# Records are written by a background thread in batches of up to this size,
+# at least every HISTORY_FLUSH_SECONDS; beyond HISTORY_QUEUE_SIZE they are dropped
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "100"))
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "1"))
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))
+# Load recent successful generations into the response cache at startup
+HISTORY_WARM_START = os.getenv("HISTORY_WARM_START", "true").lower() == "true"
+
+FIELDS = (
+    "id", "created_at", "user", "kind", "input_hash", "input_text", "model", "prompt_version",
+    "latency_ms", "prompt_tokens", "output_tokens", "cached", "success", "message",
+    "component_name", "jsx_code", "parses", "syntax_error",
+)
+
+
+def make_record(kind: str, payload, prompt_version: str, user, result: dict, trace: dict, seconds: float) -> dict:
+    """Build a history record for one finished generation"""
+    model = trace.get("model") or "unknown"
+    usage = result.get("usage") or {}
+    cached = trace.get("cached", False)
+    # Requests served by a cache or another request's model call cost no tokens
+    free = cached or trace.get("coalesced", False)
+    return {
+        "id": uuid.uuid4().hex,
+        "created_at": time.time(),
+        "user": user or "anonymous",
+        "kind": kind,
+        # The response cache key, so history can warm the cache after a restart
+        "input_hash": trace.get("key") or make_key(kind, payload, model, prompt_version),
+        "input_text": payload if isinstance(payload, str) else None,
+        "model": model,
+        "prompt_version": prompt_version,
+        "latency_ms": round(seconds * 1000, 2),
+        "prompt_tokens": 0 if free else usage.get("prompt_tokens", 0),
+        "output_tokens": 0 if free else usage.get("output_tokens", 0),
+        "cached": cached,
+        "success": bool(result.get("success")),
+        "message": result.get("message"),
+        "component_name": result.get("component_name", ""),
+        "jsx_code": result.get("jsx_code", ""),
+        "parses": result.get("parses"),
+        "syntax_error": result.get("syntax_error"),
+    }
+
+
+class SQLiteHistoryStore:
+    """Embedded store; one connection shared by the writer thread and readers"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id TEXT PRIMARY KEY, created_at REAL NOT NULL, user TEXT NOT NULL, kind TEXT NOT NULL, "
+                "input_hash TEXT NOT NULL, input_text TEXT, model TEXT, prompt_version TEXT, "
+                "latency_ms REAL, prompt_tokens INTEGER, output_tokens INTEGER, cached INTEGER, "
+                "success INTEGER, message TEXT, component_name TEXT, jsx_code TEXT, "
+                "parses INTEGER, syntax_error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS history_user_time ON history (user, created_at DESC)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS history_time ON history (created_at DESC)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS history_input_hash ON history (input_hash)")
+            self._conn.commit()
+
+    def write_many(self, records: list):
+        rows = [tuple(record[field] for field in FIELDS) for record in records]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO history ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                rows,
+            )
+            self._conn.commit()
+
+    def _rows(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        records = []
+        for row in rows:
+            record = dict(zip(FIELDS, row))
+            record["cached"] = bool(record["cached"])
+            record["success"] = bool(record["success"])
+            record["parses"] = None if record["parses"] is None else bool(record["parses"])
+            records.append(record)
+        return records
+
+    def query(self, user=None, kind=None, input_hash=None, before=None, before_id=None, limit: int = 20) -> list:
+        """Newest first; `before` and `before_id` are the created_at and id of
+        the last record already seen, so records sharing a timestamp are not skipped"""
+        clauses, params = [], []
+        for column, value in (("user", user), ("kind", kind), ("input_hash", input_hash)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if before is not None and before_id is not None:
+            clauses.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend((before, before, before_id))
+        elif before is not None:
+            clauses.append("created_at < ?")
+            params.append(before)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._rows(
+            f"SELECT {', '.join(FIELDS)} FROM history {where}ORDER BY created_at DESC, id DESC LIMIT ?",
+            tuple(params) + (limit,),
+        )
+
+    def get(self, record_id: str):
+        rows = self._rows(f"SELECT {', '.join(FIELDS)} FROM history WHERE id = ?", (record_id,))
+        return rows[0] if rows else None
+
+    def recent_successes(self, since: float, limit: int) -> list:
+        """Newest successful, non-cached records, one per input hash"""
+        return self._rows(
+            f"SELECT {', '.join(FIELDS)} FROM history WHERE id IN ("
+            "SELECT id FROM history h WHERE success = 1 AND cached = 0 AND created_at >= ? "
+            "AND created_at = (SELECT MAX(created_at) FROM history WHERE input_hash = h.input_hash "
+            "AND success = 1 AND cached = 0)) ORDER BY created_at DESC LIMIT ?",
+            (since, limit),
+        )
+
+
+class MongoHistoryStore:
+    """MongoDB store for deployments that already run Mongo (HISTORY_BACKEND=mongo)"""
+
+    def __init__(self, uri: str, database: str):
+        try:
+            from pymongo import MongoClient, DESCENDING
+        except ImportError:
+            raise RuntimeError("HISTORY_BACKEND=mongo requires pymongo. Install it with `pip install pymongo`.")
+        self._descending = DESCENDING
+        self._collection = MongoClient(uri, serverSelectionTimeoutMS=5000)[database]["history"]
+        self._indexed = False
+
+    def _ensure_indexes(self):
+        # Deferred to the first write so an unreachable server cannot block startup
+        if self._indexed:
+            return
+        self._collection.create_index([("user", 1), ("created_at", self._descending)])
+        self._collection.create_index([("created_at", self._descending)])
+        self._collection.create_index("input_hash")
+        self._indexed = True
+
+    def write_many(self, records: list):
+        self._ensure_indexes()
+        self._collection.insert_many([dict(record, _id=record["id"]) for record in records], ordered=False)
+
+    def _records(self, cursor) -> list:
+        return [{field: document.get(field) for field in FIELDS} for document in cursor]
+
+    def query(self, user=None, kind=None, input_hash=None, before=None, before_id=None, limit: int = 20) -> list:
+        match = {key: value for key, value in (("user", user), ("kind", kind), ("input_hash", input_hash)) if value is not None}
+        if before is not None and before_id is not None:
+            match["$or"] = [{"created_at": {"$lt": before}}, {"created_at": before, "_id": {"$lt": before_id}}]
+        elif before is not None:
+            match["created_at"] = {"$lt": before}
+        order = [("created_at", self._descending), ("_id", self._descending)]
+        return self._records(self._collection.find(match).sort(order).limit(limit))
+
+    def get(self, record_id: str):
+        document = self._collection.find_one({"_id": record_id})
+        return self._records([document])[0] if document else None
+
+    def recent_successes(self, since: float, limit: int) -> list:
+        pipeline = [
+            {"$match": {"success": True, "cached": False, "created_at": {"$gte": since}}},
+            {"$sort": {"created_at": -1}},
+            {"$group": {"_id": "$input_hash", "record": {"$first": "$$ROOT"}}},
+            {"$replaceRoot": {"newRoot": "$record"}},
+            {"$sort": {"created_at": -1}},
+            {"$limit": limit},
+        ]
+        return self._records(self._collection.aggregate(pipeline))
+
+
+class HistoryWriter:
+    """Batches history records on a background thread, off the request path.
+
+    `record()` never blocks: when the queue is full the record is dropped
+    and counted, so a slow or unavailable store cannot stall generations.
+    """
+
+    def __init__(self, store, batch_size: int = HISTORY_BATCH_SIZE, flush_seconds: float = HISTORY_FLUSH_SECONDS,
+                 queue_size: int = HISTORY_QUEUE_SIZE):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._stop = object()
+
+    def record(self, record: dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self.store is None or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flush what is queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(self._stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            batch = []
+            stopping = False
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is self._stop:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch: list):
+        try:
+            self.store.write_many(batch)
+            self.written += len(batch)
+        except Exception:
+            # History is best-effort; a failed batch is counted, not retried
+            self.failed += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": HISTORY_ENABLED,
+            "backend": HISTORY_BACKEND,
+            "written": self.written,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+def warm_cache(store, cache, ttl: float, limit: int) -> int:
+    """Load recent successful generations into the response cache; returns the count"""
+    now = time.time()
+    loaded = 0
+    for record in reversed(store.recent_successes(now - ttl, limit)):
+        value = {
+            "jsx_code": record["jsx_code"], "component_name": record["component_name"], "success": True,
+            "parses": record["parses"], "syntax_error": record["syntax_error"],
+        }
+        cache.preload(record["input_hash"], value, age=now - record["created_at"])
+        loaded += 1
+    return loaded
+
+
+def _load_store():
+    if not HISTORY_ENABLED:
+        return None
+    if HISTORY_BACKEND == "mongo":
+        return MongoHistoryStore(MONGODB_URI, MONGODB_DATABASE)
+    if HISTORY_BACKEND == "sqlite":
+        return SQLiteHistoryStore(HISTORY_PATH)
+    raise ValueError(f"Unknown HISTORY_BACKEND '{HISTORY_BACKEND}'. Use 'sqlite' or 'mongo'.")
+
+
+history_store = _load_store()
+history_writer = HistoryWriter(history_store)
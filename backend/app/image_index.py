@@ -0,0 +1,315 @@
+import os
+import io
+import json
+import random
+import struct
+import asyncio
+import threading
+from array import array
+from PIL import Image, ImageOps
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IMAGE_INDEX_ENABLED = os.getenv("IMAGE_INDEX_ENABLED", "false").lower() == "true"
+# "seed" still calls the model but gives it the stored JSX to start from;
+# "return" serves a near-duplicate's stored result without a model call, and
+# only matches the same client's earlier screenshots, since screens sharing a
+# layout can still differ in text and data
+IMAGE_INDEX_MODE = os.getenv("IMAGE_INDEX_MODE", "seed").lower()
+# Largest Hamming distance (of 256 bits) that counts as the same screenshot
+IMAGE_INDEX_MAX_DISTANCE = int(os.getenv("IMAGE_INDEX_MAX_DISTANCE", "10"))
+IMAGE_INDEX_MAX_ENTRIES = int(os.getenv("IMAGE_INDEX_MAX_ENTRIES", "500000"))
+IMAGE_INDEX_PATH = os.getenv("IMAGE_INDEX_PATH", "image_index.bin")
+IMAGE_INDEX_SNAPSHOT_SECONDS = float(os.getenv("IMAGE_INDEX_SNAPSHOT_SECONDS", "300"))
+
+HASH_SIZE = 16
+HASH_BITS = HASH_SIZE * HASH_SIZE
+# The hash is split into 16-bit chunks used as exact-match keys (multi-index
+# hashing): two hashes within distance < CHUNKS share at least one chunk, so
+# a lookup only compares against entries in the query's CHUNKS buckets
+CHUNKS = HASH_BITS // 16
+# Each chunk takes bits from all over the image rather than one row, so blank
+# margins don't pile every screenshot into the same bucket
+_BIT_ORDER = list(range(HASH_BITS))
+random.Random(HASH_BITS).shuffle(_BIT_ORDER)
+# Screenshots whose aspect ratios differ by more than this never match
+_ASPECT_TOLERANCE = 0.05
+_SNAPSHOT_MAGIC = b"IMIX2"
+_EXIF_ORIENTATION = 0x0112
+
+
+def image_hash(image_bytes: bytes) -> tuple:
+    """256-bit difference hash (dHash) of an image and its aspect ratio.
+
+    The image is reduced to a 17x16 grayscale thumbnail and each bit records
+    whether a pixel is brighter than its right-hand neighbour, which
+    survives re-compression, rescaling and small pixel changes.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    # JPEGs decode at reduced scale; exif_transpose() copies, so only rotate when tagged
+    image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+    if image.getexif().get(_EXIF_ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    aspect = image.width / image.height
+    pixels = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX).tobytes()
+    row = HASH_SIZE + 1
+    bits = [
+        pixels[y * row + x] > pixels[y * row + x + 1]
+        for y in range(HASH_SIZE)
+        for x in range(HASH_SIZE)
+    ]
+    value = 0
+    for position in reversed(_BIT_ORDER):
+        value = (value << 1) | bits[position]
+    return value, aspect
+
+
+def _chunks(value: int) -> array:
+    """The CHUNKS 16-bit pieces of a hash"""
+    return array("H", value.to_bytes(HASH_BITS // 8, "little"))
+
+
+class ImageIndex:
+    """In-memory near-duplicate index over screenshot hashes.
+
+    Entries hold a hash, its aspect ratio, a scope (model and prompt
+    template, like the response cache key) and the 32-byte response cache
+    key of the generation, about 150 bytes each. Past `max_entries` the
+    oldest tenth is dropped at once and the structures are rebuilt on a
+    background thread, keeping only the scopes still in use. Buckets that hold a large share of all entries
+    (near-blank screenshots) are skipped on lookup, trading a rare miss for
+    bounded latency.
+    """
+
+    def __init__(self, max_entries: int = IMAGE_INDEX_MAX_ENTRIES, max_distance: int = IMAGE_INDEX_MAX_DISTANCE):
+        self.max_entries = max_entries
+        # The chunk guarantee only holds below CHUNKS
+        self.max_distance = min(max_distance, CHUNKS - 1)
+        self.lookups = 0
+        self.matches = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._compacting = False
+        self._rebuilds = 0
+        self._snapshot_task = None
+        self._hashes = []
+        self._aspects = array("f")
+        self._scope_ids = array("I")
+        self._keys = bytearray()
+        self._scopes = {}
+        self._buckets = [{} for _ in range(CHUNKS)]
+        # Entries before this position are evicted and skipped until the next rebuild
+        self._start = 0
+
+    def __len__(self) -> int:
+        return len(self._hashes) - self._start
+
+    def _scope_id(self, scope: str) -> int:
+        scope_id = self._scopes.get(scope)
+        if scope_id is None:
+            scope_id = self._scopes[scope] = len(self._scopes)
+        return scope_id
+
+    def _append(self, value: int, aspect: float, scope_id: int, key: bytes):
+        position = len(self._hashes)
+        # The typed arrays can reject a value, so they go first and a failed
+        # append leaves the columns in step
+        self._scope_ids.append(scope_id)
+        try:
+            self._aspects.append(aspect)
+        except BaseException:
+            self._scope_ids.pop()
+            raise
+        self._hashes.append(value)
+        self._keys += key
+        for buckets, chunk in zip(self._buckets, _chunks(value)):
+            bucket = buckets.get(chunk)
+            if bucket is None:
+                bucket = buckets[chunk] = array("I")
+            bucket.append(position)
+
+    def _copy(self, start: int) -> tuple:
+        """The entries from position `start` on, copied for rebuilding outside the lock"""
+        scopes = {scope_id: scope for scope, scope_id in self._scopes.items()}
+        return self._hashes[start:], self._aspects[start:], self._scope_ids[start:], bytes(self._keys[start * 32:]), scopes
+
+    def _extend(self, entries: tuple):
+        """Append entries in the form returned by _copy(); scopes no entry uses are dropped"""
+        hashes, aspects, scope_ids, keys, scopes = entries
+        ids = {}
+        for i, value in enumerate(hashes):
+            scope_id = ids.get(scope_ids[i])
+            if scope_id is None:
+                scope_id = ids[scope_ids[i]] = self._scope_id(scopes[scope_ids[i]])
+            self._append(value, aspects[i], scope_id, keys[i * 32:(i + 1) * 32])
+
+    def _swap(self, fresh: "ImageIndex", carry_from: int):
+        """Take over `fresh`'s structures, carrying over this index's entries
+        from position `carry_from` on. Call with the lock held."""
+        fresh._extend(self._copy(carry_from))
+        self._hashes, self._aspects, self._scope_ids = fresh._hashes, fresh._aspects, fresh._scope_ids
+        self._keys, self._scopes, self._buckets, self._start = fresh._keys, fresh._scopes, fresh._buckets, fresh._start
+        self._rebuilds += 1
+
+    def add(self, value: int, aspect: float, scope: str, key: str):
+        key = bytes.fromhex(key)
+        if len(key) != 32:
+            raise ValueError("Image index keys are 32-byte response cache keys")
+        with self._lock:
+            self._append(value, aspect, self._scope_id(scope), key)
+            self._dirty = True
+            if len(self) <= self.max_entries:
+                return
+            self._start += max(self.max_entries // 10, 1)
+            if self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact, daemon=True).start()
+
+    def _compact(self):
+        """Rebuild without the evicted entries, holding the lock only to copy and swap"""
+        try:
+            with self._lock:
+                start, rebuilds = self._start, self._rebuilds
+                entries = self._copy(start)
+            fresh = ImageIndex(self.max_entries, self.max_distance)
+            fresh._extend(entries)
+            with self._lock:
+                # A snapshot load swapped in meanwhile: the next eviction compacts
+                if self._rebuilds == rebuilds:
+                    fresh._start = self._start - start
+                    self._swap(fresh, start + len(entries[0]))
+                self._compacting = False
+        except BaseException:
+            with self._lock:
+                self._compacting = False
+            raise
+
+    def nearest(self, value: int, aspect: float, scope: str):
+        """(response cache key, distance) of the closest entry within the threshold, or None"""
+        with self._lock:
+            self.lookups += 1
+            scope_id = self._scopes.get(scope)
+            if scope_id is None:
+                return None
+            crowded = max(len(self) // 20, 1000)
+            best, best_distance, seen = None, self.max_distance + 1, set()
+            for buckets, chunk in zip(self._buckets, _chunks(value)):
+                bucket = buckets.get(chunk)
+                if bucket is None or len(bucket) > crowded:
+                    continue
+                for position in bucket:
+                    if position in seen or position < self._start:
+                        continue
+                    seen.add(position)
+                    distance = (self._hashes[position] ^ value).bit_count()
+                    if (
+                        distance < best_distance
+                        and self._scope_ids[position] == scope_id
+                        and abs(self._aspects[position] - aspect) <= _ASPECT_TOLERANCE * aspect
+                    ):
+                        best, best_distance = position, distance
+                if best_distance == 0:
+                    break
+            if best is None:
+                return None
+            self.matches += 1
+            return self._keys[best * 32:(best + 1) * 32].hex(), best_distance
+
+    def save(self, path: str):
+        """Write a snapshot atomically: header, scopes, then fixed-size records"""
+        with self._lock:
+            hashes, aspects, scope_ids, keys, scopes = self._copy(self._start)
+            self._dirty = False
+        header = json.dumps({scope: scope_id for scope_id, scope in scopes.items()}).encode()
+        records = b"".join(
+            value.to_bytes(HASH_BITS // 8, "big") + struct.pack("<fI", aspects[i], scope_ids[i]) + keys[i * 32:(i + 1) * 32]
+            for i, value in enumerate(hashes)
+        )
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_SNAPSHOT_MAGIC + struct.pack("<I", len(header)) + header + records)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> int:
+        """Put the newest `max_entries` screenshots of a snapshot ahead of the
+        current entries; returns the number loaded. Lookups keep being served
+        while the snapshot is read."""
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(_SNAPSHOT_MAGIC):
+            raise ValueError(f"{path} is not an image index snapshot")
+        offset = len(_SNAPSHOT_MAGIC)
+        (header_length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        scopes = {int(scope_id): scope for scope, scope_id in json.loads(data[offset:offset + header_length]).items()}
+        offset += header_length
+        record = HASH_BITS // 8 + 8 + 32
+        offset += max((len(data) - offset) // record - self.max_entries, 0) * record
+
+        hashes, aspects, scope_ids, keys = [], array("f"), array("I"), bytearray()
+        for start in range(offset, len(data) - record + 1, record):
+            hashes.append(int.from_bytes(data[start:start + HASH_BITS // 8], "big"))
+            aspect, scope_id = struct.unpack_from("<fI", data, start + HASH_BITS // 8)
+            aspects.append(aspect)
+            scope_ids.append(scope_id)
+            keys += data[start + HASH_BITS // 8 + 8:start + record]
+        fresh = ImageIndex(self.max_entries, self.max_distance)
+        fresh._extend((hashes, aspects, scope_ids, bytes(keys), scopes))
+        with self._lock:
+            # Oldest snapshot entries give way to screenshots indexed meanwhile
+            fresh._start = max(len(hashes) + len(self) - self.max_entries, 0)
+            self._swap(fresh, self._start)
+        return len(hashes)
+
+    async def _snapshot_loop(self, path: str, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            if self._dirty:
+                try:
+                    await asyncio.to_thread(self.save, path)
+                except OSError:
+                    # Keep serving from memory; the next interval retries
+                    pass
+
+    def start_snapshots(self, path: str = IMAGE_INDEX_PATH, interval: float = IMAGE_INDEX_SNAPSHOT_SECONDS):
+        """Periodically save the index on the running event loop while it changes"""
+        if interval <= 0 or self._snapshot_task is not None:
+            return
+        self._snapshot_task = asyncio.get_running_loop().create_task(self._snapshot_loop(path, interval))
+
+    async def stop_snapshots(self, path: str = IMAGE_INDEX_PATH):
+        """Stop the snapshot task and write a final snapshot"""
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        if self._dirty:
+            await asyncio.to_thread(self.save, path)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": IMAGE_INDEX_ENABLED,
+            "mode": IMAGE_INDEX_MODE,
+            "entries": len(self),
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
+
+
+image_index = ImageIndex()
+
+
+def load_image_index() -> int:
+    """Load the snapshot at startup; a missing or unreadable one starts empty"""
+    try:
+        return image_index.load(IMAGE_INDEX_PATH)
+    except (OSError, ValueError, struct.error):
+        return 0
@@ -0,0 +1,309 @@
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from dotenv import load_dotenv
+
+from app.gemini_client import generate_jsx_from_text, generate_jsx_from_image
+from app.executor import run_generation, GenerationTimeoutError, GENERATION_TIMEOUT_SECONDS
+from app.admission import admitted, AdmissionRejectedError
+
+load_dotenv()
+
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "true").lower() == "true"
+JOBS_PATH = os.getenv("JOBS_PATH", "jobs.sqlite")
+# Jobs run concurrently on this many workers; more wait in a bounded queue
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_QUEUE_SIZE = int(os.getenv("JOBS_QUEUE_SIZE", "100"))
+# Finished jobs (and their results) are deleted after this long
+JOBS_TTL_SECONDS = float(os.getenv("JOBS_TTL_SECONDS", "86400"))
+# A running job belongs to the process that claimed it until this long has
+# passed; after that (the process died) another process may take it over.
+# The owner renews the lease every third of this while the job runs.
+JOBS_LEASE_SECONDS = GENERATION_TIMEOUT_SECONDS + 30
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+_GENERATORS = {"text": generate_jsx_from_text, "image": generate_jsx_from_image}
+_FIELDS = (
+    "id", "kind", "status", "user", "idempotency_key", "use_cache", "created_at", "updated_at",
+    "jsx_code", "component_name", "message", "parses", "syntax_error",
+)
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job cannot be queued because the queue is full"""
+
+
+class JobStore:
+    """SQLite job table. Inputs are kept until the job finishes so queued and
+    interrupted jobs can be resumed after a restart."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, user TEXT NOT NULL, "
+                "idempotency_key TEXT, use_cache INTEGER NOT NULL, created_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL, jsx_code TEXT, component_name TEXT, message TEXT, parses INTEGER, "
+                "syntax_error TEXT, payload BLOB, worker TEXT, lease_until REAL)"
+            )
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS jobs_idempotency ON jobs (user, idempotency_key) "
+                "WHERE idempotency_key IS NOT NULL"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at)")
+            self._conn.commit()
+
+    def _job(self, row) -> dict:
+        if row is None:
+            return None
+        job = dict(zip(_FIELDS, row))
+        job["use_cache"] = bool(job["use_cache"])
+        job["parses"] = None if job["parses"] is None else bool(job["parses"])
+        return job
+
+    def create(self, kind: str, payload: bytes, use_cache: bool, user: str, idempotency_key=None) -> tuple:
+        """Insert a queued job; returns (job, created). An existing job with the
+        same user and idempotency key is returned instead of a new one."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, status, user, idempotency_key, use_cache, created_at, updated_at, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, QUEUED, user, idempotency_key, int(use_cache), now, now, payload),
+                )
+                self._conn.commit()
+                created = True
+            except sqlite3.IntegrityError:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE user = ? AND idempotency_key = ?", (user, idempotency_key)
+                ).fetchone()
+                job_id, created = row[0], False
+        return self.get(job_id), created
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row)
+
+    def payload(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def update(self, job_id: str, status: str, jsx_code=None, component_name=None, message=None,
+               parses=None, syntax_error=None):
+        # Drop the input once the job is finished; only the result is kept
+        clear_payload = ", payload = NULL" if status in FINISHED else ""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, jsx_code = ?, component_name = ?, message = ?, "
+                f"parses = ?, syntax_error = ?{clear_payload} WHERE id = ?",
+                (status, time.time(), jsx_code, component_name, message,
+                 None if parses is None else int(parses), syntax_error, job_id),
+            )
+            self._conn.commit()
+
+    def claim(self, job_id: str, worker: str, lease_seconds: float = JOBS_LEASE_SECONDS) -> bool:
+        """Mark a job running for `worker`; False if it is finished or another
+        worker's lease on it has not run out (processes may share the store)"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, updated_at = ? "
+                "WHERE id = ? AND (status = ? OR (status = ? AND (lease_until IS NULL OR lease_until < ?)))",
+                (RUNNING, worker, now + lease_seconds, now, job_id, QUEUED, RUNNING, now),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def renew(self, job_id: str, worker: str, lease_seconds: float = JOBS_LEASE_SECONDS) -> bool:
+        """Extend `worker`'s lease on a running job; False if it no longer holds it"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ? AND worker = ?",
+                (now + lease_seconds, job_id, RUNNING, worker),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def unfinished(self) -> list:
+        """Ids of queued jobs and of running jobs whose lease ran out, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND (lease_until IS NULL OR lease_until < ?)) "
+                "ORDER BY created_at",
+                (QUEUED, RUNNING, time.time()),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self, before: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (SUCCEEDED, FAILED, before)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+
+class JobManager:
+    """Runs queued jobs on a fixed pool of asyncio workers.
+
+    Each worker hands the blocking generation to the generation pool (see
+    app/executor.py), so JOBS_WORKERS bounds how many jobs use it at once.
+    Waiters are woken through per-job events; other processes sharing the
+    store are picked up by polling.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOBS_WORKERS, queue_size: int = JOBS_QUEUE_SIZE):
+        self.store = store
+        self.workers = workers
+        self.queue_size = queue_size
+        self.completed = 0
+        self.failed = 0
+        self.worker_id = uuid.uuid4().hex
+        self._queue = None
+        self._reserved = 0
+        self._tasks = []
+        self._events = {}
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        await asyncio.to_thread(self.store.purge, time.time() - JOBS_TTL_SECONDS)
+        # Resume jobs that were queued or running when the server stopped
+        for job_id in await asyncio.to_thread(self.store.unfinished):
+            try:
+                self._queue.put_nowait(job_id)
+            except asyncio.QueueFull:
+                await asyncio.to_thread(
+                    self.store.update, job_id, FAILED, message="Job could not be resumed: queue is full"
+                )
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Anything still queued or running stays in the store and resumes on the next start
+        self._tasks = []
+
+    async def submit(self, kind: str, payload: bytes, use_cache: bool, user: str, idempotency_key=None) -> dict:
+        if self._queue is None:
+            raise JobQueueFullError("Job workers are not running")
+        # Hold a place in the queue while the row is written, so concurrent
+        # submits cannot fill it in between and leave this job stranded
+        if self._queue.qsize() + self._reserved >= self.queue_size:
+            raise JobQueueFullError("Job queue is full")
+        self._reserved += 1
+        try:
+            job, created = await asyncio.to_thread(self.store.create, kind, payload, use_cache, user, idempotency_key)
+        finally:
+            self._reserved -= 1
+        if created:
+            self._queue.put_nowait(job["id"])
+        return job
+
+    async def wait(self, job_id: str, timeout: float):
+        """Return the job once it finishes or `timeout` seconds pass"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            remaining = deadline - loop.time()
+            if job is None or job["status"] in FINISHED:
+                self._events.pop(job_id, None)
+                return job
+            if remaining <= 0:
+                return job
+            event = self._events.setdefault(job_id, asyncio.Event())
+            try:
+                # Short waits so jobs finished by another process are noticed too
+                await asyncio.wait_for(event.wait(), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                await asyncio.to_thread(self.store.update, job_id, FAILED, message=f"Unexpected error: {str(e)}")
+                self.failed += 1
+            finally:
+                event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        payload = await asyncio.to_thread(self.store.payload, job_id)
+        if job is None or job["status"] in FINISHED or payload is None:
+            return
+
+        if job["kind"] == "text":
+            payload = payload.decode("utf-8")
+        # The token was taken when the job was submitted; the generation
+        # itself holds an admission slot like a synchronous request
+        while True:
+            try:
+                async with admitted(job["user"], charge=False):
+                    # Claimed only once it can run, so time spent waiting for
+                    # admission does not eat into the lease. Another process
+                    # sharing the store may already be running it.
+                    if not await asyncio.to_thread(self.store.claim, job_id, self.worker_id):
+                        return
+                    renewing = asyncio.create_task(self._keep_lease(job_id))
+                    try:
+                        result = await run_generation(_GENERATORS[job["kind"]], payload, job["use_cache"], job["user"])
+                    finally:
+                        renewing.cancel()
+                break
+            except AdmissionRejectedError:
+                # Jobs can wait; try again once synchronous traffic drains
+                await asyncio.sleep(1)
+            except GenerationTimeoutError as e:
+                result = {"success": False, "message": str(e)}
+                break
+
+        if result["success"]:
+            await asyncio.to_thread(
+                self.store.update, job_id, SUCCEEDED,
+                jsx_code=result["jsx_code"], component_name=result["component_name"],
+                parses=result.get("parses"), syntax_error=result.get("syntax_error")
+            )
+            self.completed += 1
+        else:
+            await asyncio.to_thread(self.store.update, job_id, FAILED, message=result.get("message"))
+            self.failed += 1
+
+    async def _keep_lease(self, job_id: str, lease_seconds: float = JOBS_LEASE_SECONDS):
+        """Renew the lease on a running job until cancelled"""
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            await asyncio.to_thread(self.store.renew, job_id, self.worker_id, lease_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": JOBS_ENABLED,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+job_manager = JobManager(JobStore(JOBS_PATH)) if JOBS_ENABLED else None
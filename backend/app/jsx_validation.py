@@ -0,0 +1,287 @@
+import os
+import re
+from dotenv import load_dotenv
+
+from app.response_parser import strip_fences, unescape, detect_component_name
+
+load_dotenv()
+
+JSX_VALIDATION_ENABLED = os.getenv("JSX_VALIDATION_ENABLED", "true").lower() == "true"
+# Re-prompt the model this many times when the output does not parse (0 disables)
+JSX_REPAIR_ATTEMPTS = int(os.getenv("JSX_REPAIR_ATTEMPTS", "1"))
+
+_JS_SPECIAL = re.compile(r"""["'`/{}()\[\]<]""")
+_TEMPLATE_SPECIAL = re.compile(r"[\\`]|\$\{")
+_TAG_NAME = re.compile(r"[A-Za-z0-9_.:$-]*")
+_WORD_BEFORE = re.compile(r"[\w$]+$")
+# After these a '<' starts a JSX element rather than a comparison
+_TAG_CONTEXT = set("(,=?:{[;&|!>}") | {""}
+_TAG_KEYWORDS = ("return", "default", "yield")
+# After these a '/' starts a regular expression rather than a division
+_REGEX_CONTEXT = set("(,=?:{[;&|!~^+-*%<>") | {""}
+_REGEX_KEYWORDS = ("return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw", "yield", "await")
+_CLOSERS = {")": "(", "]": "[", "}": "{"}
+_REACT_IMPORT = re.compile(r"^\s*import\s[^;]*?from\s+['\"]react['\"];?", re.MULTILINE)
+_HOOK_USE = re.compile(r"(?<![\w$.])(use(?:State|Effect|Ref|Memo|Callback|Reducer|Context|LayoutEffect|Id))\s*\(")
+_EXPORT_DEFAULT = re.compile(r"\bexport\s+default\b")
+_DECLARED = r"\b(?:const|let|var|function|class)\s+{}\b"
+
+
+class JSXSyntaxError(Exception):
+    """Raised by check_syntax() with the first problem found"""
+
+
+def _line(code: str, pos: int) -> int:
+    return code.count("\n", 0, pos) + 1
+
+
+def _skip_string(code: str, pos: int) -> int:
+    """Index just past the string literal starting at `pos`"""
+    quote = code[pos]
+    i = pos + 1
+    while i < len(code):
+        c = code[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == quote:
+            return i + 1
+        if c == "\n" and quote != "`":
+            break
+        i += 1
+    raise JSXSyntaxError(f"Unterminated string on line {_line(code, pos)}")
+
+
+def _skip_comment(code: str, pos: int):
+    """Index past a comment at `pos`, or None if it is not one"""
+    nxt = code[pos + 1:pos + 2]
+    if nxt == "/":
+        end = code.find("\n", pos)
+        return len(code) if end == -1 else end
+    if nxt == "*":
+        end = code.find("*/", pos + 2)
+        if end == -1:
+            raise JSXSyntaxError(f"Unterminated comment on line {_line(code, pos)}")
+        return end + 2
+    return None
+
+
+def _skip_regex(code: str, pos: int) -> int:
+    """Index just past the regular expression literal starting at `pos`"""
+    i = pos + 1
+    in_class = False
+    while i < len(code):
+        c = code[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "\n":
+            break
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            return i + 1
+        i += 1
+    raise JSXSyntaxError(f"Unterminated regular expression on line {_line(code, pos)}")
+
+
+def _follows(code: str, pos: int, context: set, keywords: tuple) -> bool:
+    """True if the token before `pos` is in `context` or one of `keywords`"""
+    j = pos - 1
+    while j >= 0 and code[j].isspace():
+        j -= 1
+    if j >= 0 and (code[j].isalnum() or code[j] in "_$"):
+        word = _WORD_BEFORE.search(code, max(j - 10, 0), j + 1)
+        return word is not None and word.group() in keywords
+    return code[j:j + 1] in context
+
+
+def _starts_tag(code: str, pos: int) -> bool:
+    nxt = code[pos + 1:pos + 2]
+    if not (nxt.isalpha() or nxt == ">"):
+        return False
+    return _follows(code, pos, _TAG_CONTEXT, _TAG_KEYWORDS)
+
+
+class _Checker:
+    """Single pass over the code tracking brackets, strings, comments and
+    JSX elements. Not a full parser: it catches what truncated or garbled
+    model output breaks (unbalanced brackets and tags, unterminated strings).
+    The stretches of plain JavaScript it passes over, and JSX tag names, are
+    kept in `regions`."""
+
+    def __init__(self, code: str):
+        self.code = code
+        self.regions = []
+
+    def check(self):
+        self._js(0, None)
+
+    def _js(self, pos: int, closer):
+        """Scan code until the bracket `closer` (or the end); returns its index"""
+        code = self.code
+        stack = []
+        while True:
+            match = _JS_SPECIAL.search(code, pos)
+            end = len(code) if match is None else match.start()
+            if end > pos:
+                self.regions.append((pos, end))
+            if match is None:
+                if stack or closer:
+                    opener = stack[-1][0] if stack else "{"
+                    raise JSXSyntaxError(f"Unclosed '{opener}' (code ends early)")
+                return len(code)
+            i = match.start()
+            c = code[i]
+            if c == "`":
+                pos = self._template(i)
+            elif c in "\"'":
+                pos = _skip_string(code, i)
+            elif c == "/":
+                pos = _skip_comment(code, i)
+                if pos is None:
+                    pos = _skip_regex(code, i) if _follows(code, i, _REGEX_CONTEXT, _REGEX_KEYWORDS) else i + 1
+            elif c in "([{":
+                stack.append((c, i))
+                pos = i + 1
+            elif c in ")]}":
+                if not stack:
+                    if c == closer:
+                        return i
+                    raise JSXSyntaxError(f"Unexpected '{c}' on line {_line(code, i)}")
+                opener, start = stack.pop()
+                if _CLOSERS[c] != opener:
+                    raise JSXSyntaxError(
+                        f"'{opener}' on line {_line(code, start)} closed by '{c}' on line {_line(code, i)}"
+                    )
+                pos = i + 1
+            elif _starts_tag(code, i):
+                pos = self._element(i)
+            else:
+                pos = i + 1
+
+    def _template(self, pos: int) -> int:
+        """Index just past the template literal at `pos`, scanning its ${} expressions"""
+        code = self.code
+        i = pos + 1
+        while True:
+            match = _TEMPLATE_SPECIAL.search(code, i)
+            if match is None:
+                raise JSXSyntaxError(f"Unterminated string on line {_line(code, pos)}")
+            i = match.start()
+            if code[i] == "`":
+                return i + 1
+            if code[i] == "\\":
+                i += 2
+            else:
+                i = self._js(i + 2, "}") + 1
+
+    def _tag(self, pos: int) -> tuple:
+        """Parse a tag at `pos`; returns (name, closing, self_closing, end)"""
+        code = self.code
+        i = pos + 1
+        closing = code[i:i + 1] == "/"
+        if closing:
+            i += 1
+        name = _TAG_NAME.match(code, i).group()
+        if name:
+            self.regions.append((i, i + len(name)))
+        i += len(name)
+        while i < len(code):
+            c = code[i]
+            if c == ">":
+                return name, closing, False, i + 1
+            if code.startswith("/>", i):
+                return name, closing, True, i + 2
+            if c in "\"'":
+                i = _skip_string(code, i)
+            elif c == "{":
+                i = self._js(i + 1, "}") + 1
+            elif c == "<":
+                break
+            else:
+                i += 1
+        raise JSXSyntaxError(f"Unterminated tag <{name}> on line {_line(code, pos)}")
+
+    def _element(self, pos: int) -> int:
+        """Parse a JSX element and its children; returns the index after it"""
+        code = self.code
+        name, closing, self_closing, i = self._tag(pos)
+        if closing:
+            raise JSXSyntaxError(f"Unexpected </{name}> on line {_line(code, pos)}")
+        if self_closing:
+            return i
+        while True:
+            # Children are raw text up to the next tag or expression
+            lt = code.find("<", i)
+            brace = code.find("{", i)
+            if lt == -1 and brace == -1:
+                raise JSXSyntaxError(f"Unclosed <{name}> from line {_line(code, pos)} (code ends early)")
+            if brace != -1 and (lt == -1 or brace < lt):
+                i = self._js(brace + 1, "}") + 1
+                continue
+            if code.startswith("</", lt):
+                child, _, _, end = self._tag(lt)
+                if child != name:
+                    raise JSXSyntaxError(
+                        f"<{name}> on line {_line(code, pos)} closed by </{child}> on line {_line(code, lt)}"
+                    )
+                return end
+            i = self._element(lt)
+
+
+def code_regions(code: str) -> list:
+    """(start, end) ranges of `code` holding JavaScript and JSX tag names,
+    as opposed to strings, comments, regular expressions, attribute names
+    and JSX text. Raises JSXSyntaxError if the code does not parse."""
+    checker = _Checker(code)
+    checker.check()
+    return checker.regions
+
+
+def check_syntax(code: str):
+    """Return None if the component looks syntactically valid, else the first problem"""
+    if not code.strip():
+        return "Empty component"
+    try:
+        _Checker(code).check()
+    except JSXSyntaxError as e:
+        return str(e)
+    except RecursionError:
+        return "Component is nested too deeply to check"
+    return None
+
+
+def normalize_jsx(jsx_code: str, component_name: str) -> tuple:
+    """Canonical form of a generated component: no fences or leftover
+    escapes, LF line endings without trailing spaces, a React import and a
+    default export. Returns (code, component name actually exported)."""
+    code = strip_fences(jsx_code)
+    if "\n" not in code.strip() and "\\n" in code:
+        code = unescape(code)
+    code = "\n".join(line.rstrip() for line in code.replace("\r\n", "\n").split("\n")).strip("\n")
+
+    if not _REACT_IMPORT.search(code):
+        hooks = sorted(set(_HOOK_USE.findall(code)))
+        named = f", {{ {', '.join(hooks)} }}" if hooks else ""
+        code = f"import React{named} from 'react';\n\n{code}"
+
+    if not _EXPORT_DEFAULT.search(code):
+        name = component_name if re.search(_DECLARED.format(re.escape(component_name)), code) else None
+        name = name or detect_component_name(code, default="")
+        if name:
+            code = f"{code}\n\nexport default {name};"
+
+    return code, detect_component_name(code, default=component_name)
+
+
+def validate_result(result: dict) -> dict:
+    """Normalize a successful result in place and flag whether it parses"""
+    if not JSX_VALIDATION_ENABLED or not result.get("success"):
+        return result
+    code, name = normalize_jsx(result["jsx_code"], result["component_name"])
+    error = check_syntax(code)
+    result.update(jsx_code=code, component_name=name, parses=error is None, syntax_error=error)
+    return result
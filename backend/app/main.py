@@ -1,18 +1,88 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
+from fastapi import FastAPI, Query
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
 
-from app.routes import text_to_jsx, image_to_jsx
+from app.routes import text_to_jsx, image_to_jsx, batch, history, jobs
+from app.providers import provider
+from app.model_resolver import resolver
+from app.response_cache import response_cache, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+from app.single_flight import single_flight
+from app.history import history_store, history_writer, warm_cache, HISTORY_WARM_START
+from app.image_preprocessing import preprocess_stats
+from app.response_parser import parse_stats
+from app.metrics import registry, MetricsMiddleware
+from app.admission import AdmissionMiddleware, limiter
+from app.jobs import job_manager
+from app.prompts import prompt_stats
+from app.context_cache import context_cache
+from app.image_index import image_index, load_image_index, IMAGE_INDEX_ENABLED
+from app.tracing import TracingMiddleware, configure_logging, slow_requests
 
 load_dotenv()
 
+configure_logging()
+
+
+async def _restore_image_index():
+    await asyncio.to_thread(load_image_index)
+    image_index.start_snapshots()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resolve the Gemini model once at startup instead of on every request
+    if provider.is_configured:
+        try:
+            await asyncio.to_thread(resolver.refresh)
+        except Exception:
+            # Requests will retry discovery and surface the error to the client
+            pass
+        resolver.start_background_refresh()
+    history_writer.start()
+    # Refill the in-process response cache from recent history after a restart
+    if history_store is not None and HISTORY_WARM_START and RESPONSE_CACHE_ENABLED:
+        try:
+            await asyncio.to_thread(
+                warm_cache, history_store, response_cache, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES
+            )
+        except Exception:
+            # A cold cache only costs extra model calls
+            pass
+    restore_image_index = None
+    if IMAGE_INDEX_ENABLED:
+        # Large snapshots take seconds to load; serve (and index) meanwhile
+        restore_image_index = asyncio.create_task(_restore_image_index())
+    if job_manager is not None:
+        await job_manager.start()
+    yield
+    if job_manager is not None:
+        await job_manager.stop()
+    if restore_image_index is not None:
+        # Saving before the snapshot is back would overwrite it
+        await restore_image_index
+        try:
+            await image_index.stop_snapshots()
+        except OSError:
+            # The index rebuilds as new screenshots are generated
+            pass
+    await resolver.stop_background_refresh()
+    await asyncio.to_thread(history_writer.stop)
+
+
 app = FastAPI(
     title="Instamock API",
     description="AI-powered UI to JSX generator",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Innermost, so rejections still get CORS headers and show up in metrics
+app.add_middleware(AdmissionMiddleware)
+
 # CORS Configuration
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
 app.add_middleware(
@@ -21,11 +91,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read the ID to quote in bug reports
+    expose_headers=["X-Request-ID"],
 )
 
+# Outside CORS, so it times the whole request including CORS handling
+app.add_middleware(MetricsMiddleware)
+
+# Outermost, so every response (and every log line) carries the request ID
+app.add_middleware(TracingMiddleware)
+
+
+def _component_stats():
+    cache = response_cache.stats()
+    images = preprocess_stats.snapshot()
+    admission = limiter.stats()
+    yield "instamock_response_cache_hits_total", "counter", "Response cache hits", cache["hits"]
+    yield "instamock_response_cache_misses_total", "counter", "Response cache misses", cache["misses"]
+    yield "instamock_response_cache_entries", "gauge", "Entries in the in-process response cache", cache["entries"]
+    yield "instamock_model_resolver_hits_total", "counter", "Model lookups served from cache", resolver.hits
+    yield "instamock_model_resolver_misses_total", "counter", "Model lookups that ran discovery", resolver.misses
+    yield "instamock_image_bytes_in_total", "counter", "Uploaded image bytes before preprocessing", images["bytes_in"]
+    yield "instamock_image_bytes_out_total", "counter", "Image bytes sent to the model", images["bytes_out"]
+    yield "instamock_image_index_entries", "gauge", "Screenshots in the near-duplicate index", len(image_index)
+    yield "instamock_slow_requests_total", "counter", "Requests slower than TRACE_SLOW_REQUEST_MS", slow_requests.slow
+    yield "instamock_admission_active", "gauge", "Requests holding an admission slot", admission["active"]
+    yield "instamock_admission_queued", "gauge", "Requests waiting for an admission slot", admission["queued"]
+    yield "instamock_admission_limit", "gauge", "Current adaptive concurrency limit", admission["limit"]
+
+
+registry.register_collector(_component_stats)
+
 # Include routers
 app.include_router(text_to_jsx.router, prefix="/api/generate", tags=["Generate"])
 app.include_router(image_to_jsx.router, prefix="/api/generate", tags=["Generate"])
+app.include_router(batch.router, prefix="/api/generate", tags=["Generate"])
+app.include_router(history.router, prefix="/api", tags=["History"])
+app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
 
 
 @app.get("/")
@@ -37,3 +139,63 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return dict(response_cache.stats(), single_flight=single_flight.stats())
+
+
+@app.get("/image/stats")
+async def image_stats():
+    return preprocess_stats.snapshot()
+
+
+@app.get("/parser/stats")
+async def parser_stats():
+    return parse_stats.snapshot()
+
+
+@app.get("/history/stats")
+async def history_stats():
+    return history_writer.stats()
+
+
+@app.get("/prompts/stats")
+async def prompts_stats():
+    return prompt_stats.stats()
+
+
+@app.get("/context-cache/stats")
+async def context_cache_stats():
+    return context_cache.stats()
+
+
+@app.get("/image-index/stats")
+async def image_index_stats():
+    return image_index.stats()
+
+
+@app.get("/jobs/stats")
+async def jobs_stats():
+    return job_manager.stats() if job_manager is not None else {"enabled": False}
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return limiter.stats()
+
+
+@app.get("/traces/stats")
+async def traces_stats():
+    return slow_requests.stats()
+
+
+@app.get("/traces/slow")
+async def traces_slow(limit: int = Query(20, ge=1, le=100)):
+    """Recently sampled slow requests with their spans, newest first"""
+    return {"traces": slow_requests.recent(limit)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,264 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# A small Prometheus text-format registry. Each metric keeps a dict keyed by
+# label values behind one lock, so recording is a lookup and an add.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: tuple, value) -> list:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, key: tuple, value) -> list:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            labels = _format_labels(self.labels, key, 'le="' + le + '"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()) -> Counter:
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """Add a callable returning (name, type, documentation, value) tuples at scrape time"""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, kind, documentation, value in collect():
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "instamock_http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status")
+)
+http_latency = registry.histogram(
+    "instamock_http_request_duration_seconds", "HTTP request latency by route", ("route",)
+)
+http_in_flight = registry.gauge("instamock_http_requests_in_flight", "HTTP requests currently being served")
+http_request_bytes = registry.histogram(
+    "instamock_http_request_bytes", "HTTP request body size by route", ("route",), SIZE_BUCKETS
+)
+http_response_bytes = registry.histogram(
+    "instamock_http_response_bytes", "HTTP response body size by route", ("route",), SIZE_BUCKETS
+)
+generation_stage_latency = registry.histogram(
+    "instamock_generation_stage_seconds",
+    "Time spent in each generation stage (model_resolve, image_preprocess, model_call, parse, merge, validate)",
+    ("kind", "stage"),
+)
+generations = registry.counter(
+    "instamock_generations_total", "Generations by kind, model and outcome", ("kind", "model", "outcome")
+)
+generation_errors = registry.counter(
+    "instamock_generation_errors_total", "Generation errors by class and model", ("kind", "error_class", "model")
+)
+generations_in_flight = registry.gauge(
+    "instamock_generations_in_flight", "Generations currently running", ("kind",)
+)
+model_call_retries = registry.counter(
+    "instamock_model_call_retries_total", "Model call retries by reason", ("kind", "reason")
+)
+model_call_hedges = registry.counter(
+    "instamock_model_call_hedges_total", "Hedged model calls launched and won", ("kind", "outcome")
+)
+model_fallbacks = registry.counter(
+    "instamock_model_fallbacks_total", "Fallbacks to another model after a quota error", ("kind", "from_model", "to_model")
+)
+coalesced_generations = registry.counter(
+    "instamock_coalesced_generations_total", "Requests that shared an identical in-flight generation", ("kind",)
+)
+context_cache_tokens_saved = registry.counter(
+    "instamock_context_cache_tokens_saved_total", "Input tokens served from the provider context cache", ("kind",)
+)
+jsx_validations = registry.counter(
+    "instamock_jsx_validations_total", "Validated generations by outcome (valid, repaired, invalid)", ("kind", "outcome")
+)
+near_duplicates = registry.counter(
+    "instamock_near_duplicates_total", "Image generations served or seeded from a near-duplicate screenshot", ("mode",)
+)
+tiled_generations = registry.counter(
+    "instamock_tiled_generations_total", "Tall screenshots by tiling outcome (tiled, unsplit, fallback, failed)", ("outcome",)
+)
+admission_rejections = registry.counter(
+    "instamock_admission_rejections_total", "Requests rejected by admission control", ("reason",)
+)
+
+
+class CountingExchange:
+    """Wraps an ASGI receive/send pair, counting body bytes each way and
+    keeping the response status (500 until a response starts)"""
+
+    def __init__(self, receive, send):
+        self._receive = receive
+        self._send = send
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.status = 500
+
+    async def receive(self):
+        message = await self._receive()
+        if message["type"] == "http.request":
+            self.request_bytes += len(message.get("body", b""))
+        return message
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            self.response_bytes += len(message.get("body", b""))
+        await self._send(message)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status, sizes and in-flight requests.
+
+    Routes are labelled with their path template (not the raw URL) to keep
+    label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            self._routes = {
+                getattr(route, "endpoint", None): route.path
+                for route in scope["app"].routes
+                if hasattr(route, "path")
+            }
+        return self._routes.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        exchange = CountingExchange(receive, send)
+        http_in_flight.inc()
+        try:
+            await self.app(scope, exchange.receive, exchange.send)
+        finally:
+            http_in_flight.dec()
+            route = self._route_label(scope)
+            http_requests.inc(method=scope["method"], route=route, status=exchange.status)
+            http_latency.observe(time.perf_counter() - start, route=route)
+            http_request_bytes.observe(exchange.request_bytes, route=route)
+            http_response_bytes.observe(exchange.response_bytes, route=route)
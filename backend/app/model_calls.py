@@ -0,0 +1,251 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from google.api_core import exceptions as google_exceptions
+from dotenv import load_dotenv
+
+from app.executor import MAX_CONCURRENT_GENERATIONS
+from app.model_resolver import resolver
+from app.admission import limiter
+from app.context_cache import context_cache
+from app.metrics import model_call_retries, model_call_hedges, model_fallbacks
+from app.tracing import event
+
+load_dotenv()
+
+# Each attempt gets its own timeout; all attempts together share the deadline,
+# which stays below GENERATION_TIMEOUT_SECONDS so errors are reported cleanly
+MODEL_CALL_TIMEOUT_SECONDS = float(os.getenv("MODEL_CALL_TIMEOUT_SECONDS", "60"))
+MODEL_CALL_DEADLINE_SECONDS = float(os.getenv("MODEL_CALL_DEADLINE_SECONDS", "100"))
+MODEL_RETRY_ATTEMPTS = int(os.getenv("MODEL_RETRY_ATTEMPTS", "3"))
+MODEL_RETRY_BASE_SECONDS = float(os.getenv("MODEL_RETRY_BASE_SECONDS", "0.5"))
+MODEL_RETRY_MAX_SECONDS = float(os.getenv("MODEL_RETRY_MAX_SECONDS", "8"))
+# On quota errors, move down the preferred model list instead of waiting
+MODEL_FALLBACK_ENABLED = os.getenv("MODEL_FALLBACK_ENABLED", "true").lower() == "true"
+# ...and skip a quota-limited model for this long before trying it first again
+MODEL_QUOTA_COOLDOWN_SECONDS = float(os.getenv("MODEL_QUOTA_COOLDOWN_SECONDS", "60"))
+# Send a duplicate request when the first runs past this latency percentile
+MODEL_HEDGE_ENABLED = os.getenv("MODEL_HEDGE_ENABLED", "false").lower() == "true"
+MODEL_HEDGE_PERCENTILE = float(os.getenv("MODEL_HEDGE_PERCENTILE", "95"))
+MODEL_HEDGE_MIN_SAMPLES = 20
+
+# Attempts run here so the calling generation thread can enforce timeouts and
+# hedge; it is twice the generation pool so a hedge never waits for a thread
+_call_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_GENERATIONS * 2, thread_name_prefix="model-call")
+
+
+class ModelCallTimeoutError(Exception):
+    """Raised when a model call attempt or the overall deadline runs out"""
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls, for the hedge threshold"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float):
+        """The pct-th percentile, or None until there are enough samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MODEL_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(int(len(samples) * pct / 100), len(samples) - 1)]
+
+
+_latencies = {"text": LatencyWindow(), "image": LatencyWindow()}
+# Model name -> monotonic time until which it is skipped after a quota error
+_cooldowns = {}
+
+
+def retry_reason(e: Exception):
+    """"quota", "timeout", "server" or "network" for retryable errors, else None"""
+    if isinstance(e, google_exceptions.TooManyRequests) or "quota" in str(e).lower():
+        return "quota"
+    if isinstance(e, (ModelCallTimeoutError, TimeoutError, google_exceptions.DeadlineExceeded)):
+        return "timeout"
+    if isinstance(e, google_exceptions.ServerError):
+        return "server"
+    if isinstance(e, ConnectionError) or "connection" in str(e).lower():
+        return "network"
+    return None
+
+
+def fallback_chain() -> list:
+    """The resolved model, then other available models in preference order"""
+    primary = resolver.resolve()
+    if not MODEL_FALLBACK_ENABLED or resolver.pinned:
+        return [primary]
+    chain = [primary] + [name for name in resolver.preferred if name in resolver.available_models and name != primary]
+    now = time.monotonic()
+    ready = [name for name in chain if _cooldowns.get(name, 0) <= now]
+    # When every model is cooling down, try them all in order anyway
+    return ready or chain
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+    return random.uniform(0, min(MODEL_RETRY_MAX_SECONDS, MODEL_RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+
+
+class _Attempts:
+    """Retry bookkeeping shared by call_model() and stream_model()"""
+
+    def __init__(self, kind: str, deadline: float):
+        self.kind = kind
+        self.chain = fallback_chain()
+        self.position = 0
+        self.retries = 0
+        self.end = time.monotonic() + deadline
+
+    @property
+    def model_name(self) -> str:
+        return self.chain[self.position]
+
+    def timeout(self) -> float:
+        remaining = self.end - time.monotonic()
+        if remaining <= 0:
+            raise ModelCallTimeoutError("Model call deadline exceeded")
+        return min(MODEL_CALL_TIMEOUT_SECONDS, remaining)
+
+    def handle(self, e: Exception):
+        """Prepare the next attempt after `e`, or re-raise it"""
+        reason = retry_reason(e)
+        if reason is None:
+            raise e
+        if reason == "quota" and len(self.chain) > 1:
+            _cooldowns[self.model_name] = time.monotonic() + MODEL_QUOTA_COOLDOWN_SECONDS
+        if reason == "quota" and self.position + 1 < len(self.chain):
+            model_fallbacks.inc(kind=self.kind, from_model=self.model_name, to_model=self.chain[self.position + 1])
+            event("model_fallback", model=self.model_name, to_model=self.chain[self.position + 1])
+            self.position += 1
+            return
+        if reason == "quota":
+            # Out of fallbacks: slow admissions down until the quota recovers
+            limiter.record_quota_error()
+        self.retries += 1
+        delay = _backoff(self.retries)
+        if self.retries >= MODEL_RETRY_ATTEMPTS or time.monotonic() + delay >= self.end:
+            raise e
+        model_call_retries.inc(kind=self.kind, reason=reason)
+        event("model_retry", model=self.model_name, reason=reason, error=type(e).__name__, backoff_ms=round(delay * 1000))
+        time.sleep(delay)
+
+
+def _hedge_delay(kind: str):
+    if not MODEL_HEDGE_ENABLED:
+        return None
+    return _latencies[kind].percentile(MODEL_HEDGE_PERCENTILE)
+
+
+def _prepare(model_name: str, template, contents):
+    """The model and contents for a call, using the template's context cache entry if there is one"""
+    if template is None:
+        return resolver.get_model(model_name), contents
+    model, contents, _ = context_cache.prepare(model_name, template, contents)
+    return model, contents
+
+
+def _attempt(kind: str, model_name: str, contents, generation_config, timeout: float, template=None):
+    """One attempt, hedged with a duplicate request if it runs long"""
+    full_contents = contents
+    model, contents = _prepare(model_name, template, contents)
+    try:
+        return _hedged(kind, model, contents, generation_config, timeout)
+    except google_exceptions.NotFound:
+        if contents is full_contents:
+            raise
+        # The provider dropped the cached context early; go inline once
+        context_cache.invalidate(model_name, template)
+        return _hedged(kind, resolver.get_model(model_name), full_contents, generation_config, timeout)
+
+
+def _hedged(kind: str, model, contents, generation_config, timeout: float):
+    def call():
+        return model.generate_content(
+            contents, generation_config=generation_config, request_options={"timeout": timeout}
+        )
+
+    start = time.monotonic()
+    first = _call_executor.submit(call)
+    pending = {first}
+    hedge_after = _hedge_delay(kind)
+    if hedge_after is not None and hedge_after < timeout:
+        done, _ = wait(pending, timeout=hedge_after)
+        if not done:
+            pending.add(_call_executor.submit(call))
+            model_call_hedges.inc(kind=kind, outcome="launched")
+
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=max(start + timeout - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                _latencies[kind].record(time.monotonic() - start)
+                if future is not first:
+                    model_call_hedges.inc(kind=kind, outcome="won")
+                return future.result()
+            error = future.exception()
+    if pending or error is None:
+        # Abandoned like run_generation(): the SDK call may still finish later
+        raise ModelCallTimeoutError(f"Model call timed out after {timeout:g} seconds")
+    raise error
+
+
+def call_model(kind: str, contents, generation_config=None, deadline: float = MODEL_CALL_DEADLINE_SECONDS, template=None):
+    """Call the model with per-attempt timeouts, jittered retries on transient
+    errors, optional hedging and fallback to the next model on quota errors.
+    With the prompt `template`, its static prefix may be served from the
+    provider's context cache (see app/context_cache.py).
+
+    Raises the last error once retries or the deadline are exhausted.
+    """
+    attempts = _Attempts(kind, deadline)
+    while True:
+        try:
+            response = _attempt(kind, attempts.model_name, contents, generation_config, attempts.timeout(), template)
+            limiter.record_success()
+            return response
+        except Exception as e:
+            attempts.handle(e)
+
+
+def stream_model(kind: str, contents, generation_config=None, deadline: float = MODEL_CALL_DEADLINE_SECONDS, template=None):
+    """Yield response chunks, retrying like call_model() until the first chunk
+    arrives. Once output has been sent errors propagate; iterate_generation()
+    enforces the deadline for the rest of the stream. Streams are not hedged.
+    """
+    attempts = _Attempts(kind, deadline)
+    while True:
+        call_contents = None
+        try:
+            model, call_contents = _prepare(attempts.model_name, template, contents)
+            stream = iter(model.generate_content(
+                call_contents, generation_config=generation_config, stream=True,
+                request_options={"timeout": attempts.timeout()}
+            ))
+            first = next(stream, None)
+            limiter.record_success()
+            break
+        except google_exceptions.NotFound as e:
+            # Only a missing cached context is retried inline; a miss while
+            # preparing or on an inline call is handled like any other error
+            if call_contents is None or call_contents is contents:
+                attempts.handle(e)
+            # The cached context is gone; retry inline
+            context_cache.invalidate(attempts.model_name, template)
+        except Exception as e:
+            attempts.handle(e)
+    if first is not None:
+        yield first
+        yield from stream
@@ -0,0 +1,139 @@
+import os
+import time
+import asyncio
+import threading
+from dotenv import load_dotenv
+
+from app.providers import provider
+
+load_dotenv()
+
+# Prefer stable models over previews, flash over pro for speed
+PREFERRED_MODELS = ['gemini-2.5-flash', 'gemini-2.0-flash', 'gemini-2.5-pro', 'gemini-1.5-flash', 'gemini-1.5-pro']
+
+# Pin a model to skip discovery entirely (e.g. GEMINI_MODEL=gemini-2.0-flash)
+PINNED_MODEL = os.getenv("GEMINI_MODEL", "").strip() or None
+MODEL_CACHE_TTL_SECONDS = float(os.getenv("MODEL_CACHE_TTL_SECONDS", "3600"))
+MODEL_REFRESH_INTERVAL_SECONDS = float(os.getenv("MODEL_REFRESH_INTERVAL_SECONDS", "600"))
+
+
+class ModelUnavailableError(Exception):
+    """Raised when no usable Gemini model can be resolved"""
+
+
+class ModelResolver:
+    """Resolves the Gemini model once and caches it with a TTL.
+
+    `client` is the configured model provider (see app.providers); any
+    object with `list_models()` and `GenerativeModel(name)` can be passed
+    instead, which keeps discovery testable without network access.
+    """
+
+    def __init__(self, client=provider, preferred=None, pinned=PINNED_MODEL, ttl=MODEL_CACHE_TTL_SECONDS):
+        self.client = client
+        self.preferred = list(preferred or PREFERRED_MODELS)
+        self.pinned = pinned
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.available_models = []
+        self._model_name = None
+        self._models = {}
+        self._resolved_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_task = None
+
+    def _discover(self) -> tuple:
+        """Call list_models() and pick the best available model"""
+        if self.pinned:
+            return self.pinned, [self.pinned]
+
+        available = [m.name for m in self.client.list_models() if 'generateContent' in m.supported_generation_methods]
+        available = [name.split('/')[-1] for name in available]
+
+        for pref in self.preferred:
+            if pref in available:
+                return pref, available
+
+        # If no preferred model found, use first available
+        if available:
+            return available[0], available
+
+        raise ModelUnavailableError("No Gemini models available. Please check your API key and permissions.")
+
+    @property
+    def current_model(self):
+        """The cached model name without triggering discovery (None if unresolved)"""
+        return self._model_name
+
+    def _is_fresh(self) -> bool:
+        return self._model_name is not None and (time.monotonic() - self._resolved_at) < self.ttl
+
+    def refresh(self) -> str:
+        """Re-run discovery and replace the cached model"""
+        model_name, available = self._discover()
+        with self._lock:
+            if model_name != self._model_name:
+                self._models.pop(self._model_name, None)
+            self._model_name = model_name
+            self.available_models = available
+            self._resolved_at = time.monotonic()
+        return model_name
+
+    def resolve(self) -> str:
+        """Return the cached model name, discovering it on a miss or expiry"""
+        if self._is_fresh():
+            self.hits += 1
+            return self._model_name
+
+        self.misses += 1
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._is_fresh():
+                return self._model_name
+            return self.refresh()
+
+    def get_model(self, model_name: str = None):
+        """Return a cached GenerativeModel for `model_name` (or the resolved model)"""
+        model_name = model_name or self.resolve()
+        model = self._models.get(model_name)
+        if model is None:
+            model = self.client.GenerativeModel(model_name)
+            self._models[model_name] = model
+        return model
+
+    def invalidate(self):
+        """Drop the cached model so the next request re-discovers"""
+        with self._lock:
+            self._model_name = None
+            self._models.clear()
+            self._resolved_at = 0.0
+
+    async def _refresh_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                # Keep serving the last known model; the TTL bounds staleness
+                pass
+
+    def start_background_refresh(self, interval: float = MODEL_REFRESH_INTERVAL_SECONDS):
+        """Periodically refresh the cached model on the running event loop"""
+        if self.pinned or interval <= 0 or self._refresh_task is not None:
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop(interval))
+
+    async def stop_background_refresh(self):
+        if self._refresh_task is None:
+            return
+        self._refresh_task.cancel()
+        try:
+            await self._refresh_task
+        except asyncio.CancelledError:
+            pass
+        self._refresh_task = None
+
+
+resolver = ModelResolver()
@@ -0,0 +1,310 @@
+import os
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Active template per kind. A comma-separated list splits traffic between
+# templates by input hash, so the same input always gets the same template
+PROMPT_TEXT_TEMPLATE = os.getenv("PROMPT_TEXT_TEMPLATE", "text-v1")
+PROMPT_IMAGE_TEMPLATE = os.getenv("PROMPT_IMAGE_TEMPLATE", "image-v1")
+# Token budget for a text description, and what to do past it: truncate or reject
+TEXT_DESCRIPTION_MAX_TOKENS = int(os.getenv("TEXT_DESCRIPTION_MAX_TOKENS", "2000"))
+PROMPT_OVERFLOW = os.getenv("PROMPT_OVERFLOW", "truncate").lower()
+# "local" estimates tokens from length; "model" asks the model (count_tokens)
+# for descriptions whose estimate comes near the budget
+PROMPT_TOKEN_COUNTER = os.getenv("PROMPT_TOKEN_COUNTER", "local").lower()
+
+CHARS_PER_TOKEN = 4
+# Only descriptions estimated above this share of the budget are counted exactly
+_EXACT_COUNT_THRESHOLD = 0.8
+
+
+class PromptBudgetError(ValueError):
+    """Raised when a text description exceeds the token budget and PROMPT_OVERFLOW=reject"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate (about four characters per token for English)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class PromptTemplate:
+    """A versioned prompt. The text around the user input is fixed, so it is
+    kept as a precomputed prefix and suffix and rendering is one concatenation."""
+
+    def __init__(self, name: str, kind: str, prefix: str, suffix: str = ""):
+        self.name = name
+        self.kind = kind
+        self.prefix = prefix
+        self.suffix = suffix
+        self.static_tokens = estimate_tokens(prefix) + estimate_tokens(suffix)
+
+    def render(self, text: str = "") -> str:
+        return self.prefix + text + self.suffix
+
+
+_TEXT_RULES = """You are an expert React/Tailwind developer.
+Convert the following UI description into clean, readable React JSX code.
+
+Rules:
+- Use functional components
+- Use Tailwind CSS for all styling
+- No external UI libraries (only React and Tailwind)
+- Use semantic HTML
+- Follow mobile-first responsive design
+- Keep code minimal and production ready
+- Avoid inline styles
+- Name the component based on the page type
+- Export the component as default
+- Include proper imports (React, if needed)
+- Use className instead of class
+- Ensure proper indentation and formatting
+
+User Description:
+"""
+
+_TEXT_OUTPUT = """
+
+Output only the JSX code inside <jsx> tags. Do not include any explanation outside the tags.
+The component should be a complete, runnable React component.
+
+Example format:
+<jsx>
+import React from 'react';
+
+const ComponentName = () => {
+  return (
+    <div className="min-h-screen bg-gray-50">
+      {/* Component content */}
+    </div>
+  );
+};
+
+export default ComponentName;
+</jsx>"""
+
+_TEXT_COMPACT = """You are an expert React/Tailwind developer. Write one default-exported functional React component for the UI below.
+Use Tailwind classes (className, no inline styles), semantic HTML, mobile-first layout and no UI libraries. Name it after the page type.
+
+User Description:
+"""
+
+_TEXT_COMPACT_OUTPUT = """
+
+Output only the complete component code inside <jsx></jsx> tags, with no explanation."""
+
+_IMAGE = """You are an expert frontend engineer and UI analyzer.
+Given an image, reverse-engineer the UI layout and generate accurate JSX + Tailwind code.
+
+Steps:
+1. Describe the UI structure (layout, sections, components)
+2. Identify all components (buttons, inputs, cards, navbars, etc.)
+3. Generate JSX layout matching the visual structure
+4. Add appropriate Tailwind CSS classes for styling
+5. Ensure clean and readable formatting
+
+Rules:
+- Use functional React components
+- Use Tailwind CSS for all styling
+- No external UI libraries
+- Use semantic HTML
+- Follow mobile-first responsive design
+- Match colors, spacing, and layout as closely as possible
+- Export the component as default
+- Use className instead of class
+- Include proper imports
+
+Output format - provide a JSON object with this structure:
+{{
+  "component_name": "DescriptiveComponentName",
+  "jsx": "complete JSX code here"
+}}
+
+The JSX should be a complete, runnable React component that recreates the UI shown in the image."""
+
+_IMAGE_COMPACT = """Recreate the UI in this screenshot as one default-exported functional React component styled with Tailwind (className, semantic HTML, mobile-first, no UI libraries). Match colors, spacing and layout closely.
+Respond with a JSON object: {"component_name": "DescriptiveComponentName", "jsx": "complete component code"}"""
+
+_IMAGE_SECTION = """You are an expert frontend engineer and UI analyzer.
+The image is one horizontal section of a longer page screenshot. Recreate only this section as JSX + Tailwind code;
+the other sections are generated separately and stacked above and below it.
+
+Rules:
+- Use one functional React component named after the section's content (e.g. HeroSection, PricingTable)
+- Use Tailwind CSS for all styling
+- No external UI libraries
+- Use semantic HTML
+- Follow mobile-first responsive design
+- Match colors, spacing, and layout as closely as possible
+- Span the full width; no page-level wrappers such as min-h-screen
+- Export the component as default
+- Use className instead of class
+- Include proper imports
+
+Output format - provide a JSON object with this structure:
+{
+  "component_name": "DescriptiveSectionName",
+  "jsx": "complete JSX code here"
+}
+
+"""
+
+_SEED = """
+
+A near-identical screenshot was converted earlier into the component below. Start from it and change only
+what differs in this screenshot, keeping the same output format.
+
+Previous component:
+"""
+
+_REPAIR = """You are an expert React/Tailwind developer.
+The React component below does not parse. Fix the syntax so it is one complete, runnable component,
+keeping its structure, content and Tailwind classes unchanged.
+
+"""
+
+_REPAIR_OUTPUT = """
+
+Output only the corrected component code inside <jsx> tags. Do not include any explanation outside the tags."""
+
+# Never edit a registered template in place: add a new version instead, so
+# cached responses and history stay attributable to the prompt that made them
+TEMPLATES = {
+    template.name: template
+    for template in (
+        PromptTemplate("text-v1", "text", _TEXT_RULES, _TEXT_OUTPUT),
+        PromptTemplate("text-compact-v1", "text", _TEXT_COMPACT, _TEXT_COMPACT_OUTPUT),
+        PromptTemplate("image-v1", "image", _IMAGE),
+        PromptTemplate("image-compact-v1", "image", _IMAGE_COMPACT),
+        PromptTemplate("image-seed-v1", "seed", _IMAGE + _SEED),
+        PromptTemplate("image-section-v1", "section", _IMAGE_SECTION),
+        PromptTemplate("repair-v1", "repair", _REPAIR, _REPAIR_OUTPUT),
+    )
+}
+
+
+def _active(kind: str, setting: str) -> list:
+    names = [name.strip() for name in setting.split(",") if name.strip()]
+    for name in names:
+        if name not in TEMPLATES or TEMPLATES[name].kind != kind:
+            raise ValueError(f"Unknown {kind} prompt template '{name}'. Choose from: "
+                             + ", ".join(t.name for t in TEMPLATES.values() if t.kind == kind))
+    return [TEMPLATES[name] for name in names]
+
+
+ACTIVE_TEMPLATES = {
+    "text": _active("text", PROMPT_TEXT_TEMPLATE),
+    "image": _active("image", PROMPT_IMAGE_TEMPLATE),
+    # Re-prompt for output that fails validation (see app/jsx_validation.py)
+    "repair": [TEMPLATES["repair-v1"]],
+    # Image prompt carrying a near-duplicate's JSX (see app/image_index.py)
+    "seed": [TEMPLATES["image-seed-v1"]],
+    # One section of a tiled screenshot (see app/tiling.py)
+    "section": [TEMPLATES["image-section-v1"]],
+}
+
+
+def select_template(kind: str, payload) -> PromptTemplate:
+    """The template for this input; stable per input when several are active"""
+    templates = ACTIVE_TEMPLATES[kind]
+    if len(templates) == 1:
+        return templates[0]
+    data = payload.encode("utf-8") if isinstance(payload, str) else payload
+    return templates[int.from_bytes(hashlib.sha256(data).digest()[:4], "big") % len(templates)]
+
+
+def _count_tokens(text: str, count_with_model) -> int:
+    estimate = estimate_tokens(text)
+    if count_with_model is None or estimate < TEXT_DESCRIPTION_MAX_TOKENS * _EXACT_COUNT_THRESHOLD:
+        return estimate
+    try:
+        return count_with_model(text)
+    except Exception:
+        # Counting is advisory; fall back to the estimate
+        return estimate
+
+
+def fit_text_description(text: str, count_with_model=None) -> str:
+    """Return the description within TEXT_DESCRIPTION_MAX_TOKENS, truncated
+    at a word boundary, or raise PromptBudgetError when PROMPT_OVERFLOW=reject.
+
+    `count_with_model(text) -> int` gives exact counts when
+    PROMPT_TOKEN_COUNTER=model; short descriptions are never sent to it.
+    """
+    budget = TEXT_DESCRIPTION_MAX_TOKENS
+    if budget <= 0:
+        return text
+    if PROMPT_TOKEN_COUNTER != "model":
+        count_with_model = None
+
+    tokens = _count_tokens(text, count_with_model)
+    if tokens <= budget:
+        return text
+    if PROMPT_OVERFLOW == "reject":
+        raise PromptBudgetError(
+            f"Text description is too long ({tokens} tokens). Maximum is {budget} tokens."
+        )
+
+    # Shrink proportionally until it fits; exact counts converge in a step or two
+    for _ in range(3):
+        limit = int(len(text) * budget / tokens * 0.98)
+        cut = text[:limit]
+        text = cut.rsplit(None, 1)[0] if " " in cut[limit // 2:] else cut
+        tokens = _count_tokens(text, count_with_model)
+        if tokens <= budget:
+            break
+    return text
+
+
+class PromptStats:
+    """Per-template token and latency totals for comparing templates"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, template: str, success: bool, seconds: float, usage: dict):
+        with self._lock:
+            stats = self._stats.setdefault(template, {
+                "calls": 0, "failures": 0, "seconds": 0.0, "prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["failures"] += 0 if success else 1
+            stats["seconds"] += seconds
+            stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            stats["output_tokens"] += usage.get("output_tokens", 0)
+            stats["cached_tokens"] += usage.get("cached_tokens", 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = {name: dict(values) for name, values in self._stats.items()}
+        templates = {}
+        for name, template in TEMPLATES.items():
+            entry = {
+                "kind": template.kind,
+                "active": template in ACTIVE_TEMPLATES[template.kind],
+                "static_tokens": template.static_tokens,
+            }
+            values = snapshot.get(name)
+            if values:
+                calls = values["calls"]
+                entry.update(
+                    calls=calls,
+                    failures=values["failures"],
+                    avg_latency_ms=round(values["seconds"] / calls * 1000, 2),
+                    avg_prompt_tokens=round(values["prompt_tokens"] / calls, 1),
+                    avg_output_tokens=round(values["output_tokens"] / calls, 1),
+                    avg_cached_tokens=round(values["cached_tokens"] / calls, 1),
+                )
+            templates[name] = entry
+        return {
+            "token_counter": PROMPT_TOKEN_COUNTER,
+            "text_description_max_tokens": TEXT_DESCRIPTION_MAX_TOKENS,
+            "overflow": PROMPT_OVERFLOW,
+            "templates": templates,
+        }
+
+
+prompt_stats = PromptStats()
@@ -0,0 +1,22 @@
+import os
+from dotenv import load_dotenv
+
+from app.providers.base import ModelProvider
+
+load_dotenv()
+
+# "gemini" (default) or "mock" for offline load tests, benchmarks and CI
+MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "gemini").lower()
+
+
+def load_provider(name: str) -> ModelProvider:
+    if name == "gemini":
+        from app.providers.gemini import GeminiProvider
+        return GeminiProvider()
+    if name == "mock":
+        from app.providers.mock import MockProvider
+        return MockProvider()
+    raise ValueError(f"Unknown MODEL_PROVIDER '{name}'. Use 'gemini' or 'mock'.")
+
+
+provider = load_provider(MODEL_PROVIDER)
@@ -0,0 +1,31 @@
+class ModelProvider:
+    """Interface every model backend implements.
+
+    It mirrors the slice of `google.generativeai` the app uses, so the
+    model resolver and gemini_client work unchanged with any backend:
+
+    - `list_models()` yields objects with `name` and `supported_generation_methods`
+    - `GenerativeModel(model_name)` returns an object whose
+      `generate_content(contents, generation_config=None, stream=False)`
+      returns a response with `.text`, or an iterable of such chunks when
+      streaming
+    - optionally, `cached_model(model_name, system_instruction, ttl_seconds)`
+      registers the instruction with the provider's context cache and
+      returns a model that uses it
+    """
+
+    name = "base"
+
+    @property
+    def is_configured(self) -> bool:
+        """False when credentials are missing and generation cannot run"""
+        raise NotImplementedError
+
+    def list_models(self):
+        raise NotImplementedError
+
+    def GenerativeModel(self, model_name: str, **kwargs):
+        raise NotImplementedError
+
+    def cached_model(self, model_name: str, system_instruction: str, ttl_seconds: float):
+        raise NotImplementedError(f"{self.name} provider does not support context caching")
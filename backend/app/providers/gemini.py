@@ -0,0 +1,39 @@
+import os
+import datetime
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from app.providers.base import ModelProvider
+
+load_dotenv()
+
+
+class GeminiProvider(ModelProvider):
+    """Google Gemini via the google-generativeai SDK"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        # Configure Gemini API
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def list_models(self):
+        return genai.list_models()
+
+    def GenerativeModel(self, model_name: str, **kwargs):
+        return genai.GenerativeModel(model_name, **kwargs)
+
+    def cached_model(self, model_name: str, system_instruction: str, ttl_seconds: float):
+        cache = genai.caching.CachedContent.create(
+            model=f"models/{model_name}",
+            display_name="instamock-prompt",
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+        return genai.GenerativeModel.from_cached_content(cache)
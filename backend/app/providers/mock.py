@@ -0,0 +1,231 @@
+import io
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from PIL import Image
+from google.api_core import exceptions as google_exceptions
+from dotenv import load_dotenv
+
+from app.providers.base import ModelProvider
+
+load_dotenv()
+
+MOCK_MODEL_NAME = "mock-model"
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "800"))
+# fixed, uniform (median +/- spread) or lognormal (sigma = spread)
+MOCK_LATENCY_DISTRIBUTION = os.getenv("MOCK_LATENCY_DISTRIBUTION", "lognormal").lower()
+MOCK_LATENCY_SPREAD = float(os.getenv("MOCK_LATENCY_SPREAD", "0.5"))
+MOCK_QUOTA_ERROR_RATE = float(os.getenv("MOCK_QUOTA_ERROR_RATE", "0"))
+MOCK_TIMEOUT_ERROR_RATE = float(os.getenv("MOCK_TIMEOUT_ERROR_RATE", "0"))
+MOCK_MALFORMED_RATE = float(os.getenv("MOCK_MALFORMED_RATE", "0"))
+# Added per output token on top of the sampled latency, like decoding time
+MOCK_MS_PER_OUTPUT_TOKEN = float(os.getenv("MOCK_MS_PER_OUTPUT_TOKEN", "0"))
+MOCK_SEED = int(os.getenv("MOCK_SEED", "0"))
+MOCK_STREAM_CHUNK_CHARS = 64
+
+_DESCRIPTION = re.compile(r"User Description:\s*(.*?)\s*Output only", re.DOTALL)
+# Repair prompts carry the broken component; keep its name
+_COMPONENT = re.compile(r"const\s+([A-Z][\w$]*)\s*=")
+_WORD = re.compile(r"[A-Za-z]+")
+_STOPWORDS = {"a", "an", "the", "with", "and", "or", "of", "for", "to", "in", "on", "create", "build", "design", "make"}
+
+JSX_TEMPLATE = """import React from 'react';
+
+const {name} = () => {{
+  return (
+    <div className="min-h-screen bg-gray-50 p-8">
+      <h1 className="text-2xl font-bold text-gray-900">{title}</h1>
+      <p className="mt-2 text-gray-600">Generated offline by the mock provider.</p>
+    </div>
+  );
+}};
+
+export default {name};"""
+
+SECTION_TEMPLATE = """      <section className="py-12 border-b border-gray-200">
+        <h2 className="text-xl font-semibold text-gray-900">Section {number}</h2>
+        <p className="mt-2 text-gray-600">Mock content recreated from this part of the screenshot.</p>
+      </section>"""
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int, cached_tokens: int = 0):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.cached_content_token_count = cached_tokens
+
+
+class _Response:
+    def __init__(self, text: str, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+def _estimate_tokens(contents) -> int:
+    # Roughly four characters per token; an image counts as a flat 258 like Gemini
+    parts = [contents] if isinstance(contents, str) else contents
+    return sum(len(part) // 4 if isinstance(part, str) else 258 for part in parts)
+
+
+class _TokenCount:
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+
+class MockModel:
+    def __init__(self, provider: "MockProvider", model_name: str, system_instruction: str = None, cached: bool = False):
+        self.provider = provider
+        self.model_name = f"models/{model_name}"
+        self.system_instruction = system_instruction
+        # Whether the system instruction comes from a (simulated) context cache
+        self.cached = cached
+
+    def _full_contents(self, contents):
+        if not self.system_instruction:
+            return contents
+        if isinstance(contents, str):
+            return self.system_instruction + contents
+        return [self.system_instruction] + list(contents)
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        provider = self.provider
+        latency, failure, malformed = provider.sample()
+        contents = self._full_contents(contents)
+        text = provider.render(contents)
+        if malformed:
+            # Cut the response off mid-string, like a truncated model reply
+            text = text[:len(text) // 2]
+        latency += len(text) // 4 * provider.ms_per_output_token / 1000
+
+        cached_tokens = _estimate_tokens(self.system_instruction) if self.cached else 0
+        usage = _Usage(_estimate_tokens(contents), len(text) // 4, cached_tokens)
+        if not stream:
+            time.sleep(latency)
+            provider.raise_failure(failure)
+            return _Response(text, usage)
+        return self._stream(text, latency, failure, usage)
+
+    def count_tokens(self, contents, **kwargs):
+        return _TokenCount(_estimate_tokens(self._full_contents(contents)))
+
+    def _stream(self, text: str, latency: float, failure, usage):
+        chunks = [text[i:i + MOCK_STREAM_CHUNK_CHARS] for i in range(0, len(text), MOCK_STREAM_CHUNK_CHARS)]
+        # A fifth of the latency before the first chunk, the rest spread evenly
+        time.sleep(latency * 0.2)
+        self.provider.raise_failure(failure)
+        per_chunk = latency * 0.8 / max(len(chunks), 1)
+        for i, chunk in enumerate(chunks):
+            # Like Gemini, usage arrives with the last chunk
+            yield _Response(chunk, usage if i == len(chunks) - 1 else None)
+            time.sleep(per_chunk)
+
+
+class MockProvider(ModelProvider):
+    """Deterministic offline backend with configurable latency and error injection.
+
+    Text prompts get a templated <jsx> component named after the
+    description; image requests get the JSON object the image prompt asks
+    for. Latency, failures and malformed output are drawn from a seeded RNG,
+    so a run with the same settings and request order is reproducible.
+    """
+
+    name = "mock"
+
+    def __init__(self, latency_ms=MOCK_LATENCY_MS, distribution=MOCK_LATENCY_DISTRIBUTION,
+                 spread=MOCK_LATENCY_SPREAD, quota_error_rate=MOCK_QUOTA_ERROR_RATE,
+                 timeout_error_rate=MOCK_TIMEOUT_ERROR_RATE, malformed_rate=MOCK_MALFORMED_RATE,
+                 seed=MOCK_SEED, ms_per_output_token=MOCK_MS_PER_OUTPUT_TOKEN):
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.spread = spread
+        self.quota_error_rate = quota_error_rate
+        self.timeout_error_rate = timeout_error_rate
+        self.malformed_rate = malformed_rate
+        self.ms_per_output_token = ms_per_output_token
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def is_configured(self) -> bool:
+        return True
+
+    def list_models(self):
+        class _ModelInfo:
+            name = f"models/{MOCK_MODEL_NAME}"
+            supported_generation_methods = ["generateContent"]
+
+        return [_ModelInfo()]
+
+    def GenerativeModel(self, model_name: str, system_instruction: str = None, **kwargs):
+        return MockModel(self, model_name, system_instruction)
+
+    def cached_model(self, model_name: str, system_instruction: str, ttl_seconds: float):
+        return MockModel(self, model_name, system_instruction, cached=True)
+
+    def _latency(self, rng: random.Random) -> float:
+        median = self.latency_ms / 1000
+        if self.distribution == "fixed" or median <= 0:
+            return max(median, 0.0)
+        if self.distribution == "uniform":
+            return max(rng.uniform(median * (1 - self.spread), median * (1 + self.spread)), 0.0)
+        return rng.lognormvariate(0, self.spread) * median
+
+    def sample(self) -> tuple:
+        """Draw (latency seconds, failure kind or None, malformed) for one call"""
+        with self._lock:
+            self.calls += 1
+            rng = self._random
+            latency = self._latency(rng)
+            roll = rng.random()
+            malformed = rng.random() < self.malformed_rate
+        failure = None
+        if roll < self.quota_error_rate:
+            failure = "quota"
+        elif roll < self.quota_error_rate + self.timeout_error_rate:
+            failure = "timeout"
+        return latency, failure, malformed
+
+    @staticmethod
+    def raise_failure(failure):
+        if failure == "quota":
+            raise google_exceptions.ResourceExhausted("Resource has been exhausted (e.g. check quota).")
+        if failure == "timeout":
+            raise google_exceptions.DeadlineExceeded("Deadline Exceeded")
+
+    @staticmethod
+    def render(contents) -> str:
+        if isinstance(contents, str):
+            component = None if "User Description:" in contents else _COMPONENT.search(contents)
+            if component:
+                name = component.group(1)
+                return f"<jsx>\n{JSX_TEMPLATE.format(name=name, title=name)}\n</jsx>"
+            match = _DESCRIPTION.search(contents)
+            description = match.group(1) if match else contents
+            words = [w for w in _WORD.findall(description) if w.lower() not in _STOPWORDS][:3]
+            name = "".join(w.capitalize() for w in words) or "MockComponent"
+            return f"<jsx>\n{JSX_TEMPLATE.format(name=name, title=' '.join(words) or 'Mock')}\n</jsx>"
+
+        # Image request: name the component after a digest of the image part,
+        # with one section per screen height so long pages give long output
+        image = contents[-1]
+        if isinstance(image, dict):
+            data = image.get("data", b"")
+            try:
+                width, height = Image.open(io.BytesIO(data)).size
+            except OSError:
+                width = height = 1
+        else:
+            data, (width, height) = image.tobytes(), image.size
+        digest = hashlib.sha256(data).hexdigest()[:6]
+        name = f"MockScreen{digest.upper()}"
+        jsx = JSX_TEMPLATE.format(name=name, title="Mock screen")
+        screens = round(height / width) if width else 1
+        if screens > 1:
+            sections = "\n".join(SECTION_TEMPLATE.format(number=i + 1) for i in range(screens))
+            jsx = jsx.replace("    </div>\n  );", f"{sections}\n    </div>\n  );")
+        return json.dumps({"component_name": name, "jsx": jsx})
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+# "memory" (default) or "sqlite" to share entries across workers and restarts
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different prompts share an entry.
+    Case is kept: it can change the output (button labels, headings)."""
+    return " ".join(text.split())
+
+
+def bypasses_cache(cache_control) -> bool:
+    """True when a Cache-Control header asks for a fresh generation"""
+    if not cache_control:
+        return False
+    directives = {d.strip().lower() for d in cache_control.split(",")}
+    return "no-cache" in directives or "no-store" in directives
+
+
+def make_key(kind: str, payload, model_name: str, prompt_version: str) -> str:
+    """Content-address a generation by its input, model and prompt template"""
+    if isinstance(payload, str):
+        payload = normalize_text(payload).encode("utf-8")
+    digest = hashlib.sha256()
+    for part in (kind.encode(), model_name.encode(), prompt_version.encode()):
+        digest.update(part)
+        digest.update(b"\0")
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+class SQLiteBackend:
+    """Shared second-level store; entries expire after the same TTL as the LRU"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str, ttl: float):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+
+class ResponseCache:
+    """In-process LRU with TTL eviction, optionally backed by a shared store"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL_SECONDS, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if time.monotonic() - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(value)
+                del self._entries[key]
+
+        value = self.backend.get(key, self.ttl) if self.backend else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+        return dict(value)
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._store(key, value)
+        if self.backend:
+            self.backend.set(key, value)
+
+    def preload(self, key: str, value: dict, age: float = 0.0):
+        """Insert into the in-process LRU only, keeping the entry's original age"""
+        with self._lock:
+            self._store(key, value, time.monotonic() - age)
+
+    def _store(self, key: str, value: dict, created_at: float = None):
+        self._entries[key] = (dict(value), time.monotonic() if created_at is None else created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": RESPONSE_CACHE_ENABLED,
+            "backend": "sqlite" if self.backend else "memory",
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+response_cache = ResponseCache(
+    backend=SQLiteBackend(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_BACKEND == "sqlite" else None
+)
@@ -0,0 +1,182 @@
+import re
+import json
+import threading
+
+# All patterns are compiled once at import; every pass below is linear in the
+# size of the response.
+_FENCE = re.compile(r'```[A-Za-z]*[ \t]*\r?\n?')
+_ESCAPE = re.compile(r'\\([nrt"\'])')
+_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', '"': '"', "'": "'"}
+# "jsx" string value, honouring escaped quotes; used when the JSON is malformed
+_JSX_FIELD = re.compile(r'"jsx"\s*:\s*"((?:[^"\\]|\\.)*)"', re.DOTALL)
+_NAME_FIELD = re.compile(r'"component_name"\s*:\s*"((?:[^"\\]|\\.)*)"')
+# No leading \b: a literal prefix lets the regex engine skip ahead with a fast search
+_EXPORT_DEFAULT = re.compile(r'export\s+default\s+(?:function\s+|class\s+)?([A-Z][\w$]*)')
+_DECLARATION = re.compile(r'\b(?:const|let|var|function|class)\s+([A-Za-z_$][\w$]*)')
+
+# strict=False accepts raw newlines inside strings, which models often emit
+_DECODER = json.JSONDecoder(strict=False)
+# Bounds find_json_object on responses full of unrelated braces
+_MAX_JSON_ATTEMPTS = 32
+
+DEFAULT_COMPONENT_NAME = "GeneratedComponent"
+JSON_PARSE_ERROR = "Failed to extract JSX from JSON response. The AI returned JSON format that couldn't be parsed."
+
+
+def strip_fences(text: str) -> str:
+    """Remove markdown code fences (```json, ```jsx, bare ```)"""
+    if "```" not in text:
+        return text
+    return _FENCE.sub("", text)
+
+
+def unescape(text: str) -> str:
+    """Turn leftover literal escape sequences (\\n, \\") into characters"""
+    if "\\" not in text:
+        return text
+    return _ESCAPE.sub(lambda m: _ESCAPES[m.group(1)], text)
+
+
+def extract_tag(text: str, tag: str = "jsx"):
+    """Return the contents of the first <tag>...</tag>, or None"""
+    start = text.find(f"<{tag}>")
+    if start == -1:
+        return None
+    start += len(tag) + 2
+    end = text.find(f"</{tag}>", start)
+    if end == -1:
+        return None
+    return text[start:end]
+
+
+def find_json_object(text: str):
+    """Decode the first JSON object in `text`, or None.
+
+    Uses the C JSON scanner from each '{' in turn, so braces inside
+    strings are handled correctly and no character loop runs in Python.
+    """
+    start = text.find("{")
+    attempts = 0
+    while start != -1 and attempts < _MAX_JSON_ATTEMPTS:
+        attempts += 1
+        try:
+            value, _ = _DECODER.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except ValueError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+def detect_component_name(code: str, default: str = DEFAULT_COMPONENT_NAME) -> str:
+    """Name of the exported component, else the first PascalCase declaration"""
+    match = _EXPORT_DEFAULT.search(code)
+    if match:
+        return match.group(1)
+    first = None
+    for match in _DECLARATION.finditer(code):
+        name = match.group(1)
+        if name[0].isupper():
+            return name
+        first = first or name
+    return first or default
+
+
+def _success(jsx_code: str, component_name: str) -> dict:
+    return {
+        "jsx_code": jsx_code,
+        "component_name": component_name,
+        "success": True
+    }
+
+
+def parse_text_response(response_text: str) -> dict:
+    """Extract the component from a <jsx>-tagged text response"""
+    jsx_code = extract_tag(response_text)
+    jsx_code = (jsx_code if jsx_code is not None else response_text).strip()
+    return _success(jsx_code, detect_component_name(jsx_code))
+
+
+def parse_image_response(response_text: str) -> dict:
+    """Recover the component from a (possibly malformed) JSON response"""
+    response_text = strip_fences(response_text).strip()
+
+    # Well-formed JSON object
+    result = find_json_object(response_text)
+    if result is not None:
+        jsx_code = result.get("jsx", "")
+        if isinstance(jsx_code, str):
+            jsx_code = strip_fences(unescape(jsx_code)).strip()
+            if jsx_code:
+                name = result.get("component_name") or detect_component_name(jsx_code)
+                return _success(jsx_code, name)
+
+    # Malformed or truncated JSON: pull the "jsx" string value directly
+    if '"jsx"' in response_text:
+        match = _JSX_FIELD.search(response_text)
+        if match:
+            jsx_code = strip_fences(unescape(match.group(1))).strip()
+            if jsx_code:
+                name_match = _NAME_FIELD.search(response_text)
+                name = name_match.group(1) if name_match else detect_component_name(jsx_code)
+                return _success(jsx_code, name)
+
+    # Plain JSX, optionally wrapped in <jsx> tags
+    jsx_code = extract_tag(response_text)
+    if jsx_code is None:
+        if response_text.startswith('{') and '"jsx"' in response_text:
+            return {
+                "jsx_code": "",
+                "component_name": "Error",
+                "success": False,
+                "message": JSON_PARSE_ERROR
+            }
+        jsx_code = response_text
+    jsx_code = unescape(strip_fences(jsx_code)).strip()
+    return _success(jsx_code, detect_component_name(jsx_code))
+
+
+def parse_structured_response(response_text: str):
+    """Parse a schema-constrained {"component_name", "jsx"} response.
+
+    Returns None when the text is not the expected object so the caller can
+    fall back to parse_image_response().
+    """
+    try:
+        result = json.loads(response_text)
+    except ValueError:
+        return None
+    if not isinstance(result, dict):
+        return None
+    jsx_code = result.get("jsx")
+    if not isinstance(jsx_code, str) or not jsx_code.strip():
+        return None
+    jsx_code = jsx_code.strip()
+    name = result.get("component_name") or detect_component_name(jsx_code)
+    return _success(jsx_code, name)
+
+
+class ParseStats:
+    """Per-mode parse outcomes, to compare structured output with the legacy parser"""
+
+    def __init__(self):
+        self._modes = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, success: bool, fallback: bool = False):
+        with self._lock:
+            counts = self._modes.setdefault(mode, {"responses": 0, "failures": 0, "fallbacks": 0})
+            counts["responses"] += 1
+            counts["failures"] += not success
+            counts["fallbacks"] += fallback
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                mode: dict(counts, failure_rate=round(counts["failures"] / counts["responses"], 4))
+                for mode, counts in self._modes.items()
+            }
+
+
+parse_stats = ParseStats()
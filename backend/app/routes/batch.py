@@ -0,0 +1,117 @@
+import os
+import asyncio
+from typing import List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import StreamingResponse
+from dotenv import load_dotenv
+
+from app.schemas import BatchTextToJSXRequest, BatchItemResult, BatchResponse
+from app.gemini_client import generate_jsx_from_text, generate_jsx_from_image
+from app.executor import run_generation, GenerationTimeoutError
+from app.uploads import read_image_upload
+from app.admission import client_id, admitted, AdmissionRejectedError
+
+load_dotenv()
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+# Per-batch fan-out; the global MAX_CONCURRENT_GENERATIONS cap still applies
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+router = APIRouter()
+
+
+async def _run_item(index: int, semaphore: asyncio.Semaphore, generate, payload, use_cache: bool, user: str, filename=None, load=None) -> BatchItemResult:
+    async with semaphore:
+        if load is not None:
+            # Read under the semaphore, so at most BATCH_MAX_CONCURRENCY
+            # uploads are held in memory at once
+            try:
+                payload = await load(payload)
+            except HTTPException as e:
+                return BatchItemResult(index=index, filename=filename, success=False, message=e.detail)
+        # Each item is charged like a single request: a rate limit token and an admission slot
+        try:
+            async with admitted(user):
+                result = await run_generation(generate, payload, use_cache, user)
+        except AdmissionRejectedError as e:
+            result = {"success": False, "message": e.detail}
+        except GenerationTimeoutError as e:
+            result = {"success": False, "message": str(e)}
+        except Exception as e:
+            result = {"success": False, "message": f"Unexpected error: {str(e)}"}
+
+    if not result["success"]:
+        return BatchItemResult(index=index, filename=filename, success=False, message=result.get("message"))
+    return BatchItemResult(
+        index=index,
+        filename=filename,
+        jsx_code=result["jsx_code"],
+        component_name=result["component_name"],
+        success=True,
+        parses=result.get("parses"),
+        syntax_error=result.get("syntax_error")
+    )
+
+
+def _check_size(count: int):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    if count > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items. Maximum is {BATCH_MAX_ITEMS} per batch.")
+
+
+async def _respond(tasks: list, failures: list, stream: bool):
+    """Collect results, or stream them as NDJSON in completion order"""
+    if stream:
+        async def lines():
+            for failure in failures:
+                yield failure.model_dump_json() + "\n"
+            for next_done in asyncio.as_completed(tasks):
+                yield (await next_done).model_dump_json() + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = failures + list(await asyncio.gather(*tasks))
+    results.sort(key=lambda item: item.index)
+    succeeded = sum(1 for item in results if item.success)
+    return BatchResponse(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+
+@router.post("/batch/text", response_model=BatchResponse)
+async def batch_text_to_jsx(request: BatchTextToJSXRequest, http_request: Request, stream: bool = Query(False)):
+    """Generate JSX for many text descriptions concurrently"""
+    _check_size(len(request.items))
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    user = client_id(http_request.scope)
+
+    tasks = []
+    failures = []
+    for index, item in enumerate(request.items):
+        if not item.text_description or not item.text_description.strip():
+            failures.append(BatchItemResult(index=index, success=False, message="Text description is required"))
+            continue
+        tasks.append(asyncio.ensure_future(
+            _run_item(index, semaphore, generate_jsx_from_text, item.text_description, not item.no_cache, user)
+        ))
+    return await _respond(tasks, failures, stream)
+
+
+@router.post("/batch/image", response_model=BatchResponse)
+async def batch_image_to_jsx(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    no_cache: bool = Form(False),
+    stream: bool = Query(False)
+):
+    """Generate JSX for many uploaded images concurrently"""
+    _check_size(len(files))
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    user = client_id(request.scope)
+
+    tasks = [
+        asyncio.ensure_future(_run_item(
+            index, semaphore, generate_jsx_from_image, file, not no_cache, user, file.filename, read_image_upload
+        ))
+        for index, file in enumerate(files)
+    ]
+    return await _respond(tasks, [], stream)
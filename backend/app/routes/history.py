@@ -0,0 +1,54 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from app.schemas import HistoryPage, HistoryRecord
+from app.history import history_store
+from app.admission import client_id, is_authenticated
+
+HISTORY_PAGE_MAX = 100
+
+router = APIRouter()
+
+
+def _require_store():
+    if history_store is None:
+        raise HTTPException(status_code=404, detail="History is disabled")
+    return history_store
+
+
+def _owner(request: Request) -> str:
+    """History is only readable by clients holding one of API_KEYS; an IP
+    address is shared too widely to identify whose generations they are"""
+    client = client_id(request.scope)
+    if not is_authenticated(client):
+        raise HTTPException(status_code=401, detail="History requires an API key (X-API-Key)")
+    return client
+
+
+@router.get("/history", response_model=HistoryPage)
+async def list_history(
+    request: Request,
+    kind: Optional[str] = Query(None),
+    input_hash: Optional[str] = Query(None),
+    before: Optional[float] = Query(None),
+    before_id: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=HISTORY_PAGE_MAX)
+):
+    """The caller's generations, newest first, paginated with `before` and `before_id`"""
+    store = _require_store()
+    records = await asyncio.to_thread(store.query, _owner(request), kind, input_hash, before, before_id, limit)
+    if len(records) < limit:
+        return HistoryPage(items=records)
+    return HistoryPage(items=records, next_before=records[-1]["created_at"], next_before_id=records[-1]["id"])
+
+
+@router.get("/history/{record_id}", response_model=HistoryRecord)
+async def get_history_record(record_id: str, request: Request):
+    """One of the caller's generations"""
+    store = _require_store()
+    owner = _owner(request)
+    record = await asyncio.to_thread(store.get, record_id)
+    if record is None or record["user"] != owner:
+        raise HTTPException(status_code=404, detail="History record not found")
+    return record
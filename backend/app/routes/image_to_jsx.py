@@ -1,33 +1,47 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Request
+from fastapi.responses import StreamingResponse
 from app.schemas import ImageToJSXResponse
-from app.gemini_client import generate_jsx_from_image
+from app.gemini_client import generate_jsx_from_image, stream_jsx_from_image
+from app.executor import run_generation, iterate_generation, GenerationTimeoutError
+from app.streaming import sse_events
+from app.response_cache import bypasses_cache
+from app.uploads import read_image_upload
+from app.admission import client_id
+
+logger = logging.getLogger("instamock.routes")
 
 router = APIRouter()
 
 
 @router.post("/image", response_model=ImageToJSXResponse)
-async def image_to_jsx(file: UploadFile = File(...)):
+async def image_to_jsx(
+    request: Request,
+    file: UploadFile = File(...),
+    no_cache: bool = Form(False),
+    cache_control: Optional[str] = Header(None)
+):
     """Generate JSX code from uploaded image"""
-    # Validate file type
-    if not file.content_type or not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
-    
-    # Read image bytes
-    try:
-        image_bytes = await file.read()
-        if len(image_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Empty file")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
+    image_bytes = await read_image_upload(file)
     
     # Generate JSX from image
     try:
-        result = generate_jsx_from_image(image_bytes)
+        use_cache = not (no_cache or bypasses_cache(cache_control))
+        result = await run_generation(generate_jsx_from_image, image_bytes, use_cache, client_id(request.scope))
         
         if not result["success"]:
             error_message = result.get("message", "Failed to generate JSX code from image")
-            # Return 400 for configuration errors, 500 for API errors
-            status_code = 400 if "API key" in error_message or "configured" in error_message else 500
+            # Return 400 for configuration errors, 413 for oversized images,
+            # 504 when the model call deadline ran out, 500 for API errors
+            if "API key" in error_message or "configured" in error_message:
+                status_code = 400
+            elif "too large" in error_message:
+                status_code = 413
+            elif "ModelCallTimeoutError" in error_message:
+                status_code = 504
+            else:
+                status_code = 500
             raise HTTPException(
                 status_code=status_code,
                 detail=error_message
@@ -36,13 +50,36 @@ async def image_to_jsx(file: UploadFile = File(...)):
         return ImageToJSXResponse(
             jsx_code=result["jsx_code"],
             component_name=result["component_name"],
-            success=True
+            success=True,
+            parses=result.get("parses"),
+            syntax_error=result.get("syntax_error")
         )
     except HTTPException:
         raise
+    except GenerationTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
+        logger.exception("Unexpected error in image generation")
         raise HTTPException(
             status_code=500,
             detail=f"Unexpected error: {str(e)}"
         )
 
+
+@router.post("/image/stream")
+async def image_to_jsx_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    no_cache: bool = Form(False),
+    cache_control: Optional[str] = Header(None)
+):
+    """Stream JSX code for an uploaded image as server-sent events"""
+    image_bytes = await read_image_upload(file)
+    
+    use_cache = not (no_cache or bypasses_cache(cache_control))
+    events = iterate_generation(stream_jsx_from_image, image_bytes, use_cache, client_id(request.scope))
+    return StreamingResponse(
+        sse_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.schemas import TextToJSXRequest, JobResponse
+from app.jobs import job_manager, JobQueueFullError, FINISHED, SUCCEEDED
+from app.streaming import format_sse
+from app.response_cache import bypasses_cache
+from app.uploads import read_image_upload
+from app.admission import client_id
+from app.prompts import fit_text_description, PromptBudgetError
+
+JOB_WAIT_MAX_SECONDS = 30
+JOB_EVENTS_MAX_SECONDS = 600
+
+router = APIRouter()
+
+
+def _require_jobs():
+    if job_manager is None:
+        raise HTTPException(status_code=404, detail="Jobs are disabled")
+    return job_manager
+
+
+async def _submit(request: Request, kind: str, payload: bytes, use_cache: bool, idempotency_key) -> JSONResponse:
+    manager = _require_jobs()
+    try:
+        job = await manager.submit(kind, payload, use_cache, client_id(request.scope), idempotency_key)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return JSONResponse(
+        status_code=202,
+        content=JobResponse(**job).model_dump(),
+        headers={"Location": f"/api/jobs/{job['id']}"}
+    )
+
+
+@router.post("/jobs/text", response_model=JobResponse, status_code=202)
+async def create_text_job(
+    request: TextToJSXRequest,
+    http_request: Request,
+    cache_control: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Queue a text-to-JSX generation and return its job id immediately"""
+    if not request.text_description or not request.text_description.strip():
+        raise HTTPException(status_code=400, detail="Text description is required")
+    # Reject over-budget descriptions now rather than as a failed job later
+    try:
+        text_description = fit_text_description(request.text_description)
+    except PromptBudgetError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    use_cache = not (request.no_cache or bypasses_cache(cache_control))
+    return await _submit(http_request, "text", text_description.encode("utf-8"), use_cache, idempotency_key)
+
+
+@router.post("/jobs/image", response_model=JobResponse, status_code=202)
+async def create_image_job(
+    request: Request,
+    file: UploadFile = File(...),
+    no_cache: bool = Form(False),
+    cache_control: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Queue an image-to-JSX generation and return its job id immediately"""
+    image_bytes = await read_image_upload(file)
+    use_cache = not (no_cache or bypasses_cache(cache_control))
+    return await _submit(request, "image", image_bytes, use_cache, idempotency_key)
+
+
+async def _owned_job(job_id: str, request: Request, wait: float = 0):
+    manager = _require_jobs()
+    job = await manager.wait(job_id, wait)
+    if job is None or job["user"] != client_id(request.scope):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, request: Request, wait: float = Query(0, ge=0, le=JOB_WAIT_MAX_SECONDS)):
+    """Job status and, once finished, its result. `wait` long-polls for up to that many seconds."""
+    return await _owned_job(job_id, request, wait)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-sent events: the current status, then `done` or `error` when the job finishes"""
+    job = await _owned_job(job_id, request)
+
+    async def events():
+        current = job
+        yield format_sse("status", {"status": current["status"]})
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + JOB_EVENTS_MAX_SECONDS
+        while current["status"] not in FINISHED and loop.time() < deadline:
+            # Short waits keep the connection alive through idle timeouts
+            current = await job_manager.wait(job_id, 15) or current
+            if current["status"] not in FINISHED:
+                yield ": keep-alive\n\n"
+        if current["status"] == SUCCEEDED:
+            yield format_sse("done", JobResponse(**current).model_dump())
+        elif current["status"] in FINISHED:
+            yield format_sse("error", {"message": current["message"]})
+        else:
+            yield format_sse("error", {"message": "Job is still running; poll GET /api/jobs/{id}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,23 +1,46 @@
-from fastapi import APIRouter, HTTPException
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 from app.schemas import TextToJSXRequest, TextToJSXResponse
-from app.gemini_client import generate_jsx_from_text
+from app.gemini_client import generate_jsx_from_text, stream_jsx_from_text
+from app.executor import run_generation, iterate_generation, GenerationTimeoutError
+from app.streaming import sse_events
+from app.response_cache import bypasses_cache
+from app.admission import client_id
+from app.tracing import span
+
+logger = logging.getLogger("instamock.routes")
 
 router = APIRouter()
 
 
 @router.post("/text", response_model=TextToJSXResponse)
-async def text_to_jsx(request: TextToJSXRequest):
+async def text_to_jsx(request: TextToJSXRequest, http_request: Request, cache_control: Optional[str] = Header(None)):
     """Generate JSX code from text description"""
-    if not request.text_description or not request.text_description.strip():
-        raise HTTPException(status_code=400, detail="Text description is required")
+    with span("validate_input", kind="text") as attrs:
+        if not request.text_description or not request.text_description.strip():
+            raise HTTPException(status_code=400, detail="Text description is required")
+        attrs["input_chars"] = len(request.text_description)
     
     try:
-        result = generate_jsx_from_text(request.text_description)
+        use_cache = not (request.no_cache or bypasses_cache(cache_control))
+        result = await run_generation(
+            generate_jsx_from_text, request.text_description, use_cache, client_id(http_request.scope)
+        )
         
         if not result["success"]:
             error_message = result.get("message", "Failed to generate JSX code")
-            # Return 400 for configuration errors, 500 for API errors
-            status_code = 400 if "API key" in error_message or "configured" in error_message else 500
+            # Return 400 for configuration errors, 413 for descriptions over the token budget,
+            # 504 when the model call deadline ran out, 500 for API errors
+            if "API key" in error_message or "configured" in error_message:
+                status_code = 400
+            elif "PromptBudgetError" in error_message:
+                status_code = 413
+            elif "ModelCallTimeoutError" in error_message:
+                status_code = 504
+            else:
+                status_code = 500
             raise HTTPException(
                 status_code=status_code,
                 detail=error_message
@@ -26,13 +49,36 @@ async def text_to_jsx(request: TextToJSXRequest):
         return TextToJSXResponse(
             jsx_code=result["jsx_code"],
             component_name=result["component_name"],
-            success=True
+            success=True,
+            parses=result.get("parses"),
+            syntax_error=result.get("syntax_error")
         )
     except HTTPException:
         raise
+    except GenerationTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
+        logger.exception("Unexpected error in text generation")
         raise HTTPException(
             status_code=500,
             detail=f"Unexpected error: {str(e)}"
         )
 
+
+@router.post("/text/stream")
+async def text_to_jsx_stream(request: TextToJSXRequest, http_request: Request, cache_control: Optional[str] = Header(None)):
+    """Stream JSX code for a text description as server-sent events"""
+    with span("validate_input", kind="text") as attrs:
+        if not request.text_description or not request.text_description.strip():
+            raise HTTPException(status_code=400, detail="Text description is required")
+        attrs["input_chars"] = len(request.text_description)
+    
+    use_cache = not (request.no_cache or bypasses_cache(cache_control))
+    events = iterate_generation(
+        stream_jsx_from_text, request.text_description, use_cache, client_id(http_request.scope)
+    )
+    return StreamingResponse(
+        sse_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
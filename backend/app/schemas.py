@@ -1,9 +1,11 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 class TextToJSXRequest(BaseModel):
     text_description: str
+    # Skip the response cache lookup (the fresh result is still cached)
+    no_cache: bool = False
 
 
 class TextToJSXResponse(BaseModel):
@@ -11,6 +13,9 @@ class TextToJSXResponse(BaseModel):
     component_name: str
     success: bool
     message: Optional[str] = None
+    # Whether jsx_code passed the server-side syntax check (None if not checked)
+    parses: Optional[bool] = None
+    syntax_error: Optional[str] = None
 
 
 class ImageToJSXResponse(BaseModel):
@@ -18,4 +23,71 @@ class ImageToJSXResponse(BaseModel):
     component_name: str
     success: bool
     message: Optional[str] = None
+    # Whether jsx_code passed the server-side syntax check (None if not checked)
+    parses: Optional[bool] = None
+    syntax_error: Optional[str] = None
 
+
+
+class BatchTextToJSXRequest(BaseModel):
+    items: List[TextToJSXRequest]
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    jsx_code: str = ""
+    component_name: str = ""
+    success: bool
+    message: Optional[str] = None
+    parses: Optional[bool] = None
+    syntax_error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+
+class HistoryRecord(BaseModel):
+    id: str
+    created_at: float
+    user: str
+    kind: str
+    input_hash: str
+    input_text: Optional[str] = None
+    model: Optional[str] = None
+    prompt_version: Optional[str] = None
+    latency_ms: float
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached: bool
+    success: bool
+    message: Optional[str] = None
+    component_name: str = ""
+    jsx_code: str = ""
+    parses: Optional[bool] = None
+    syntax_error: Optional[str] = None
+
+
+class HistoryPage(BaseModel):
+    items: List[HistoryRecord]
+    # Pass as `before` and `before_id` to fetch the next page; null on the last page
+    next_before: Optional[float] = None
+    next_before_id: Optional[str] = None
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    # queued, running, succeeded or failed
+    status: str
+    created_at: float
+    updated_at: float
+    jsx_code: Optional[str] = None
+    component_name: Optional[str] = None
+    message: Optional[str] = None
+    # As on the synchronous endpoints, set once the job has succeeded
+    parses: Optional[bool] = None
+    syntax_error: Optional[str] = None
@@ -0,0 +1,73 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+from app.metrics import coalesced_generations
+
+load_dotenv()
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs block until it finishes and get the same result, or the same
+    exception. Once it finishes the key is forgotten, so later calls run
+    again (the response cache covers reuse after that).
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func, kind: str = ""):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            call.done.wait()
+            coalesced_generations.inc(kind=kind)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "enabled": SINGLE_FLIGHT_ENABLED,
+            "calls": self.leaders,
+            "coalesced": self.followers,
+            "in_flight": in_flight,
+        }
+
+
+single_flight = SingleFlight()
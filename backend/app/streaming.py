@@ -0,0 +1,136 @@
+import re
+import json
+
+from app.executor import GenerationTimeoutError
+
+# How much preamble to buffer while looking for the opening <jsx> tag before
+# giving up and forwarding the response as-is
+_JSX_SEEK_LIMIT = 512
+_JSON_JSX_KEY = re.compile(r'"jsx"\s*:\s*"')
+_JSON_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+
+class JSXTagFilter:
+    """Incrementally strips the <jsx>...</jsx> wrapper from streamed text.
+
+    feed() returns the part of the JSX that is safe to forward; a few
+    characters are held back so a closing tag split across chunks is not
+    leaked to the client.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._state = "seek"
+        self._started = False
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        if self._state == "seek":
+            start = self._buffer.find("<jsx>")
+            if start != -1:
+                self._buffer = self._buffer[start + len("<jsx>"):]
+                self._state = "inside"
+            elif len(self._buffer) > _JSX_SEEK_LIMIT:
+                self._state = "raw"
+            else:
+                return ""
+
+        if self._state == "raw":
+            out, self._buffer = self._buffer, ""
+            return self._emit(out)
+
+        if self._state == "inside":
+            end = self._buffer.find("</jsx>")
+            if end != -1:
+                out, self._buffer = self._buffer[:end], ""
+                self._state = "done"
+                return self._emit(out.rstrip())
+            # Hold back a possible partial closing tag and trailing whitespace
+            cut = len(self._buffer[:-(len("</jsx>") - 1)].rstrip())
+            out, self._buffer = self._buffer[:cut], self._buffer[cut:]
+            return self._emit(out)
+
+        return ""
+
+    def flush(self) -> str:
+        if self._state == "done":
+            return ""
+        out, self._buffer = self._buffer, ""
+        return self._emit(out.rstrip())
+
+
+class JSONFieldFilter:
+    """Incrementally decodes the "jsx" string value of a streamed JSON object"""
+
+    def __init__(self):
+        self._buffer = ""
+        self._state = "seek"
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        if self._state == "seek":
+            match = _JSON_JSX_KEY.search(self._buffer)
+            if not match:
+                return ""
+            self._buffer = self._buffer[match.end():]
+            self._state = "inside"
+
+        if self._state != "inside":
+            return ""
+
+        out = []
+        i = 0
+        buffer = self._buffer
+        while i < len(buffer):
+            ch = buffer[i]
+            if ch == '"':
+                self._state = "done"
+                i = len(buffer)
+                break
+            if ch != '\\':
+                out.append(ch)
+                i += 1
+                continue
+            # Escape sequence: wait for the rest of it if it was split
+            if i + 1 >= len(buffer):
+                break
+            code = buffer[i + 1]
+            if code == 'u':
+                if i + 6 > len(buffer):
+                    break
+                try:
+                    out.append(chr(int(buffer[i + 2:i + 6], 16)))
+                except ValueError:
+                    out.append(buffer[i:i + 6])
+                i += 6
+                continue
+            out.append(_JSON_ESCAPES.get(code, code))
+            i += 2
+
+        self._buffer = buffer[i:]
+        return "".join(out)
+
+    def flush(self) -> str:
+        self._buffer = ""
+        return ""
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def sse_events(events):
+    """Serialize (event, data) pairs as server-sent events"""
+    try:
+        async for event, data in events:
+            yield format_sse(event, data)
+    except GenerationTimeoutError as e:
+        yield format_sse("error", {"message": str(e)})
+    except Exception as e:
+        yield format_sse("error", {"message": f"Unexpected error: {str(e)}"})
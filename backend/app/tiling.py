@@ -0,0 +1,214 @@
+import io
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from dotenv import load_dotenv
+
+from app.image_preprocessing import open_image, encode_image, preprocess_stats
+from app.jsx_validation import code_regions, JSXSyntaxError
+from app.response_parser import detect_component_name
+
+load_dotenv()
+
+# Split tall screenshots into sections generated concurrently and merged
+TILING_ENABLED = os.getenv("TILING_ENABLED", "false").lower() == "true"
+# Only images at least this many times taller than wide are split
+TILING_MIN_ASPECT = float(os.getenv("TILING_MIN_ASPECT", "2.0"))
+# Sections aim for this height (in image widths), cut at the nearest whitespace band
+TILING_SECTION_ASPECT = float(os.getenv("TILING_SECTION_ASPECT", "1.0"))
+TILING_MAX_SECTIONS = int(os.getenv("TILING_MAX_SECTIONS", "8"))
+# Section model calls in flight at once, across all requests
+TILING_WORKERS = int(os.getenv("TILING_WORKERS", "16"))
+
+PAGE_COMPONENT = "FullPage"
+
+# Rows are probed at this width: averaging columns is cheap and keeps thin gaps
+_PROBE_WIDTH = 128
+# A row is blank when its brightness varies by no more than this
+_BLANK_TOLERANCE = 6
+# Bands thinner than this share of the width are line spacing, not section gaps
+_MIN_GAP = 0.01
+# No section shorter than this share of the width
+_MIN_SECTION = 0.25
+
+_IMPORT = re.compile(r"^[ \t]*import\s[^;]*?from\s+['\"]([^'\"]+)['\"];?[ \t]*$\n?", re.MULTILINE)
+_EXPORT_DEFAULT_NAME = re.compile(r"^[ \t]*export\s+default\s+([A-Za-z_$][\w$]*)\s*;?[ \t]*$\n?", re.MULTILINE)
+# `export default function Hero(` or `class Hero`, or the anonymous forms
+_EXPORT_DEFAULT_DECLARATION = re.compile(
+    r"^export\s+default\s+((?:async\s+)?function(?:\s*\*)?|class)(?:(\s+(?!extends\b)[A-Za-z_$][\w$]*)|\s*(?=\())?",
+    re.MULTILINE,
+)
+# Any other default export is an expression: `export default (props) => ...`
+_EXPORT_DEFAULT_EXPRESSION = re.compile(r"^export\s+default\s+", re.MULTILINE)
+_EXPORT = re.compile(r"^export\s+(?:default\s+)?(?=(?:async\s+)?function\b|class\b|const\b|let\b|var\b)", re.MULTILINE)
+_TOP_LEVEL = re.compile(r"^(?:async\s+)?(?:const|let|var|function\*?|class)\s+([A-Za-z_$][\w$]*)", re.MULTILINE)
+
+section_executor = ThreadPoolExecutor(max_workers=TILING_WORKERS, thread_name_prefix="section")
+
+
+def should_tile(image_bytes: bytes) -> bool:
+    """Whether tiling is on and the image is tall enough (reads only the header)"""
+    if not TILING_ENABLED:
+        return False
+    try:
+        width, height = Image.open(io.BytesIO(image_bytes)).size
+    except Exception:
+        # Unreadable images are reported by the single-call path
+        return False
+    return height >= width * TILING_MIN_ASPECT
+
+
+def whitespace_bands(image: Image.Image) -> list:
+    """(top, bottom) row ranges that are one flat colour across the width,
+    from a row projection of the image. Bands touching the edges are margins,
+    not gaps, and are left out."""
+    width, height = image.size
+    probe = image.convert("L").resize((min(width, _PROBE_WIDTH), height), Image.BOX)
+    row = probe.width
+    pixels = probe.tobytes()
+    min_gap = max(int(width * _MIN_GAP), 2)
+    bands, top = [], None
+    for y in range(height + 1):
+        line = pixels[y * row:(y + 1) * row]
+        blank = y < height and max(line) - min(line) <= _BLANK_TOLERANCE
+        if blank and top is None:
+            top = y
+        elif not blank and top is not None:
+            if y - top >= min_gap and top > 0 and y < height:
+                bands.append((top, y))
+            top = None
+    return bands
+
+
+def section_bounds(width: int, height: int, bands: list) -> list:
+    """Split rows into sections about TILING_SECTION_ASPECT widths tall,
+    cutting only in the middle of whitespace bands; a band is used when it
+    lies within half a section of an evenly spaced cut"""
+    count = min(TILING_MAX_SECTIONS, round(height / (width * TILING_SECTION_ASPECT)))
+    if count < 2:
+        return [(0, height)]
+    step = height / count
+    min_section = width * _MIN_SECTION
+    cuts = []
+    for k in range(1, count):
+        ideal = step * k
+        previous = cuts[-1] if cuts else 0
+        candidates = [
+            (top + bottom) // 2 for top, bottom in bands
+            if abs((top + bottom) / 2 - ideal) <= step / 2
+            and (top + bottom) // 2 - previous >= min_section
+            and height - (top + bottom) // 2 >= min_section
+        ]
+        if candidates:
+            cuts.append(min(candidates, key=lambda cut: abs(cut - ideal)))
+    edges = [0] + cuts + [height]
+    return list(zip(edges, edges[1:]))
+
+
+def split_screenshot(image_bytes: bytes) -> list:
+    """Sections of a tall screenshot as images, top to bottom; a single one
+    when no whitespace band is usable. Encode each with encode_section()."""
+    start = time.perf_counter()
+    image = open_image(image_bytes)
+    bounds = section_bounds(image.width, image.height, whitespace_bands(image))
+    sections = [image.crop((0, top, image.width, bottom)) for top, bottom in bounds]
+    preprocess_stats.record(len(image_bytes), 0, time.perf_counter() - start)
+    return sections
+
+
+def encode_section(section: Image.Image) -> dict:
+    """Encode one section for the model. Each section is downscaled on its own,
+    so it keeps more detail than the whole page would."""
+    start = time.perf_counter()
+    blob, _ = encode_image(section)
+    preprocess_stats.record(0, len(blob["data"]), time.perf_counter() - start, images=0)
+    return blob
+
+
+def _unique(name: str, number: int, used: set) -> str:
+    candidate = f"{name}{number}"
+    while candidate in used:
+        candidate += "_"
+    return candidate
+
+
+def _default_export(body: str, anonymous: str) -> tuple:
+    """Remove the default export from a section; returns (body, component).
+    An anonymous default export is declared as `anonymous`."""
+    names = []
+
+    def declaration(match):
+        if match.group(2):
+            names.append(match.group(2).strip())
+            return match.group(1) + match.group(2)
+        names.append(anonymous)
+        return f"{match.group(1)} {anonymous}"
+
+    def reference(match):
+        names.append(match.group(1))
+        return ""
+
+    body = _EXPORT_DEFAULT_DECLARATION.sub(declaration, body, count=1)
+    if not names:
+        body = _EXPORT_DEFAULT_NAME.sub(reference, body, count=1)
+    if not names and _EXPORT_DEFAULT_EXPRESSION.search(body):
+        body = _EXPORT_DEFAULT_EXPRESSION.sub(f"const {anonymous} = ", body, count=1)
+        names.append(anonymous)
+    return body, names[0] if names else None
+
+
+def _rename(code: str, renames: dict) -> str:
+    """Rename identifiers in code, leaving strings, comments and JSX text alone"""
+    if not renames:
+        return code
+    pattern = re.compile(rf"(?<![\w$.])(?:{'|'.join(map(re.escape, renames))})(?![\w$])")
+    try:
+        regions = code_regions(code)
+    except (JSXSyntaxError, RecursionError):
+        regions = [(0, len(code))]
+    parts, last = [], 0
+    for start, end in regions:
+        parts.append(code[last:start])
+        parts.append(pattern.sub(lambda match: renames[match.group()], code[start:end]))
+        last = end
+    parts.append(code[last:])
+    return "".join(parts)
+
+
+def merge_sections(sections: list, page_name: str = PAGE_COMPONENT) -> str:
+    """Combine section components, top to bottom, into one page component.
+
+    `sections` is a list of (jsx_code, component_name). React imports are
+    dropped (normalization adds one back with the hooks in use), other
+    imports are de-duplicated, exports are removed and top-level names that
+    clash with an earlier section get the section number appended. Each
+    section renders the component its code exports; `component_name` is
+    only used when the code exports nothing.
+    """
+    imports, bodies, names, used = [], [], [], {page_name}
+    for number, (code, component_name) in enumerate(sections, 1):
+        for match in _IMPORT.finditer(code):
+            line = match.group(0).strip()
+            if match.group(1) != "react" and line not in imports:
+                imports.append(line)
+        body = _IMPORT.sub("", code)
+        body, name = _default_export(body, _unique("Section", number, used))
+        body = _EXPORT.sub("", body)
+        name = name or detect_component_name(body, default=component_name)
+
+        renames = {}
+        for declared in _TOP_LEVEL.findall(body):
+            if declared in used:
+                renames[declared] = _unique(declared, number, used)
+            used.add(renames.get(declared, declared))
+        bodies.append(_rename(body, renames).strip())
+        names.append(renames.get(name, name))
+
+    children = "\n".join(f"      <{name} />" for name in names)
+    page = (
+        f"const {page_name} = () => {{\n  return (\n    <main>\n{children}\n    </main>\n  );\n}};\n\n"
+        f"export default {page_name};"
+    )
+    return "\n\n".join(([("\n".join(imports))] if imports else []) + bodies + [page])
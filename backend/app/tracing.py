@@ -0,0 +1,371 @@
+import os
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+from app.metrics import generation_stage_latency, CountingExchange
+
+load_dotenv()
+
+# Request IDs, per-request spans and one structured log line per request
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json, or text for reading logs in a terminal
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+TRACE_LOG_REQUESTS = os.getenv("TRACE_LOG_REQUESTS", "true").lower() == "true"
+# Polled endpoints that would drown out everything else
+TRACE_LOG_SKIP_PATHS = {path for path in os.getenv("TRACE_LOG_SKIP_PATHS", "/health,/metrics").split(",") if path}
+# Requests at least this slow are sampled and kept with their spans
+TRACE_SLOW_REQUEST_MS = float(os.getenv("TRACE_SLOW_REQUEST_MS", "5000"))
+TRACE_SLOW_SAMPLE_RATE = float(os.getenv("TRACE_SLOW_SAMPLE_RATE", "1.0"))
+TRACE_SLOW_MAX_ENTRIES = int(os.getenv("TRACE_SLOW_MAX_ENTRIES", "100"))
+# Sampled slow requests are appended here as OTLP/JSON, one export request per
+# line (what the OpenTelemetry collector's otlpjsonfile receiver reads)
+TRACE_OTLP_PATH = os.getenv("TRACE_OTLP_PATH", "")
+# Batches run many generations in one request; spans beyond this are counted, not kept
+TRACE_MAX_SPANS = 256
+
+SERVICE_NAME = "instamock-api"
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Client-supplied IDs are echoed into logs and headers, so only safe ones are kept
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current = contextvars.ContextVar("instamock_trace", default=None)
+
+logger = logging.getLogger("instamock")
+request_logger = logging.getLogger("instamock.request")
+
+
+class RequestTrace:
+    """Spans and attributes collected while serving one request.
+
+    Generation threads append to the same trace (the context is copied into
+    the thread pools, see app/executor.py), so appends take a lock.
+    """
+
+    def __init__(self, request_id: str, method: str, path: str, traceparent: str = ""):
+        match = _TRACEPARENT.match(traceparent)
+        # Join the caller's trace when it sent a W3C traceparent header
+        self.trace_id = match.group(1) if match else uuid.uuid4().hex
+        self.parent_span_id = match.group(2) if match else ""
+        self.span_id = uuid.uuid4().hex[:16]
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.attrs = {}
+        self.spans = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, seconds: float, attrs: dict):
+        span = {"name": name, "start_ms": round((start - self.start) * 1000, 2), "duration_ms": round(seconds * 1000, 2)}
+        span.update(attrs)
+        with self._lock:
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped_spans += 1
+            else:
+                self.spans.append(span)
+
+    def annotate(self, **attrs):
+        with self._lock:
+            self.attrs.update(attrs)
+
+    def record(self, status: int, seconds: float, request_bytes: int, response_bytes: int, error: str = None) -> dict:
+        """The log entry for the finished request"""
+        with self._lock:
+            record = {
+                "request_id": self.request_id,
+                "trace_id": self.trace_id,
+                "method": self.method,
+                "path": self.path,
+                "status": status,
+                "duration_ms": round(seconds * 1000, 2),
+                "request_bytes": request_bytes,
+                "response_bytes": response_bytes,
+                "attrs": dict(self.attrs),
+                "spans": list(self.spans),
+            }
+            if self.dropped_spans:
+                record["dropped_spans"] = self.dropped_spans
+        if error:
+            record["error"] = error
+        return record
+
+
+def current_request_id():
+    trace = _current.get()
+    return trace.request_id if trace is not None else None
+
+
+def annotate(**attrs):
+    """Attach attributes (input sizes, model, ...) to the current request"""
+    trace = _current.get()
+    if trace is not None:
+        trace.annotate(**attrs)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block as a span of the current request; a no-op outside one.
+    Yields the span's attributes, so the block can add to them."""
+    trace = _current.get()
+    if trace is None:
+        yield attrs
+        return
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        trace.add_span(name, start, time.perf_counter() - start, attrs)
+
+
+@contextmanager
+def stage(kind: str, name: str):
+    """Time a generation stage into the stage histogram and the request's trace"""
+    with generation_stage_latency.time(kind=kind, stage=name), span(name, kind=kind):
+        yield
+
+
+def observe_stage(kind: str, name: str, seconds: float):
+    """Record a stage that was timed by hand, ending now"""
+    generation_stage_latency.observe(seconds, kind=kind, stage=name)
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(name, time.perf_counter() - seconds, seconds, {"kind": kind})
+
+
+def event(name: str, **attrs):
+    """A zero-length span, such as a retry or a model fallback"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(name, time.perf_counter(), 0.0, attrs)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with the request ID and any `fields` passed as extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = current_request_id()
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Send the app's logs to stderr, as JSON unless LOG_FORMAT=text"""
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    # Uvicorn's root handlers would print every line a second time
+    logger.propagate = False
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attrs: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attrs.items() if value is not None]
+
+
+def to_otlp(trace: RequestTrace, record: dict) -> dict:
+    """An OTLP/JSON ExportTraceServiceRequest: the request as a server span
+    with its spans as children"""
+    start_ns = int(trace.started_at * 1e9)
+    error = record["status"] >= 500 or "error" in record
+    root = {
+        "traceId": trace.trace_id,
+        "spanId": trace.span_id,
+        "parentSpanId": trace.parent_span_id,
+        "name": f"{record['method']} {record['path']}",
+        # SPAN_KIND_SERVER
+        "kind": 2,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(start_ns + int(record["duration_ms"] * 1e6)),
+        "attributes": _otlp_attributes({
+            "http.request.method": record["method"],
+            "url.path": record["path"],
+            "http.response.status_code": record["status"],
+            "http.request.body.size": record["request_bytes"],
+            "http.response.body.size": record["response_bytes"],
+            "instamock.request_id": record["request_id"],
+            **record["attrs"],
+        }),
+        # STATUS_CODE_ERROR or STATUS_CODE_UNSET
+        "status": {"code": 2 if error else 0},
+    }
+    spans = [root]
+    for child in record["spans"]:
+        attrs = {key: value for key, value in child.items() if key not in ("name", "start_ms", "duration_ms")}
+        child_start = start_ns + int(child["start_ms"] * 1e6)
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": uuid.uuid4().hex[:16],
+            "parentSpanId": trace.span_id,
+            "name": child["name"],
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(child_start),
+            "endTimeUnixNano": str(child_start + int(child["duration_ms"] * 1e6)),
+            "attributes": _otlp_attributes(attrs),
+            "status": {"code": 2 if "error" in attrs else 0},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+        "scopeSpans": [{"scope": {"name": "instamock"}, "spans": spans}],
+    }]}
+
+
+class SlowRequests:
+    """A sample of the slowest requests with their spans, kept in memory and
+    optionally appended to an OTLP/JSON file for a local collector"""
+
+    def __init__(self, threshold_ms: float = TRACE_SLOW_REQUEST_MS, sample_rate: float = TRACE_SLOW_SAMPLE_RATE,
+                 max_entries: int = TRACE_SLOW_MAX_ENTRIES, otlp_path: str = TRACE_OTLP_PATH):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.otlp_path = otlp_path
+        self.slow = 0
+        self.sampled = 0
+        self.exported = 0
+        self.export_errors = 0
+        self._records = deque(maxlen=max_entries)
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+
+    def offer(self, record: dict) -> bool:
+        """Keep `record` if it is slow and sampled; returns whether it was kept"""
+        if record["duration_ms"] < self.threshold_ms:
+            return False
+        with self._lock:
+            self.slow += 1
+            if self._random.random() >= self.sample_rate:
+                return False
+            self.sampled += 1
+            self._records.append(record)
+        return True
+
+    def export(self, trace: RequestTrace, record: dict):
+        """Append the request to the OTLP/JSON file (blocking)"""
+        line = json.dumps(to_otlp(trace, record), default=str) + "\n"
+        try:
+            with self._file_lock, open(self.otlp_path, "a", encoding="utf-8") as output:
+                output.write(line)
+        except OSError:
+            with self._lock:
+                self.export_errors += 1
+            logger.warning("Could not export slow request trace", exc_info=True)
+            return
+        with self._lock:
+            self.exported += 1
+
+    def recent(self, limit: int = 20) -> list:
+        """The most recently sampled slow requests, newest first"""
+        with self._lock:
+            return list(self._records)[::-1][:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": TRACING_ENABLED,
+                "threshold_ms": self.threshold_ms,
+                "sample_rate": self.sample_rate,
+                "slow": self.slow,
+                "sampled": self.sampled,
+                "kept": len(self._records),
+                "otlp_path": self.otlp_path or None,
+                "exported": self.exported,
+                "export_errors": self.export_errors,
+            }
+
+
+slow_requests = SlowRequests()
+
+
+class TracingMiddleware:
+    """ASGI middleware giving each request an ID and a trace.
+
+    The ID comes from the client's X-Request-ID header when it is a safe
+    token, otherwise it is generated; either way it is returned in the
+    response's X-Request-ID header and in every log line written while the
+    request is served. When the request ends, its spans are logged as one
+    JSON line and slow requests are sampled (see SlowRequests).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER, b"").decode("latin-1")
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        trace = RequestTrace(request_id, scope["method"], scope["path"], headers.get(b"traceparent", b"").decode("latin-1"))
+        error = None
+
+        async def tagging_send(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers") or []) + [(REQUEST_ID_HEADER, request_id.encode())]
+            await send(message)
+
+        exchange = CountingExchange(receive, tagging_send)
+        token = _current.set(trace)
+        try:
+            await self.app(scope, exchange.receive, exchange.send)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            record = trace.record(
+                exchange.status, time.perf_counter() - trace.start, exchange.request_bytes, exchange.response_bytes, error
+            )
+            if TRACE_LOG_REQUESTS and scope["path"] not in TRACE_LOG_SKIP_PATHS:
+                request_logger.info("request", extra={"fields": record})
+            if slow_requests.offer(record):
+                request_logger.warning("slow request", extra={"fields": record})
+                if slow_requests.otlp_path:
+                    await asyncio.to_thread(slow_requests.export, trace, record)
+            _current.reset(token)
@@ -0,0 +1,96 @@
+import io
+import os
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from dotenv import load_dotenv
+
+from app.image_preprocessing import IMAGE_MAX_PIXELS
+from app.tracing import span
+
+load_dotenv()
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of the formats the frontend accepts
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+]
+
+
+def sniff_image_format(head: bytes):
+    """Identify the real image format from its magic bytes, or None"""
+    for signature, image_format in _SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+def validate_image_header(image_bytes: bytes, expected_format: str) -> tuple:
+    """Check format and dimensions from the header alone.
+
+    Image.open() only parses the header; pixel data is not decoded until
+    load(), so oversized images are rejected before they cost any memory.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=413, detail=f"Image is too large. Maximum is {IMAGE_MAX_PIXELS} pixels.")
+    except Exception:
+        raise HTTPException(status_code=400, detail="File is not a valid image")
+
+    if image_format != expected_format:
+        raise HTTPException(status_code=400, detail="File contents do not match a supported image format")
+    if width * height > IMAGE_MAX_PIXELS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image is too large ({width}x{height}). Maximum is {IMAGE_MAX_PIXELS} pixels."
+        )
+    return width, height
+
+
+async def read_image_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an uploaded image in chunks, enforcing a byte budget.
+
+    Aborts with 413 as soon as the budget is exceeded and with 400 if the
+    first chunk is not a PNG, JPEG, GIF or WebP, whatever the client-declared
+    content type says.
+    """
+    with span("validate_input", kind="image") as attrs:
+        image_bytes, image_format = await _read_chunks(file, max_bytes)
+        attrs["input_bytes"] = len(image_bytes)
+        attrs["image_width"], attrs["image_height"] = validate_image_header(image_bytes, image_format)
+    return image_bytes
+
+
+async def _read_chunks(file: UploadFile, max_bytes: int) -> tuple:
+    """(bytes, sniffed format) of an upload, within the byte budget"""
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File is too large. Maximum size is {max_bytes} bytes.")
+
+    chunks = []
+    total = 0
+    image_format = None
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        if image_format is None:
+            image_format = sniff_image_format(chunk)
+            if image_format is None:
+                raise HTTPException(status_code=400, detail="File must be an image")
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(status_code=413, detail=f"File is too large. Maximum size is {max_bytes} bytes.")
+        chunks.append(chunk)
+
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    return b"".join(chunks), image_format
@@ -0,0 +1,72 @@
+"""Compare two benchmarks.suite reports.
+
+Prints each metric side by side with the relative change. Lower is better
+for times and latencies, higher for rps; changes beyond --threshold in the
+wrong direction are flagged and make the exit status 1.
+
+Usage (from backend/):
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# Metric -> True when higher is better
+LOAD_METRICS = {"rps": True, "p50_ms": False, "p90_ms": False, "p99_ms": False, "peak_rss_mb": False}
+
+
+def _load_key(profile: dict) -> str:
+    key = f"{profile['endpoint']}@c{profile['concurrency']}"
+    if "image_size" in profile:
+        key += f"/{profile['image_size']}"
+    return key
+
+
+def collect(report: dict) -> dict:
+    """Flatten a report into {metric name: (value, higher_is_better)}"""
+    metrics = {}
+    for name, result in report.get("micro", {}).items():
+        metrics[f"micro.{name}.us_best"] = (result["us_best"], False)
+    for profile in report.get("load", {}).get("profiles", []):
+        for metric, higher in LOAD_METRICS.items():
+            metrics[f"load.{_load_key(profile)}.{metric}"] = (profile[metric], higher)
+    return metrics
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    rows = []
+    old, new = collect(before), collect(after)
+    for name in sorted(old.keys() & new.keys()):
+        (a, higher), (b, _) = old[name], new[name]
+        change = (b - a) / a * 100 if a else 0.0
+        regressed = (change < -threshold) if higher else (change > threshold)
+        rows.append({"metric": name, "before": a, "after": b, "change_pct": round(change, 1), "regressed": regressed})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change treated as a regression")
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    rows = compare(before, after, args.threshold)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"{before.get('commit')} -> {after.get('commit')}")
+        for row in rows:
+            flag = "  REGRESSION" if row["regressed"] else ""
+            print(f"{row['metric']:<60} {row['before']:>12} {row['after']:>12} {row['change_pct']:>+8.1f}%{flag}")
+    sys.exit(1 if any(row["regressed"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Robustness check and scale benchmark for app/image_index.py.
+
+Hashes synthetic screenshots and re-captures of them (JPEG re-compression,
+rescaling, a changed label) and fails if a re-capture lands beyond the match
+threshold or two different screens land within it. Then fills an index with
+--entries random hashes and times add, nearest (hit and miss) and a
+snapshot save/load round trip.
+
+Usage (from backend/):
+    python -m benchmarks.image_index --entries 500000 > image_index.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from app.image_index import ImageIndex, image_hash, HASH_BITS, IMAGE_INDEX_MAX_DISTANCE
+
+SCOPE = "gemini-2.5-flash:image-v1"
+
+
+def make_screen(seed: int, width: int = 1280, height: int = 800) -> Image.Image:
+    """A random layout: navbar plus a few coloured blocks with labels"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), (249, 250, 251))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width, height // 12], fill=tuple(rng.randrange(256) for _ in range(3)))
+    for i in range(8):
+        x, y = rng.randrange(width - 320), rng.randrange(height // 10, height - 140)
+        draw.rectangle([x, y, x + rng.randrange(80, 300), y + rng.randrange(30, 120)],
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+        draw.text((x + 8, y + 8), f"Item {i}", fill=(17, 24, 39))
+    return image
+
+
+def encode(image: Image.Image, image_format: str = "PNG", **options) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def recaptures(image: Image.Image) -> dict:
+    """The same screen as a user might upload it again"""
+    edited = image.copy()
+    ImageDraw.Draw(edited).text((image.width // 2, image.height // 2), "edited", fill=(220, 38, 38))
+    return {
+        "jpeg_q70": encode(image, "JPEG", quality=70),
+        "scaled_75": encode(image.resize((image.width * 3 // 4, image.height * 3 // 4))),
+        "scaled_200": encode(image.resize((image.width * 2, image.height * 2))),
+        "edited_label": encode(edited),
+    }
+
+
+def check_robustness(screens: int) -> tuple:
+    """Distance stats per re-capture kind and between different screens, plus problems"""
+    images = [make_screen(seed) for seed in range(screens)]
+    hashes = [image_hash(encode(image))[0] for image in images]
+    near, problems = {}, []
+    for seed, (image, value) in enumerate(zip(images, hashes)):
+        for kind, data in recaptures(image).items():
+            distance = (image_hash(data)[0] ^ value).bit_count()
+            near.setdefault(kind, []).append(distance)
+            if distance > IMAGE_INDEX_MAX_DISTANCE:
+                problems.append(f"screen {seed} {kind}: distance {distance}")
+    far = [(a ^ b).bit_count() for i, a in enumerate(hashes) for b in hashes[i + 1:]]
+    if min(far) <= IMAGE_INDEX_MAX_DISTANCE:
+        problems.append(f"different screens within the threshold (distance {min(far)})")
+    stats = {kind: {"max": max(values), "mean": round(sum(values) / len(values), 2)} for kind, values in near.items()}
+    stats["different_screens"] = {"min": min(far), "mean": round(sum(far) / len(far), 2)}
+    return stats, problems
+
+
+def bench_index(entries: int, queries: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    index = ImageIndex(max_entries=entries, max_distance=IMAGE_INDEX_MAX_DISTANCE)
+    hashes = [rng.getrandbits(HASH_BITS) for _ in range(entries)]
+    keys = [rng.getrandbits(256).to_bytes(32, "big").hex() for _ in range(entries)]
+
+    start = time.perf_counter()
+    for value, key in zip(hashes, keys):
+        index.add(value, 1.6, SCOPE, key)
+    results = {"entries": entries, "add_us": round((time.perf_counter() - start) / entries * 1e6, 2)}
+
+    # Hits: stored hashes with a few bits flipped; misses: fresh random hashes
+    targets = rng.sample(range(entries), queries)
+    near = [hashes[i] ^ sum(1 << bit for bit in rng.sample(range(HASH_BITS), 4)) for i in targets]
+    start = time.perf_counter()
+    found = sum(index.nearest(value, 1.6, SCOPE) is not None for value in near)
+    results["nearest_hit_us"] = round((time.perf_counter() - start) / queries * 1e6, 2)
+    results["hit_rate"] = round(found / queries, 4)
+    far = [rng.getrandbits(HASH_BITS) for _ in range(queries)]
+    start = time.perf_counter()
+    found = sum(index.nearest(value, 1.6, SCOPE) is not None for value in far)
+    results["nearest_miss_us"] = round((time.perf_counter() - start) / queries * 1e6, 2)
+    results["false_hit_rate"] = round(found / queries, 4)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "image_index.bin")
+        start = time.perf_counter()
+        index.save(path)
+        results["save_seconds"] = round(time.perf_counter() - start, 3)
+        results["snapshot_bytes"] = os.path.getsize(path)
+        restored = ImageIndex(max_entries=entries)
+        start = time.perf_counter()
+        restored.load(path)
+        results["load_seconds"] = round(time.perf_counter() - start, 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--screens", type=int, default=20)
+    args = parser.parse_args()
+
+    distances, problems = check_robustness(args.screens)
+    report = {"distances": distances, "index": bench_index(args.entries, args.queries)}
+    print(json.dumps(report, indent=2))
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
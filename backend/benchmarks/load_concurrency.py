@@ -0,0 +1,72 @@
+"""Concurrency load test for /api/generate/text against the mock provider.
+
+Fires the same batch of requests twice: once one at a time and once all at
+once. The mock model sleeps to simulate Gemini latency, so with the
+generation pool the concurrent run should take roughly one model call
+instead of N.
+
+Requires httpx (`pip install "httpx<0.28"`). Usage (from backend/):
+    python -m benchmarks.load_concurrency --requests 32 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app import admission, gemini_client
+from app.main import app
+from app.model_resolver import resolver
+from app.providers.mock import MockProvider
+
+
+def install_mock(latency: float):
+    """Route generations to a fixed-latency mock provider.
+
+    Every request comes from one client, so the per-client rate limit is
+    lifted; the global admission cap still applies.
+    """
+    admission.rate_limiter = admission.TokenBucket(rate_per_minute=0)
+    mock = MockProvider(latency_ms=latency * 1000, distribution="fixed")
+    gemini_client.provider = mock
+    resolver.client = mock
+    resolver.invalidate()
+    return mock
+
+
+async def _fire(client, count: int, concurrent: bool) -> float:
+    payload = {"text_description": "A login page with email and password", "no_cache": True}
+    start = time.perf_counter()
+    if concurrent:
+        responses = await asyncio.gather(*[client.post("/api/generate/text", json=payload) for _ in range(count)])
+    else:
+        responses = [await client.post("/api/generate/text", json=payload) for _ in range(count)]
+    elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses]
+    return elapsed
+
+
+async def run(count: int, latency: float) -> dict:
+    install_mock(latency)
+    async with httpx.AsyncClient(app=app, base_url="http://test", timeout=None) as client:
+        serial = await _fire(client, count, concurrent=False)
+        concurrent = await _fire(client, count, concurrent=True)
+    return {
+        "requests": count,
+        "model_latency_s": latency,
+        "serial_s": round(serial, 3),
+        "concurrent_s": round(concurrent, 3),
+        "speedup": round(serial / concurrent, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    print(asyncio.run(run(args.requests, args.latency)))
+
+
+if __name__ == "__main__":
+    main()
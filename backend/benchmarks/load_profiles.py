@@ -0,0 +1,123 @@
+"""End-to-end load profiles for /api/generate/text and /api/generate/image.
+
+For each concurrency level, keeps that many requests in flight until
+`--requests` have completed and reports throughput, latency percentiles,
+errors and peak RSS. Image profiles repeat this per screenshot size.
+
+By default the app runs in-process against a fixed-latency mock provider,
+so the numbers measure our own overhead (routing, uploads, preprocessing,
+parsing, the generation pool). Pass --base-url to load a running server
+instead; start it with MODEL_PROVIDER=mock to keep the model out of it.
+
+Requires httpx (`pip install "httpx<0.28"`). Usage (from backend/):
+    python -m benchmarks.load_profiles --concurrency 1 8 32 --requests 64 > load.json
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+
+import httpx
+
+from benchmarks.micro import make_screenshot, IMAGE_SIZES
+
+TEXT_PAYLOAD = {"text_description": "A login page with email and password", "no_cache": True}
+# Generate every time; a cached response would only measure the cache
+NO_CACHE = {"Cache-Control": "no-cache"}
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def run_profile(send, total: int, concurrency: int) -> dict:
+    """Run `total` requests with at most `concurrency` in flight"""
+    latencies = []
+    statuses = {}
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                status = (await send()).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": total - statuses.get("200", 0),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run(concurrency_levels: list, total: int, latency: float, base_url: str = None, image_sizes=None) -> dict:
+    if base_url:
+        client = httpx.AsyncClient(base_url=base_url, timeout=None)
+    else:
+        from app.main import app
+        from benchmarks.load_concurrency import install_mock
+        install_mock(latency)
+        client = httpx.AsyncClient(app=app, base_url="http://test", timeout=None)
+
+    profiles = []
+    async with client:
+        for concurrency in concurrency_levels:
+            result = await run_profile(
+                lambda: client.post("/api/generate/text", json=TEXT_PAYLOAD, headers=NO_CACHE), total, concurrency
+            )
+            profiles.append(dict(result, endpoint="text"))
+
+        for width, height in image_sizes or IMAGE_SIZES:
+            image_bytes = make_screenshot(width, height)
+            files = {"file": ("screenshot.png", image_bytes, "image/png")}
+            for concurrency in concurrency_levels:
+                result = await run_profile(
+                    lambda: client.post("/api/generate/image", files=files, headers=NO_CACHE), total, concurrency
+                )
+                profiles.append(dict(result, endpoint="image", image_size=f"{width}x{height}", image_bytes=len(image_bytes)))
+
+    return {
+        "target": base_url or "in-process",
+        "model_latency_s": None if base_url else latency,
+        "profiles": profiles,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per profile")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock model latency in seconds")
+    parser.add_argument("--base-url", help="load a running server instead of the in-process app")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.concurrency, args.requests, args.latency, args.base_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Micro-benchmarks for the CPU-bound steps of a generation.
+
+Times prompt construction and token budgeting, cache-key hashing,
+perceptual image hashing, response parsing (over the parser corpus),
+stream filtering, JSX validation and image preprocessing at several sizes.
+Each step runs `--repeats` rounds of `--iterations` calls; the report keeps
+the best and median round so noisy neighbours skew it less.
+
+Usage (from backend/):
+    python -m benchmarks.micro --iterations 500 > micro.json
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+from app.prompts import TEMPLATES, fit_text_description
+from app.image_preprocessing import preprocess_image
+from app.image_index import image_hash
+from app.response_cache import make_key
+from app.streaming import JSXTagFilter
+from app.jsx_validation import check_syntax, normalize_jsx
+from benchmarks.parse_responses import load_corpus, PARSERS
+
+SHORT_DESCRIPTION = "A login page with email and password fields"
+LONG_DESCRIPTION = " ".join([
+    "A SaaS dashboard with a collapsible sidebar, a top navbar with search and avatar,",
+    "four KPI cards, a line chart of monthly revenue, a sortable table of recent orders",
+    "with status badges and pagination, and a footer with links.",
+] * 20)
+IMAGE_SIZES = [(640, 480), (1920, 1080), (3840, 2160)]
+
+
+def time_call(func, iterations: int, repeats: int) -> dict:
+    """Microseconds per call: best and median of `repeats` rounds"""
+    rounds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        rounds.append((time.perf_counter() - start) / iterations * 1e6)
+    return {"us_best": round(min(rounds), 2), "us_median": round(statistics.median(rounds), 2)}
+
+
+def make_screenshot(width: int, height: int, image_format: str = "PNG") -> bytes:
+    """A synthetic UI screenshot: navbar, sidebar and a grid of cards"""
+    image = Image.new("RGB", (width, height), (249, 250, 251))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width, height // 12], fill=(31, 41, 55))
+    draw.rectangle([0, height // 12, width // 6, height], fill=(243, 244, 246))
+    card_w, card_h = width // 5, height // 5
+    for row in range(3):
+        for col in range(3):
+            x = width // 6 + 20 + col * (card_w + 20)
+            y = height // 12 + 20 + row * (card_h + 20)
+            draw.rectangle([x, y, x + card_w, y + card_h], fill=(255, 255, 255), outline=(209, 213, 219))
+            draw.text((x + 10, y + 10), f"Card {row * 3 + col}", fill=(17, 24, 39))
+    output = io.BytesIO()
+    image.save(output, format=image_format)
+    return output.getvalue()
+
+
+def _stream_filter(text: str):
+    jsx_filter = JSXTagFilter()
+    for i in range(0, len(text), 32):
+        jsx_filter.feed(text[i:i + 32])
+    jsx_filter.flush()
+
+
+def run(iterations: int = 500, repeats: int = 5) -> dict:
+    results = {}
+    template = TEMPLATES["text-v1"]
+    results["prompt.text_short"] = time_call(lambda: template.render(SHORT_DESCRIPTION), iterations, repeats)
+    results["prompt.text_long"] = time_call(lambda: template.render(LONG_DESCRIPTION), iterations, repeats)
+    results["prompt.fit_text_long"] = time_call(lambda: fit_text_description(LONG_DESCRIPTION), iterations, repeats)
+    results["cache_key.text"] = time_call(
+        lambda: make_key("text", SHORT_DESCRIPTION, "gemini-2.5-flash", template.name), iterations, repeats
+    )
+
+    corpus = load_corpus()
+    for case in corpus:
+        parse, response = PARSERS[case["kind"]], case["response"]
+        results[f"parse.{case['name']}"] = time_call(lambda: parse(response), iterations, repeats)
+
+    longest = max((case["response"] for case in corpus if case["kind"] == "text"), key=len)
+    results["stream_filter.text"] = time_call(lambda: _stream_filter(longest), iterations, repeats)
+    code = PARSERS["text"](longest)["jsx_code"]
+    results["validate.normalize_long"] = time_call(lambda: normalize_jsx(code, "Component"), iterations, repeats)
+    results["validate.syntax_long"] = time_call(lambda: check_syntax(code), iterations, repeats)
+
+    # Image steps are milliseconds each, so run far fewer iterations
+    image_iterations = max(iterations // 100, 1)
+    for width, height in IMAGE_SIZES:
+        image_bytes = make_screenshot(width, height)
+        label = f"{width}x{height}"
+        results[f"cache_key.image_{label}"] = time_call(
+            lambda: make_key("image", image_bytes, "gemini-2.5-flash", "image-v1"), image_iterations, repeats
+        )
+        results[f"image_hash.image_{label}"] = time_call(lambda: image_hash(image_bytes), image_iterations, repeats)
+        results[f"preprocess.image_{label}"] = dict(
+            time_call(lambda: preprocess_image(image_bytes), image_iterations, repeats),
+            bytes_in=len(image_bytes),
+            bytes_out=len(preprocess_image(image_bytes)[0]["data"]),
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations, args.repeats), indent=2))
+
+
+if __name__ == "__main__":
+    main()
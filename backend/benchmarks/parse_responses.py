@@ -0,0 +1,102 @@
+"""Regression check, fuzz run and micro-benchmark for app/response_parser.py.
+
+Every case in corpus/parser_corpus.json is parsed and checked against its
+expected component name, then timed. --fuzz N also parses N random
+truncations/mutations of the corpus and fails if the parser ever raises.
+
+Usage (from backend/):
+    python -m benchmarks.parse_responses --iterations 2000 --fuzz 5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from app.response_parser import parse_text_response, parse_image_response
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "parser_corpus.json")
+PARSERS = {"text": parse_text_response, "image": parse_image_response}
+
+
+def load_corpus() -> list:
+    with open(CORPUS_PATH) as f:
+        return json.load(f)
+
+
+def check(case: dict) -> list:
+    """Return a list of mismatches between the parse result and expectations"""
+    result = PARSERS[case["kind"]](case["response"])
+    problems = []
+    if result["success"] != case["success"]:
+        problems.append(f"success={result['success']}")
+    if case["success"]:
+        if result["component_name"] != case["component_name"]:
+            problems.append(f"component_name={result['component_name']!r}")
+        if case["jsx_contains"] not in result["jsx_code"]:
+            problems.append("jsx_code missing expected content")
+        if "```" in result["jsx_code"] or result["jsx_code"].lstrip().startswith("{"):
+            problems.append("jsx_code still wrapped")
+    return problems
+
+
+def bench(case: dict, iterations: int) -> float:
+    parse = PARSERS[case["kind"]]
+    response = case["response"]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(response)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def _mutate(text: str, rng: random.Random) -> str:
+    choice = rng.randrange(4)
+    if choice == 0:
+        return text[:rng.randrange(len(text) + 1)]
+    if choice == 1:
+        i = rng.randrange(len(text) + 1)
+        return text[:i] + rng.choice(['{', '}', '"', '\\', '```', '<jsx>', '</jsx>', '\n']) + text[i:]
+    if choice == 2:
+        i = rng.randrange(len(text) + 1)
+        return text[:i] + text[i + rng.randrange(1, 64):]
+    return "".join(rng.choice('{}":\\,<>/jsx` \n') for _ in range(rng.randrange(1, 200)))
+
+
+def fuzz(corpus: list, runs: int, seed: int) -> int:
+    rng = random.Random(seed)
+    for _ in range(runs):
+        case = rng.choice(corpus)
+        text = _mutate(case["response"], rng)
+        result = PARSERS[case["kind"]](text)
+        assert {"jsx_code", "component_name", "success"} <= result.keys()
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--fuzz", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    report = {"cases": [], "failures": 0}
+    for case in corpus:
+        problems = check(case)
+        report["failures"] += bool(problems)
+        report["cases"].append({
+            "name": case["name"],
+            "bytes": len(case["response"]),
+            "us_per_parse": round(bench(case, args.iterations), 2),
+            "problems": problems,
+        })
+    if args.fuzz:
+        report["fuzz_runs"] = fuzz(corpus, args.fuzz, args.seed)
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Run the micro-benchmarks and load profiles and write one JSON report.
+
+The report records the git commit, Python version and settings next to the
+results so runs can be compared across commits:
+
+    python -m benchmarks.suite --output before.json
+    git checkout my-branch
+    python -m benchmarks.suite --output after.json
+    python -m benchmarks.compare before.json after.json
+
+Usage (from backend/):
+    python -m benchmarks.suite [--quick] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import time
+
+from benchmarks import load_profiles, micro
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and requests, for a smoke run")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock model latency in seconds")
+    args = parser.parse_args()
+
+    iterations, requests, concurrency = (50, 16, [1, 8]) if args.quick else (500, 64, [1, 8, 32])
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": {"iterations": iterations, "requests": requests, "concurrency": concurrency, "latency_s": args.latency},
+        "micro": micro.run(iterations),
+        "load": asyncio.run(load_profiles.run(concurrency, requests, args.latency)),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
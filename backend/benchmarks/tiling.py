@@ -0,0 +1,100 @@
+"""Single-call vs tiled generation on long full-page screenshots.
+
+Builds synthetic pages several screens tall (coloured sections separated by
+whitespace bands) and generates each one both ways against the mock
+provider. The mock's latency grows with its output, which grows with the
+height of the image it is sent, so one call over the whole page pays for
+every section while tiled calls run side by side.
+
+Usage (from backend/):
+    python -m benchmarks.tiling --screens 3 6 10 --latency 0.4 --ms-per-token 4
+"""
+import argparse
+import io
+import json
+import random
+import time
+
+from PIL import Image, ImageDraw
+
+from app import gemini_client
+from app.model_resolver import resolver
+from app.prompts import TEMPLATES
+from app.providers.mock import MockProvider
+from app.tiling import whitespace_bands, section_bounds, split_screenshot
+
+
+def make_page(screens: int, width: int = 1280, seed: int = 0) -> bytes:
+    """A long landing page: full-width sections with text, separated by gaps"""
+    rng = random.Random(seed)
+    height = width * screens
+    image = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    y = 0
+    while y < height - width // 4:
+        section = rng.randrange(width // 4, width)
+        draw.rectangle([0, y, width, min(y + section, height)], fill=tuple(rng.randrange(200, 256) for _ in range(3)))
+        for line in range(rng.randrange(3, 10)):
+            draw.text((64, y + 32 + line * 24), f"Section copy line {line}", fill=(17, 24, 39))
+        y += section + rng.randrange(width // 50, width // 15)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def install_mock(latency: float, ms_per_token: float):
+    """Route generations to a fixed-latency mock whose calls slow down with output length"""
+    mock = MockProvider(latency_ms=latency * 1000, distribution="fixed", ms_per_output_token=ms_per_token)
+    gemini_client.provider = mock
+    resolver.client = mock
+    resolver.invalidate()
+    return mock
+
+
+def bench_page(screens: int) -> dict:
+    image_bytes = make_page(screens)
+    template = TEMPLATES["image-v1"]
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+
+    start = time.perf_counter()
+    bounds = section_bounds(image.width, image.height, whitespace_bands(image))
+    split_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    single = gemini_client._generate_jsx_from_image(image_bytes, template)
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tiled = gemini_client._generate_tiled(image_bytes, template)
+    tiled_s = time.perf_counter() - start
+    assert single["success"] and tiled["success"], (single.get("message"), tiled.get("message"))
+
+    return {
+        "screens": screens,
+        "size": list(image.size),
+        "sections": len(bounds),
+        "band_detection_ms": round(split_ms, 1),
+        "single_s": round(single_s, 3),
+        "tiled_s": round(tiled_s, 3),
+        "speedup": round(single_s / tiled_s, 2),
+        "tiled_parses": tiled.get("parses"),
+        "single_output_chars": len(single["jsx_code"]),
+        "tiled_output_chars": len(tiled["jsx_code"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--screens", type=int, nargs="+", default=[3, 6, 10])
+    parser.add_argument("--latency", type=float, default=0.4, help="mock latency per call before output, seconds")
+    parser.add_argument("--ms-per-token", type=float, default=4.0, help="mock decoding time per output token")
+    args = parser.parse_args()
+
+    install_mock(args.latency, args.ms_per_token)
+    # Warm the section pool and resolver outside the timings
+    split_screenshot(make_page(2))
+    print(json.dumps([bench_page(screens) for screens in args.screens], indent=2))
+
+
+if __name__ == "__main__":
+    main()
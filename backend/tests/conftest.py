@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Tests never reach the network: load the offline provider and keep
+# background work (history writer, jobs, image index) out of the way
+os.environ.setdefault("MODEL_PROVIDER", "mock")
+os.environ.setdefault("HISTORY_ENABLED", "false")
+os.environ.setdefault("JOBS_ENABLED", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
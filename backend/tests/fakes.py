@@ -0,0 +1,53 @@
+"""Offline stand-ins for the google.generativeai module and the clock."""
+
+
+class FakeModelInfo:
+    def __init__(self, name: str, methods=("generateContent",)):
+        self.name = f"models/{name}"
+        self.supported_generation_methods = list(methods)
+
+
+class FakeModel:
+    def __init__(self, model_name: str, system_instruction: str = None, cached_prefix: str = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.cached_prefix = cached_prefix
+
+
+class FakeGenAI:
+    """Just enough of `genai` (and the provider interface) for model
+    discovery and context caching, counting every call"""
+
+    def __init__(self, models=("gemini-2.5-flash",)):
+        self.models = list(models)
+        self.list_models_calls = 0
+        self.model_calls = 0
+        self.cache_registrations = 0
+        self.fail_registrations = False
+
+    def list_models(self):
+        self.list_models_calls += 1
+        return [FakeModelInfo(name) for name in self.models]
+
+    def GenerativeModel(self, model_name: str, system_instruction: str = None, **kwargs):
+        self.model_calls += 1
+        return FakeModel(model_name, system_instruction=system_instruction)
+
+    def cached_model(self, model_name: str, system_instruction: str, ttl_seconds: float):
+        if self.fail_registrations:
+            raise RuntimeError("cached content rejected")
+        self.cache_registrations += 1
+        return FakeModel(model_name, cached_prefix=system_instruction)
+
+
+class FakeClock:
+    """Replaces a module's `time` so TTLs can be stepped through instantly"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
@@ -0,0 +1,42 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import gemini_client
+from app.history import make_record
+from app.prompts import prompt_stats
+
+
+def test_coalesced_requests_get_copies_and_cost_nothing():
+    started, release = threading.Event(), threading.Event()
+    usage = {"prompt_tokens": 200, "output_tokens": 600}
+
+    def generate(payload):
+        started.set()
+        release.wait(5)
+        return {"jsx_code": "const A = () => null;", "component_name": "A", "success": True, "usage": usage}
+
+    def request(trace):
+        return gemini_client._with_cache("text", "coalesced hero", "coalesce-v1", True, generate, trace)
+
+    traces = [{} for _ in range(3)]
+    coalesced = gemini_client.single_flight.stats()["coalesced"]
+    with ThreadPoolExecutor(3) as pool:
+        leader = pool.submit(request, traces[0])
+        started.wait(5)
+        followers = [pool.submit(request, trace) for trace in traces[1:]]
+        while gemini_client.single_flight.stats()["coalesced"] < coalesced + 2:
+            time.sleep(0.01)
+        release.set()
+        results = [leader.result()] + [future.result() for future in followers]
+
+    assert [bool(trace.get("coalesced")) for trace in traces] == [False, True, True]
+    assert len({id(result) for result in results}) == 3
+
+    for result, trace in zip(results, traces):
+        gemini_client._record_generation("text", "coalesced hero", "coalesce-v1", None, result, trace, 0.1)
+    assert prompt_stats._stats["coalesce-v1"]["calls"] == 1
+    assert prompt_stats._stats["coalesce-v1"]["output_tokens"] == 600
+
+    record = make_record("text", "coalesced hero", "coalesce-v1", None, results[1], traces[1], 0.1)
+    assert (record["prompt_tokens"], record["output_tokens"]) == (0, 0)
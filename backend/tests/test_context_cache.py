@@ -0,0 +1,119 @@
+import pytest
+
+from app import context_cache as context_cache_module
+from app.context_cache import ContextCacheManager, CONTEXT_CACHE_RETRY_SECONDS
+from app.prompts import PromptTemplate, TEMPLATES
+from fakes import FakeGenAI, FakeClock
+
+MODEL = "gemini-2.5-flash"
+TEMPLATE = PromptTemplate("test-v1", "text", "Static rules. " * 400, "\nOutput only JSX.")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(context_cache_module, "time", clock)
+    return clock
+
+
+def manager(genai, ttl=3600):
+    return ContextCacheManager(client=genai, mode="cached_content", ttl=ttl, min_tokens=1024)
+
+
+def test_first_call_registers_the_prefix(clock):
+    genai = FakeGenAI()
+    cache = manager(genai)
+
+    model, contents, cached = cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("a pricing page"))
+    assert cached
+    assert model.cached_prefix == TEMPLATE.prefix
+    assert contents == "a pricing page" + TEMPLATE.suffix
+    assert (cache.registrations, genai.cache_registrations) == (1, 1)
+
+
+def test_later_calls_reuse_the_entry(clock):
+    genai = FakeGenAI()
+    cache = manager(genai)
+    first, _, _ = cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("one"))
+
+    clock.advance(60)
+    model, contents, cached = cache.prepare(MODEL, TEMPLATE, [TEMPLATE.render("two"), b"image"])
+    assert cached and model is first
+    assert contents == ["two" + TEMPLATE.suffix, b"image"]
+    assert cache.hits == 2
+    assert genai.cache_registrations == 1
+
+
+def test_small_or_unmatched_prefix_goes_inline(clock):
+    genai = FakeGenAI()
+    cache = manager(genai)
+    small = PromptTemplate("small-v1", "text", "Short rules. ")
+
+    _, contents, cached = cache.prepare(MODEL, small, small.render("x"))
+    assert not cached and contents == small.render("x")
+    _, contents, cached = cache.prepare(MODEL, TEMPLATE, "unrelated prompt")
+    assert not cached and contents == "unrelated prompt"
+    assert genai.cache_registrations == 0
+
+
+def test_entry_is_re_registered_before_expiry(clock):
+    genai = FakeGenAI()
+    cache = manager(genai, ttl=100)
+    first, _, _ = cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("one"))
+
+    # Refreshed inside the last tenth of the TTL, before the provider drops it
+    clock.advance(89)
+    assert cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("two"))[0] is first
+    clock.advance(2)
+    model, _, cached = cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("three"))
+    assert cached and model is not first
+    assert genai.cache_registrations == 2
+
+
+def test_changed_template_text_is_re_registered(clock):
+    genai = FakeGenAI()
+    cache = manager(genai)
+    cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("one"))
+
+    edited = PromptTemplate(TEMPLATE.name, "text", "Edited rules. " * 400)
+    model, _, cached = cache.prepare(MODEL, edited, edited.render("two"))
+    assert cached and model.cached_prefix == edited.prefix
+    assert genai.cache_registrations == 2
+
+
+def test_failed_registration_goes_inline_until_retry(clock):
+    genai = FakeGenAI()
+    genai.fail_registrations = True
+    cache = manager(genai)
+
+    _, contents, cached = cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("one"))
+    assert not cached and contents == TEMPLATE.render("one")
+    assert cache.failures == 1
+
+    genai.fail_registrations = False
+    assert not cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("two"))[2]
+    clock.advance(CONTEXT_CACHE_RETRY_SECONDS + 1)
+    assert cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("three"))[2]
+    assert genai.cache_registrations == 1
+
+
+def test_invalidate_drops_the_entry(clock):
+    genai = FakeGenAI()
+    cache = manager(genai)
+    cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("one"))
+
+    cache.invalidate(MODEL, TEMPLATE)
+    assert not cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("two"))[2]
+    clock.advance(CONTEXT_CACHE_RETRY_SECONDS + 1)
+    assert cache.prepare(MODEL, TEMPLATE, TEMPLATE.render("three"))[2]
+    assert genai.cache_registrations == 2
+
+
+def test_default_mode_serves_the_shipped_templates(clock):
+    genai = FakeGenAI()
+    cache = ContextCacheManager(client=genai, mode=context_cache_module.CONTEXT_CACHE_MODE)
+    template = TEMPLATES["text-v1"]
+
+    model, contents, cached = cache.prepare(MODEL, template, template.render("a pricing page"))
+    assert cached and model.system_instruction == template.prefix
+    assert contents == "a pricing page" + template.suffix
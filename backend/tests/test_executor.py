@@ -0,0 +1,25 @@
+import asyncio
+import threading
+
+import pytest
+
+from app import executor as executor_module
+from app.executor import run_generation, GenerationTimeoutError
+
+
+def test_a_timed_out_generation_keeps_its_slot_until_it_finishes(monkeypatch):
+    release = threading.Event()
+
+    async def run():
+        monkeypatch.setattr(executor_module, "_semaphore", asyncio.Semaphore(1))
+        with pytest.raises(GenerationTimeoutError):
+            await run_generation(release.wait, timeout=0.05)
+        # The abandoned call is still running, so the next one waits for its slot
+        assert executor_module._semaphore.locked()
+        waiting = asyncio.ensure_future(run_generation(lambda: "done", timeout=5))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        release.set()
+        return await waiting
+
+    assert asyncio.run(run()) == "done"
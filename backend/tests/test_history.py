@@ -0,0 +1,51 @@
+import pytest
+
+from app.admission import hash_key
+from app.history import SQLiteHistoryStore, make_record, warm_cache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "history.sqlite")
+
+
+def record(user="key:" + hash_key("secret"), created_at=1000.0, **result):
+    result = {"success": True, "jsx_code": "const A = () => null;", "component_name": "A", **result}
+    entry = make_record("text", "a hero section", "text-v1", user, result, {"model": "gemini-2.5-flash"}, 1.0)
+    entry["created_at"] = created_at
+    return entry
+
+
+class FakeCache:
+    def __init__(self):
+        self.entries = {}
+
+    def preload(self, key, value, age):
+        self.entries[key] = value
+
+
+def test_pages_do_not_skip_records_sharing_a_timestamp(path):
+    store = SQLiteHistoryStore(path)
+    store.write_many([record(created_at=1000.0) for _ in range(5)] + [record(created_at=999.0)])
+
+    seen, before, before_id = [], None, None
+    while True:
+        page = store.query(user=record()["user"], before=before, before_id=before_id, limit=2)
+        seen.extend(entry["id"] for entry in page)
+        if len(page) < 2:
+            break
+        before, before_id = page[-1]["created_at"], page[-1]["id"]
+    assert len(seen) == len(set(seen)) == 6
+
+
+def test_syntax_check_survives_a_warm_start(path):
+    store = SQLiteHistoryStore(path)
+    entry = record(parses=False, syntax_error="Unclosed '{' (code ends early)")
+    store.write_many([entry])
+
+    assert store.get(entry["id"])["parses"] is False
+    cache = FakeCache()
+    warm_cache(store, cache, ttl=float("inf"), limit=10)
+    assert cache.entries[entry["input_hash"]]["parses"] is False
+    assert cache.entries[entry["input_hash"]]["syntax_error"] == "Unclosed '{' (code ends early)"
+
@@ -0,0 +1,86 @@
+import io
+import time
+import random
+
+from PIL import Image, ImageDraw
+
+from app.image_index import ImageIndex, image_hash
+
+KEY = "ab" * 32
+
+
+def random_hash(seed: int) -> int:
+    return random.Random(seed).getrandbits(256)
+
+
+def screenshot(shift=0, size=(640, 400)) -> bytes:
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for row in range(6):
+        draw.rectangle([40 + shift, 30 + row * 60, 400 + row * 30, 60 + row * 60], fill=(30 * row, 60, 120))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def wait_for_compaction(index):
+    deadline = time.monotonic() + 5
+    while index._compacting and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_nearest_matches_a_near_duplicate_in_the_same_scope():
+    index = ImageIndex(max_entries=100, max_distance=10)
+    value, aspect = image_hash(screenshot())
+    index.add(value, aspect, "model:image-v1", KEY)
+
+    near, near_aspect = image_hash(screenshot(shift=2))
+    key, distance = index.nearest(near, near_aspect, "model:image-v1")
+    assert key == KEY and distance <= 10
+    assert index.nearest(near, near_aspect, "model:image-v2") is None
+    assert index.nearest(value, aspect * 1.5, "model:image-v1") is None
+    assert index.nearest(value ^ ((1 << 40) - 1), aspect, "model:image-v1") is None
+
+
+def test_compaction_evicts_the_oldest_entries_and_their_scopes():
+    index = ImageIndex(max_entries=20)
+    for i in range(25):
+        index.add(random_hash(i), 1.6, f"scope-{i}", f"{i:064x}")
+    wait_for_compaction(index)
+
+    assert len(index) <= 20 and index._rebuilds >= 1
+    assert "scope-0" not in index._scopes and len(index._scopes) < 25
+    assert index.nearest(random_hash(0), 1.6, "scope-0") is None
+    assert index.nearest(random_hash(24), 1.6, "scope-24") == (f"{24:064x}", 0)
+
+
+def test_scope_ids_go_past_16_bits():
+    index = ImageIndex(max_entries=100)
+    index._scopes = {f"old-{i}": i for i in range(70000)}
+    index.add(1, 1.0, "new", KEY)
+    assert index.nearest(1, 1.0, "new") == (KEY, 0)
+
+
+def test_a_rejected_entry_leaves_the_index_unchanged():
+    index = ImageIndex(max_entries=100)
+    index.add(1, 1.0, "scope", KEY)
+    try:
+        index.add(2, "wide", "scope", KEY)
+    except TypeError:
+        pass
+    assert len(index._hashes) == len(index._aspects) == len(index._scope_ids) == len(index._keys) // 32 == 1
+
+
+def test_snapshots_round_trip(tmp_path):
+    path = str(tmp_path / "image_index.bin")
+    index = ImageIndex(max_entries=100)
+    for i in range(5):
+        index.add(random_hash(i), 1.25, f"scope-{i % 2}", f"{i:064x}")
+    index.save(path)
+
+    restored = ImageIndex(max_entries=3)
+    assert restored.load(path) == 3
+    assert len(restored) == 3
+    assert restored.nearest(random_hash(4), 1.25, "scope-0") == (f"{4:064x}", 0)
+    assert restored.nearest(random_hash(3), 1.25, "scope-1") == (f"{3:064x}", 0)
+    assert restored.nearest(random_hash(0), 1.25, "scope-0") is None
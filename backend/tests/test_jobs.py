@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app import jobs as jobs_module
+from app.admission import AdmissionRejectedError
+from app.jobs import JobStore, JobManager, JobQueueFullError, QUEUED, RUNNING, SUCCEEDED
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite"))
+
+
+def test_concurrent_submits_never_overfill_the_queue(store):
+    async def run():
+        manager = JobManager(store, workers=0, queue_size=2)
+        manager._queue = asyncio.Queue(maxsize=2)
+        results = await asyncio.gather(
+            *(manager.submit("text", b"hero", True, "ip:1") for _ in range(5)), return_exceptions=True
+        )
+        return manager, results
+
+    manager, results = asyncio.run(run())
+    accepted = [result for result in results if isinstance(result, dict)]
+    assert len(accepted) == 2
+    assert all(isinstance(result, JobQueueFullError) for result in results if not isinstance(result, dict))
+    assert manager._queue.qsize() == 2
+    assert sorted(store.unfinished()) == sorted(job["id"] for job in accepted)
+
+
+def test_a_job_is_claimed_once(store):
+    job, _ = store.create("text", b"hero", True, "ip:1")
+
+    assert store.claim(job["id"], "worker-a")
+    assert not store.claim(job["id"], "worker-b")
+    assert store.get(job["id"])["status"] == RUNNING
+    # Running under a live lease: not resumed by another process starting up
+    assert store.unfinished() == []
+
+
+def test_an_expired_lease_can_be_taken_over(store):
+    job, _ = store.create("text", b"hero", True, "ip:1")
+    store.claim(job["id"], "worker-a", lease_seconds=-1)
+
+    assert store.unfinished() == [job["id"]]
+    assert store.claim(job["id"], "worker-b")
+
+
+def test_finished_jobs_keep_the_syntax_check(store):
+    job, _ = store.create("text", b"hero", True, "ip:1")
+    store.update(job["id"], SUCCEEDED, jsx_code="const A = () => <div/>;", component_name="A",
+                 parses=False, syntax_error="Unclosed tag")
+
+    finished = store.get(job["id"])
+    assert (finished["parses"], finished["syntax_error"]) == (False, "Unclosed tag")
+    assert not store.claim(job["id"], "worker-a")
+    assert store.get(job["id"])["status"] != QUEUED
+
+
+def test_only_the_lease_holder_renews(store):
+    job, _ = store.create("text", b"hero", True, "ip:1")
+    store.claim(job["id"], "worker-a", lease_seconds=-1)
+
+    assert not store.renew(job["id"], "worker-b")
+    assert store.renew(job["id"], "worker-a")
+    assert store.unfinished() == []
+
+
+def test_jobs_are_claimed_only_once_admitted(store, monkeypatch):
+    job, _ = store.create("text", b"hero", True, "ip:1")
+    statuses = []
+
+    @asynccontextmanager
+    async def admitted(client, charge=True):
+        statuses.append(store.get(job["id"])["status"])
+        if len(statuses) == 1:
+            raise AdmissionRejectedError(503, "Server is busy", 1)
+        yield
+
+    async def run_generation(func, *args):
+        statuses.append(store.get(job["id"])["status"])
+        return {"success": True, "jsx_code": "const A = () => <div/>;", "component_name": "A"}
+
+    monkeypatch.setattr(jobs_module, "admitted", admitted)
+    monkeypatch.setattr(jobs_module, "run_generation", run_generation)
+    asyncio.run(JobManager(store, workers=0)._run(job["id"]))
+
+    assert statuses == [QUEUED, QUEUED, RUNNING]
+    assert store.get(job["id"])["status"] == SUCCEEDED
@@ -0,0 +1,35 @@
+import pytest
+
+from app.jsx_validation import check_syntax
+
+
+def component(body: str) -> str:
+    return f"const Form = () => {{\n  {body}\n  return <div className=\"p-4\">ok</div>;\n}};\n"
+
+
+@pytest.mark.parametrize("body", [
+    "const valid = (x) => /^[a-z']+$/.test(x);",
+    "const parts = name.split(/[\"`]/);",
+    "if (!/[({]/.test(value)) return null;",
+    "const pattern = cond ? /'/g : /\"/g;",
+    "const clean = value.replace(/\\/+$/, '');",
+])
+def test_regex_literals_are_skipped(body):
+    assert check_syntax(component(body)) is None
+
+
+def test_division_is_not_a_regex():
+    assert check_syntax(component("const ratio = (width / height) / 2, half = total/2;")) is None
+
+
+def test_regex_inside_jsx_expression():
+    code = "const List = ({ items }) => (\n  <ul>{items.filter((i) => /^'/.test(i)).map((i) => <li key={i}>{i}</li>)}</ul>\n);\n"
+    assert check_syntax(code) is None
+
+
+def test_unterminated_regex_is_reported():
+    assert check_syntax(component("const bad = /[a-z]+;")) == "Unterminated regular expression on line 2"
+
+
+def test_truncated_component_still_fails():
+    assert check_syntax("const Form = () => {\n  return <div>") is not None
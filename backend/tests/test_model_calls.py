@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from app import model_calls
+from app import gemini_client
+
+
+def test_stream_reports_a_missing_model_while_preparing(monkeypatch):
+    def prepare(model_name, template, contents):
+        raise google_exceptions.NotFound("model not found")
+
+    monkeypatch.setattr(model_calls, "_prepare", prepare)
+    with pytest.raises(google_exceptions.NotFound):
+        list(model_calls.stream_model("text", "a hero section"))
+
+
+def repair_deadline(monkeypatch, deadline):
+    calls = []
+
+    def call_model(kind, contents, generation_config=None, deadline=None, template=None):
+        calls.append(deadline)
+        raise google_exceptions.ServiceUnavailable("unavailable")
+
+    monkeypatch.setattr(gemini_client, "call_model", call_model)
+    token = gemini_client._call_deadline.set(deadline)
+    try:
+        gemini_client._repair("text", {"jsx_code": "const A = () => (", "syntax_error": "Unclosed '('"})
+    finally:
+        gemini_client._call_deadline.reset(token)
+    return calls
+
+
+def test_repair_gets_what_is_left_of_the_deadline(monkeypatch):
+    calls = repair_deadline(monkeypatch, time.monotonic() + 10)
+    assert len(calls) == 1 and 9 < calls[0] <= 10
+
+
+def test_repair_is_skipped_once_the_deadline_has_passed(monkeypatch):
+    assert repair_deadline(monkeypatch, time.monotonic() - 1) == []
+
+
+def tiled_run(monkeypatch, deadline):
+    calls = {"sections": [], "fallbacks": 0}
+
+    def call_model(kind, contents, generation_config=None, deadline=None, template=None):
+        calls["sections"].append(deadline)
+        raise google_exceptions.ServiceUnavailable("unavailable")
+
+    def fallback(image_bytes, template, seed=None):
+        calls["fallbacks"] += 1
+        return {"jsx_code": "const A = () => null;", "component_name": "A", "success": True}
+
+    monkeypatch.setattr(gemini_client, "call_model", call_model)
+    monkeypatch.setattr(gemini_client, "split_screenshot", lambda image_bytes: ["top", "bottom"])
+    monkeypatch.setattr(gemini_client, "encode_section", lambda section: section)
+    monkeypatch.setattr(gemini_client, "_generate_jsx_from_image", fallback)
+    token = gemini_client._call_deadline.set(deadline)
+    try:
+        result = gemini_client._generate_tiled(b"page", gemini_client.TEMPLATES["image-v1"])
+    finally:
+        gemini_client._call_deadline.reset(token)
+    return result, calls
+
+
+def test_tiled_sections_share_the_generation_deadline(monkeypatch):
+    result, calls = tiled_run(monkeypatch, time.monotonic() + 10)
+    assert len(calls["sections"]) == 2 and all(9 < deadline <= 10 for deadline in calls["sections"])
+    assert calls["fallbacks"] == 1 and result["success"]
+
+
+def test_no_fallback_once_the_deadline_has_passed(monkeypatch):
+    result, calls = tiled_run(monkeypatch, time.monotonic() - 1)
+    assert calls["fallbacks"] == 0
+    assert not result["success"] and "unavailable" in result["message"]
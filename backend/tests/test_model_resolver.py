@@ -0,0 +1,74 @@
+import pytest
+
+from app import model_resolver
+from app.model_resolver import ModelResolver, ModelUnavailableError
+from fakes import FakeGenAI, FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(model_resolver, "time", clock)
+    return clock
+
+
+def test_first_resolve_is_a_miss_that_runs_discovery(clock):
+    genai = FakeGenAI(models=["gemini-1.5-pro", "gemini-2.0-flash"])
+    resolver = ModelResolver(client=genai, pinned=None, ttl=60)
+
+    assert resolver.resolve() == "gemini-2.0-flash"
+    assert (resolver.hits, resolver.misses) == (0, 1)
+    assert genai.list_models_calls == 1
+
+
+def test_resolve_within_ttl_is_a_hit(clock):
+    genai = FakeGenAI()
+    resolver = ModelResolver(client=genai, pinned=None, ttl=60)
+    resolver.resolve()
+
+    clock.advance(59)
+    assert resolver.resolve() == "gemini-2.5-flash"
+    assert resolver.get_model() is resolver.get_model()
+    assert resolver.hits == 3
+    assert genai.list_models_calls == 1
+    assert genai.model_calls == 1
+
+
+def test_expired_entry_is_refreshed(clock):
+    genai = FakeGenAI()
+    resolver = ModelResolver(client=genai, pinned=None, ttl=60)
+    first = resolver.get_model()
+
+    genai.models = ["gemini-2.0-flash"]
+    clock.advance(61)
+    assert resolver.resolve() == "gemini-2.0-flash"
+    assert resolver.misses == 2
+    assert genai.list_models_calls == 2
+    # The old model's instance is dropped with it
+    assert resolver.get_model() is not first
+
+
+def test_refresh_replaces_model_before_expiry(clock):
+    genai = FakeGenAI()
+    resolver = ModelResolver(client=genai, pinned=None, ttl=60)
+    resolver.resolve()
+
+    genai.models = ["gemini-1.5-flash"]
+    assert resolver.refresh() == "gemini-1.5-flash"
+    assert resolver.resolve() == "gemini-1.5-flash"
+    assert genai.list_models_calls == 2
+
+
+def test_pinned_model_skips_discovery(clock):
+    genai = FakeGenAI()
+    resolver = ModelResolver(client=genai, pinned="gemini-2.5-pro", ttl=60)
+
+    assert resolver.resolve() == "gemini-2.5-pro"
+    assert genai.list_models_calls == 0
+
+
+def test_no_usable_model_raises(clock):
+    resolver = ModelResolver(client=FakeGenAI(models=[]), pinned=None, ttl=60)
+
+    with pytest.raises(ModelUnavailableError):
+        resolver.resolve()
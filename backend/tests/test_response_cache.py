@@ -0,0 +1,13 @@
+from app.response_cache import make_key
+
+
+def key(text: str) -> str:
+    return make_key("text", text, "gemini-2.5-flash", "text-v1")
+
+
+def test_whitespace_does_not_change_the_key():
+    assert key("A login form\n with a  SUBMIT button ") == key("A login form with a SUBMIT button")
+
+
+def test_case_changes_the_key():
+    assert key("A form with a SUBMIT button") != key("A form with a submit button")
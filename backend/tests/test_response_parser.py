@@ -0,0 +1,16 @@
+import pytest
+
+from benchmarks.parse_responses import load_corpus, check, fuzz
+
+CORPUS = load_corpus()
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[case["name"] for case in CORPUS])
+def test_corpus_case(case):
+    assert check(case) == []
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parsers_survive_mutated_responses(seed):
+    # Raises if a parser throws or drops one of the result fields
+    assert fuzz(CORPUS, runs=1000, seed=seed) == 1000
@@ -0,0 +1,39 @@
+from app.jsx_validation import check_syntax, normalize_jsx
+from app.tiling import merge_sections
+
+HERO = """import React from 'react';
+
+const Hero = () => {
+  return <section title="Hero"><h1>Hero heading</h1>{`Hero ${1}`}</section>;
+};
+
+export default Hero;"""
+
+
+def merged(*sections):
+    code, _ = normalize_jsx(merge_sections(list(sections)), "FullPage")
+    assert check_syntax(code) is None
+    return code
+
+
+def test_sections_render_the_component_their_code_exports():
+    code = merged((HERO, "Header"), ("export default function Pricing() { return <p>Plans</p>; }", "PricingTable"))
+    assert "<Hero />" in code and "<Pricing />" in code
+    assert "<Header />" not in code and "<PricingTable />" not in code
+
+
+def test_anonymous_default_exports_are_named():
+    code = merged(
+        ("export default function () { return <p>One</p>; }", "One"),
+        ("export default () => <p>Two</p>;", "Two"),
+    )
+    assert "function Section1()" in code and "const Section2 = () =>" in code
+    assert "<Section1 />" in code and "<Section2 />" in code
+
+
+def test_renames_leave_strings_and_jsx_text_alone():
+    second = "const Hero = () => <div>Hero again</div>;\n\nexport default Hero;"
+    code = merged((HERO, "Hero"), (second, "Hero"))
+    assert "const Hero2 = () => <div>Hero again</div>;" in code
+    assert code.count('<h1>Hero heading</h1>{`Hero ${1}`}') == 1
+    assert "<Hero />" in code and "<Hero2 />" in code
@@ -14,6 +14,9 @@ export interface TextToJSXResponse {
   component_name: string
   success: boolean
   message?: string
+  // Server-side syntax check of jsx_code; false means the preview would fail
+  parses?: boolean | null
+  syntax_error?: string | null
 }
 
 export interface ImageToJSXResponse {
@@ -21,6 +24,9 @@ export interface ImageToJSXResponse {
   component_name: string
   success: boolean
   message?: string
+  // Server-side syntax check of jsx_code; false means the preview would fail
+  parses?: boolean | null
+  syntax_error?: string | null
 }
 
 export const generateFromText = async (text: string): Promise<TextToJSXResponse> => {
@@ -42,3 +48,79 @@ export const generateFromImage = async (file: File): Promise<ImageToJSXResponse>
   return response.data
 }
 
+
+interface StreamEvent {
+  event: string
+  data: any
+}
+
+const parseStreamEvent = (raw: string): StreamEvent => {
+  let event = 'message'
+  const dataLines: string[] = []
+  for (const line of raw.split('\n')) {
+    if (line.startsWith('event:')) event = line.slice(6).trim()
+    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim())
+  }
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null }
+}
+
+// Reads a server-sent-events response, calling onDelta for each JSX chunk
+// and resolving with the final result once the "done" event arrives.
+const streamGeneration = async (
+  path: string,
+  init: RequestInit,
+  onDelta: (text: string) => void
+): Promise<TextToJSXResponse> => {
+  const response = await fetch(`${API_BASE_URL}${path}`, init)
+  if (!response.ok || !response.body) {
+    let detail = 'Failed to generate JSX'
+    try {
+      detail = (await response.json()).detail || detail
+    } catch {
+      // Non-JSON error body
+    }
+    throw new Error(detail)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let result: TextToJSXResponse | null = null
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const { event, data } = parseStreamEvent(buffer.slice(0, boundary))
+      buffer = buffer.slice(boundary + 2)
+      if (event === 'delta') onDelta(data.text)
+      else if (event === 'done') result = data
+      else if (event === 'error') throw new Error(data.message)
+      boundary = buffer.indexOf('\n\n')
+    }
+  }
+
+  if (!result) throw new Error('Stream ended before generation finished')
+  return result
+}
+
+export const streamFromText = (text: string, onDelta: (text: string) => void): Promise<TextToJSXResponse> =>
+  streamGeneration(
+    '/api/generate/text/stream',
+    {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ text_description: text }),
+    },
+    onDelta
+  )
+
+export const streamFromImage = (file: File, onDelta: (text: string) => void): Promise<ImageToJSXResponse> => {
+  const formData = new FormData()
+  formData.append('file', file)
+
+  return streamGeneration('/api/generate/image/stream', { method: 'POST', body: formData }, onDelta)
+}
@@ -5,9 +5,10 @@ import toast from 'react-hot-toast'
 interface CodePreviewerProps {
   code: string
   componentName: string
+  streaming?: boolean
 }
 
-const CodePreviewer = ({ code, componentName }: CodePreviewerProps) => {
+const CodePreviewer = ({ code, componentName, streaming = false }: CodePreviewerProps) => {
   const [copied, setCopied] = useState(false)
 
   const handleCopy = async () => {
@@ -55,11 +56,13 @@ const CodePreviewer = ({ code, componentName }: CodePreviewerProps) => {
           <h3 className="text-xl font-semibold">Generated Code</h3>
           <p className="text-sm text-muted-foreground mt-1">
             Component: <span className="font-mono text-primary">{componentName}</span>
+            {streaming && <span className="ml-2 animate-pulse">Streaming...</span>}
           </p>
         </div>
         <div className="flex gap-2">
           <button
             onClick={handleCopy}
+            disabled={streaming}
             className="btn-primary flex items-center space-x-2 px-4 py-2 text-sm"
           >
             {copied ? (
@@ -76,6 +79,7 @@ const CodePreviewer = ({ code, componentName }: CodePreviewerProps) => {
           </button>
           <button
             onClick={handleDownload}
+            disabled={streaming}
             className="btn-secondary flex items-center space-x-2 px-4 py-2 text-sm"
           >
             <Download className="h-4 w-4" />
@@ -3,9 +3,12 @@ import { AlertCircle, Loader2 } from 'lucide-react'
 
 interface LivePreviewProps {
   jsxCode: string
+  componentName: string
+  parses?: boolean | null
+  syntaxError?: string | null
 }
 
-const LivePreview = ({ jsxCode }: LivePreviewProps) => {
+const LivePreview = ({ jsxCode, componentName, parses, syntaxError }: LivePreviewProps) => {
   const iframeRef = useRef<HTMLIFrameElement | null>(null)
   const [error, setError] = useState<string | null>(null)
   const [isLoading, setIsLoading] = useState(true)
@@ -21,70 +24,20 @@ const LivePreview = ({ jsxCode }: LivePreviewProps) => {
     setError(null)
     setIsLoading(true)
 
+    // The server already found a syntax error; don't build a preview that can't render
+    if (parses === false) {
+      setError(`The generated code does not parse: ${syntaxError || 'syntax error'}`)
+      setIsLoading(false)
+      return
+    }
+
     if (!iframeRef.current) return
 
     try {
-      // Prepare the code - handle various formats
-      let code = jsxCode.trim()
-      
-      // Remove markdown code blocks if present (common in AI responses)
-      code = code.replace(/```json\s*/g, '')
-      code = code.replace(/```jsx\s*/g, '')
-      code = code.replace(/```javascript\s*/g, '')
-      code = code.replace(/```typescript\s*/g, '')
-      code = code.replace(/```\s*$/gm, '')
-      code = code.trim()
-      
-      // Try to parse as JSON if it looks like JSON (common in image-generated code)
-      if (code.startsWith('{') || (code.startsWith('"') && code.endsWith('"'))) {
-        try {
-          const parsed = JSON.parse(code)
-          if (typeof parsed === 'object' && parsed.jsx) {
-            code = parsed.jsx
-            // Also update component name if available
-            if (parsed.component_name) {
-              componentName = parsed.component_name
-            }
-          } else if (typeof parsed === 'string') {
-            code = parsed
-          }
-        } catch (e) {
-          // If full JSON parse fails, try to extract jsx field using regex
-          if (code.includes('"jsx"') && code.includes('"component_name"')) {
-            try {
-              // Extract jsx value from JSON string
-              const jsxMatch = code.match(/"jsx"\s*:\s*"((?:[^"\\]|\\.)*)"/s)
-              const nameMatch = code.match(/"component_name"\s*:\s*"([^"]+)"/)
-              
-              if (jsxMatch && jsxMatch[1]) {
-                code = jsxMatch[1]
-                // Unescape the code
-                code = code.replace(/\\n/g, '\n').replace(/\\"/g, '"').replace(/\\'/g, "'")
-                code = code.replace(/\\t/g, '\t').replace(/\\r/g, '\r')
-                
-                if (nameMatch && nameMatch[1]) {
-                  componentName = nameMatch[1]
-                }
-              }
-            } catch (extractError) {
-              // Extraction failed, continue with original code
-              console.warn('Failed to extract JSX from JSON:', extractError)
-            }
-          }
-        }
-      }
-      
-      // Handle escaped strings (common in image-generated code from JSON)
-      if (code.includes('\\n') || code.includes('\\"')) {
-        // Unescape common escape sequences
-        code = code
-          .replace(/\\n/g, '\n')
-          .replace(/\\"/g, '"')
-          .replace(/\\'/g, "'")
-          .replace(/\\t/g, '\t')
-          .replace(/\\r/g, '\r')
-          .replace(/\\\\/g, '\\')
-      }
+      // The backend returns code in canonical form (no fences, JSON or
+      // escapes) with the exported component name, so only the module
+      // syntax the iframe cannot run needs to go
+      let code = jsxCode
       
       // Remove export default
       code = code.replace(/export\s+default\s+/g, '')
@@ -92,31 +45,6 @@ const LivePreview = ({ jsxCode }: LivePreviewProps) => {
       // Remove React imports (we'll provide React in the iframe)
       code = code.replace(/import\s+React[^;]*from[^;]*;?\s*/g, '')
       code = code.replace(/import\s+\{[^}]*\}\s+from\s+['"]react['"];?\s*/g, '')
-      
-      // Extract component name - try multiple patterns
-      let componentName = 'Component'
-      const patterns = [
-        /const\s+(\w+)\s*=\s*\(/,
-        /const\s+(\w+)\s*=/,
-        /function\s+(\w+)\s*\(/,
-        /export\s+(?:const|function)\s+(\w+)/,
-      ]
-      
-      for (const pattern of patterns) {
-        const match = code.match(pattern)
-        if (match && match[1] && match[1][0] === match[1][0].toUpperCase()) {
-          componentName = match[1]
-          break
-        }
-      }
-      
-      // If still not found, look for any capitalized identifier
-      if (componentName === 'Component') {
-        const anyMatch = code.match(/(?:const|function|export)\s+([A-Z][a-zA-Z0-9]+)/)
-        if (anyMatch && anyMatch[1]) {
-          componentName = anyMatch[1]
-        }
-      }
 
       // Encode code as Base64 to avoid all escaping issues
       function base64Encode(str: string): string {
@@ -363,7 +291,7 @@ const LivePreview = ({ jsxCode }: LivePreviewProps) => {
       setIsLoading(false)
       console.error('Preview setup error:', err)
     }
-  }, [jsxCode]) // Only depend on jsxCode
+  }, [jsxCode, componentName, parses, syntaxError])
 
   if (error) {
     return (
@@ -6,9 +6,12 @@ import { Eye, Code, FileCode } from 'lucide-react'
 interface ResultPanelProps {
   jsxCode: string
   componentName: string
+  parses?: boolean | null
+  syntaxError?: string | null
+  streaming?: boolean
 }
 
-const ResultPanel = ({ jsxCode, componentName }: ResultPanelProps) => {
+const ResultPanel = ({ jsxCode, componentName, parses, syntaxError, streaming = false }: ResultPanelProps) => {
   const [showPreview, setShowPreview] = useState(false)
 
 
@@ -27,6 +30,7 @@ const ResultPanel = ({ jsxCode, componentName }: ResultPanelProps) => {
           </div>
           <button
             onClick={() => setShowPreview(!showPreview)}
+            disabled={streaming}
             className="btn-secondary flex items-center space-x-2 px-4 py-2 text-sm whitespace-nowrap"
           >
             {showPreview ? (
@@ -44,13 +48,18 @@ const ResultPanel = ({ jsxCode, componentName }: ResultPanelProps) => {
         </div>
 
         <div className="mt-6">
-          {showPreview ? (
+          {showPreview && !streaming ? (
             <div className="animate-fade-in">
-              <LivePreview jsxCode={jsxCode} />
+              <LivePreview
+                jsxCode={jsxCode}
+                componentName={componentName}
+                parses={parses}
+                syntaxError={syntaxError}
+              />
             </div>
           ) : (
             <div className="animate-fade-in">
-              <CodePreviewer code={jsxCode} componentName={componentName} />
+              <CodePreviewer code={jsxCode} componentName={componentName} streaming={streaming} />
             </div>
           )}
         </div>
@@ -1,5 +1,5 @@
 import { useState } from 'react'
-import { generateFromImage } from '../api/client'
+import { streamFromImage } from '../api/client'
 import { useStore } from '../store/useStore'
 import Spinner from '../components/Spinner'
 import ResultPanel from '../components/ResultPanel'
@@ -23,13 +23,27 @@ const ImageToJSX = () => {
     }
 
     setLoading(true)
+    const fileName = selectedFile.name
+    let partial = ''
+    const onDelta = (chunk: string) => {
+      partial += chunk
+      setCurrentResult({
+        jsx_code: partial,
+        component_name: 'Generating...',
+        type: 'image',
+        input: fileName,
+        timestamp: Date.now(),
+      })
+    }
     try {
-      const response = await generateFromImage(selectedFile)
+      const response = await streamFromImage(selectedFile, onDelta)
       
       if (response.success) {
         const result = {
           jsx_code: response.jsx_code,
           component_name: response.component_name,
+          parses: response.parses,
+          syntax_error: response.syntax_error,
           type: 'image' as const,
           input: selectedFile.name,
           timestamp: Date.now(),
@@ -47,7 +61,7 @@ const ImageToJSX = () => {
         toast.error(response.message || 'Failed to generate JSX')
       }
     } catch (error: any) {
-      toast.error(error.response?.data?.detail || 'An error occurred')
+      toast.error(error.response?.data?.detail || error.message || 'An error occurred')
     } finally {
       setLoading(false)
     }
@@ -111,6 +125,9 @@ const ImageToJSX = () => {
           <ResultPanel
             jsxCode={currentResult.jsx_code}
             componentName={currentResult.component_name}
+            parses={currentResult.parses}
+            syntaxError={currentResult.syntax_error}
+            streaming={loading}
           />
         </div>
       )}
@@ -1,5 +1,5 @@
 import { useState } from 'react'
-import { generateFromText } from '../api/client'
+import { streamFromText } from '../api/client'
 import { useStore } from '../store/useStore'
 import Spinner from '../components/Spinner'
 import ResultPanel from '../components/ResultPanel'
@@ -25,13 +25,26 @@ const TextToJSX = () => {
     }
 
     setLoading(true)
+    let partial = ''
+    const onDelta = (chunk: string) => {
+      partial += chunk
+      setCurrentResult({
+        jsx_code: partial,
+        component_name: 'Generating...',
+        type: 'text',
+        input: text,
+        timestamp: Date.now(),
+      })
+    }
     try {
-      const response = await generateFromText(text)
+      const response = await streamFromText(text, onDelta)
       
       if (response.success) {
         const result = {
           jsx_code: response.jsx_code,
           component_name: response.component_name,
+          parses: response.parses,
+          syntax_error: response.syntax_error,
           type: 'text' as const,
           input: text,
           timestamp: Date.now(),
@@ -49,7 +62,7 @@ const TextToJSX = () => {
         toast.error(response.message || 'Failed to generate JSX')
       }
     } catch (error: any) {
-      toast.error(error.response?.data?.detail || 'An error occurred')
+      toast.error(error.response?.data?.detail || error.message || 'An error occurred')
     } finally {
       setLoading(false)
     }
@@ -143,6 +156,9 @@ const TextToJSX = () => {
           <ResultPanel
             jsxCode={currentResult.jsx_code}
             componentName={currentResult.component_name}
+            parses={currentResult.parses}
+            syntaxError={currentResult.syntax_error}
+            streaming={loading}
           />
         </div>
       )}
@@ -3,6 +3,8 @@ import { create } from 'zustand'
 interface GenerationResult {
   jsx_code: string
   component_name: string
+  parses?: boolean | null
+  syntax_error?: string | null
   type: 'text' | 'image'
   input: string
   timestamp: number